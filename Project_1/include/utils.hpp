@@ -8,6 +8,8 @@
 #include <random>
 #include <cstdio>
 
+#include "page_alloc.hpp"
+
 struct RunResult {
   double median_ms;
   double stdev_ms;
@@ -16,8 +18,10 @@ struct RunResult {
   double out_scalar; // for reductions; optional
 };
 
-// allocate aligned memory (free with free())
-void* aligned_alloc_bytes(size_t alignment, size_t bytes);
+// allocate aligned memory backed by the requested page size (see page_alloc.hpp);
+// free with aligned_free_bytes()
+PageBuffer aligned_alloc_bytes(size_t alignment, size_t bytes, PageKind pages = PageKind::Default);
+void aligned_free_bytes(PageBuffer& buf);
 
 // misalign a pointer view by a given byte offset (not owning)
 template <typename T>
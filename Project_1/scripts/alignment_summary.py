@@ -1,8 +1,8 @@
-import os, pandas as pd, numpy as np
+import os, sys, pandas as pd, numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from results_store import load
 os.makedirs("docs", exist_ok=True)
-df = pd.read_csv("data/results.csv")
-for c in ["kernel","dtype","align","build"]:
-    df[c] = df[c].astype(str).str.strip().str.lower()
+df = load("data/results.csv", "project1")
 
 Ns=[1048576, 4194304]
 rows=[]
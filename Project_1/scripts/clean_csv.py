@@ -5,7 +5,8 @@ os.makedirs("docs", exist_ok=True)
 df = pd.read_csv("data/results.csv")
 
 # Ensure these columns exist/in order
-cols = ["kernel","dtype","align","stride","N","build","median_ms","stdev_ms","gflops","cpe","reduce"]
+cols = ["kernel","dtype","align","stride","N","build","median_ms","stdev_ms","gflops","cpe","reduce",
+        "pages","page_alloc","page_backing","huge_pct"]
 for c in cols:
     if c not in df.columns:
         df[c] = float("nan")
@@ -25,7 +26,8 @@ print("Wrote", out)
 with open("docs/CSV_README.md","w") as f:
     f.write("""# results.csv schema
 
-Columns: kernel, dtype, align, stride, N, build, median_ms, stdev_ms, gflops, cpe, reduce
+Columns: kernel, dtype, align, stride, N, build, median_ms, stdev_ms, gflops, cpe, reduce,
+pages, page_alloc, page_backing, huge_pct
 
 - `build` is either `auto` (auto-vectorized) or `scalar` (vectorization disabled).
 - `align` is `aligned` or `misaligned`.
@@ -34,6 +36,9 @@ Columns: kernel, dtype, align, stride, N, build, median_ms, stdev_ms, gflops, cp
   - DOT: the dot-product scalar result
   - SAXPY: sum of output y
   - EWMUL: sum of output z
+- `pages` is the requested `--pages` (default, 4k, thp, hugetlb), `page_alloc` what the
+  allocator used after any fallback, and `page_backing`/`huge_pct` what /proc/self/smaps
+  reports for the arrays (empty for rows written before these columns existed).
 
 This CSV contains scalar vs SIMD, aligned vs misaligned, float32 vs float64,
 stride sweeps, and working-set size sweeps across L1→L2→LLC→DRAM.
@@ -8,7 +8,7 @@ os.makedirs("data", exist_ok=True)
 
 # Seed the CSV with a header so pandas knows column names even if utils.cpp
 # doesn't write a header when the file exists-but-empty.
-HEADER = "kernel,dtype,align,stride,N,build,median_ms,stdev_ms,gflops,cpe,reduce\n"
+HEADER = "kernel,dtype,align,stride,N,build,median_ms,stdev_ms,gflops,cpe,reduce,pages,page_alloc,page_backing,huge_pct\n"
 with open(CSV, "w") as f:
     f.write(HEADER)
 
@@ -1,16 +1,13 @@
 #!/usr/bin/env python3
-import os, numpy as np, pandas as pd, matplotlib.pyplot as plt
+import os, sys, numpy as np, pandas as pd, matplotlib.pyplot as plt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from results_store import load
 
 CSV = "data/results.csv"
 OUT = "docs"
 os.makedirs(OUT, exist_ok=True)
 
 # -------- helpers --------
-def norm(df: pd.DataFrame) -> pd.DataFrame:
-    for c in ["kernel","dtype","align","build"]:
-        df[c] = df[c].astype(str).str.strip().str.lower()
-    return df
-
 def gflops_err_from_ms(work, med_ms, std_ms):
     """
     Convert time uncertainty to GFLOP/s uncertainty.
@@ -136,8 +133,7 @@ def plot_stride(df, kernel="saxpy", dtype="f32", align="aligned", N=1048576):
     print("Wrote", out)
 
 # -------- run --------
-df = pd.read_csv(CSV)
-df = norm(df)
+df = load(CSV, "project1")
 
 # GFLOP/s vs N (error bars)
 for K in ["saxpy","dot","ewmul"]:
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
-import os, re, pandas as pd, numpy as np, matplotlib.pyplot as plt
+import os, re, sys, pandas as pd, numpy as np, matplotlib.pyplot as plt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from results_store import load
 
 os.makedirs("docs", exist_ok=True)
 
@@ -43,9 +45,7 @@ def annotate_cache(ax, kernel, dtype, L1,L2,L3):
         ax.axvline(Nthr, color=color, linestyle="--", linewidth=1)
         ax.text(Nthr, ax.get_ylim()[1]*0.95, f"{label}\n~N={Nthr:,}", ha="right", va="top", fontsize=8, color=color)
 
-df = pd.read_csv(CSV)
-for c in ["kernel","dtype","align","build"]:
-    df[c] = df[c].astype(str).str.strip().str.lower()
+df = load(CSV, "project1")
 
 K,DT,ALIGN,STRIDE = "saxpy","f32","aligned",1
 sub = df[(df.kernel==K)&(df.dtype==DT)&(df.align==ALIGN)&(df.stride==STRIDE)]
@@ -1,13 +1,12 @@
+import os, sys
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from results_store import load
 
 # --- load and normalize ---
-df = pd.read_csv("data/results.csv")
-
-for c in ["kernel", "dtype", "align", "build"]:
-    if c in df.columns:
-        df[c] = df[c].astype(str).str.strip().str.lower()
+df = load("data/results.csv", "project1")
 
 if "N" in df.columns:
     df["N"] = pd.to_numeric(df["N"], errors="coerce")
@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
-import os, pandas as pd, numpy as np, matplotlib.pyplot as plt
+import os, sys, pandas as pd, numpy as np, matplotlib.pyplot as plt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from results_store import load
 
 os.makedirs("docs", exist_ok=True)
 CSV="data/results.csv"
 
-df = pd.read_csv(CSV)
-for c in ["kernel","dtype","align","build"]:
-    df[c] = df[c].astype(str).str.strip().str.lower()
+df = load(CSV, "project1")
 
 # Choose one clear case: SAXPY f32 aligned, stride=1
 K,DT,ALIGN,STRIDE = "saxpy","f32","aligned",1
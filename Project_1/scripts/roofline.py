@@ -3,6 +3,8 @@ import os, sys
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from results_store import load
 
 CSV = "data/results.csv"
 OUT = "docs"
@@ -20,9 +22,7 @@ BW  = float(argv[4]) if len(argv) >= 5 else 0.0   # GB/s
 PEAK = float(argv[5]) if len(argv) >= 6 else 0.0  # GFLOP/s
 
 # ---- load & normalize
-df = pd.read_csv(CSV)
-for c in ("kernel","dtype","align","build"):
-    df[c] = df[c].astype(str).str.strip().str.lower()
+df = load(CSV, "project1")
 for c in ("N","stride","gflops"):
     if c in df.columns:
         df[c] = pd.to_numeric(df[c], errors="coerce")
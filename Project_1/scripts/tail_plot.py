@@ -1,8 +1,8 @@
-import os, pandas as pd, numpy as np, matplotlib.pyplot as plt
+import os, sys, pandas as pd, numpy as np, matplotlib.pyplot as plt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from results_store import load
 os.makedirs("docs", exist_ok=True)
-df = pd.read_csv("data/results.csv")
-for c in ["kernel","dtype","align","build"]:
-    df[c] = df[c].astype(str).str.strip().str.lower()
+df = load("data/results.csv", "project1")
 for c in ["stride","N","time_ms","median_ms","stdev_ms","gflops","cpe"]:
     if c in df.columns: df[c] = pd.to_numeric(df[c], errors="coerce")
 def lanes(dtype): return 8 if dtype=="f32" else 4
@@ -12,6 +12,7 @@
 
 // Simple CLI:
 // ./simd_profile --kernel saxpy --dtype f32 --align aligned --stride 1 --N 1048576 --trials 5 --warmups 1 --build-label auto --csv data/out.csv --cpu-ghz 3.6
+//   [--pages default|4k|thp|hugetlb]   page size backing the x/y/z arrays (see common/page_alloc.hpp)
 //
 // Build two variants:
 //  - Auto-vectorized:   cmake -S . -B build && cmake --build build -j
@@ -29,6 +30,7 @@ static struct option long_opts[] = {
   {"csv", required_argument, 0, 'c'},
   {"cpu-ghz", required_argument, 0, 'g'},
   {"min-ms", required_argument, 0, 'M'},  // NEW
+  {"pages", required_argument, 0, 'P'},
   {0,0,0,0}
 };
 
@@ -59,6 +61,7 @@ int main(int argc, char** argv) {
   std::string csv_path = "data/results.csv";
   double cpu_ghz = -1.0;
   double min_ms  = 0.0;   // NEW: per-trial minimum elapsed ms (0 = disabled)
+  PageKind pages = PageKind::Default;
 
   int opt;
   while ((opt = getopt_long(argc, argv, "", long_opts, nullptr)) != -1) {
@@ -74,6 +77,12 @@ int main(int argc, char** argv) {
       case 'c': csv_path = optarg; break;
       case 'g': cpu_ghz = std::atof(optarg); break;
       case 'M': min_ms  = std::atof(optarg); break;  // NEW
+      case 'P':
+        if (!parse_page_kind(optarg, pages)) {
+          std::fprintf(stderr, "Unknown pages: %s (default | 4k | thp | hugetlb)\n", optarg);
+          return 1;
+        }
+        break;
     }
   }
 
@@ -86,11 +95,24 @@ int main(int argc, char** argv) {
   size_t bytes = elem_size * elems;
 
   const size_t alignment = 64;
-  void* pA = aligned_alloc_bytes(alignment, bytes + 64); // +64 headroom for misalign view
-  void* pB = aligned_alloc_bytes(alignment, bytes + 64);
-  void* pC = aligned_alloc_bytes(alignment, bytes + 64);
+  PageBuffer bufA = aligned_alloc_bytes(alignment, bytes + 64, pages); // +64 headroom for misalign view
+  PageBuffer bufB = aligned_alloc_bytes(alignment, bytes + 64, pages);
+  PageBuffer bufC = aligned_alloc_bytes(alignment, bytes + 64, pages);
+  void* pA = bufA.ptr;
+  void* pB = bufB.ptr;
+  void* pC = bufC.ptr;
   if (!pA || !pB || !pC) { std::fprintf(stderr, "alloc failed\n"); return 2; }
 
+  // Backing actually mapped for the (already filled) arrays: the least-huge of the three.
+  auto backing = [&]() {
+    PageBacking best = page_backing(pA, bufA.bytes);
+    for (const PageBuffer* pb : {&bufB, &bufC}) {
+      PageBacking k = page_backing(pb->ptr, pb->bytes);
+      if (k.huge_pct < best.huge_pct) best = k;
+    }
+    return best;
+  };
+
   // Prepare views
   bool mis = (align_s == "misaligned");
   size_t off = (T == DType::F32 ? 4 : 8); // 4B for float, 8B for double
@@ -206,12 +228,14 @@ int main(int argc, char** argv) {
       reduction_scalar = s;
     }
 
-    ensure_csv_header(csv_path, "kernel,dtype,align,stride,N,build,median_ms,stdev_ms,gflops,cpe,reduce");
+    PageBacking pb = backing();
+    ensure_csv_header(csv_path, "kernel,dtype,align,stride,N,build,median_ms,stdev_ms,gflops,cpe,reduce,pages,page_alloc,page_backing,huge_pct");
     FILE* f = std::fopen(csv_path.c_str(), "a");
     if (!f) { std::perror("fopen csv"); return 3; }
-    std::fprintf(f, "%s,%s,%s,%zu,%zu,%s,%.6f,%.6f,%.6f,%.6f,%.6f\n",
+    std::fprintf(f, "%s,%s,%s,%zu,%zu,%s,%.6f,%.6f,%.6f,%.6f,%.6f,%s,%s,%s,%.1f\n",
       kernel_s.c_str(), dtype_s.c_str(), align_s.c_str(), stride, N, build_label.c_str(),
-      median, stdev, gflops, cpe, reduction_scalar);
+      median, stdev, gflops, cpe, reduction_scalar,
+      page_kind_name(pages), page_kind_name(bufA.used), pb.kind.c_str(), pb.huge_pct);
     std::fclose(f);
 
   } else {
@@ -316,15 +340,17 @@ int main(int argc, char** argv) {
       reduction_scalar = s;
     }
 
-    ensure_csv_header(csv_path, "kernel,dtype,align,stride,N,build,median_ms,stdev_ms,gflops,cpe,reduce");
+    PageBacking pb = backing();
+    ensure_csv_header(csv_path, "kernel,dtype,align,stride,N,build,median_ms,stdev_ms,gflops,cpe,reduce,pages,page_alloc,page_backing,huge_pct");
     FILE* f = std::fopen(csv_path.c_str(), "a");
     if (!f) { std::perror("fopen csv"); return 3; }
-    std::fprintf(f, "%s,%s,%s,%zu,%zu,%s,%.6f,%.6f,%.6f,%.6f,%.6f\n",
+    std::fprintf(f, "%s,%s,%s,%zu,%zu,%s,%.6f,%.6f,%.6f,%.6f,%.6f,%s,%s,%s,%.1f\n",
       kernel_s.c_str(), dtype_s.c_str(), align_s.c_str(), stride, N, build_label.c_str(),
-      median, stdev, gflops, cpe, reduction_scalar);
+      median, stdev, gflops, cpe, reduction_scalar,
+      page_kind_name(pages), page_kind_name(bufA.used), pb.kind.c_str(), pb.huge_pct);
     std::fclose(f);
   }
 
-  std::free(pA); std::free(pB); std::free(pC);
+  aligned_free_bytes(bufA); aligned_free_bytes(bufB); aligned_free_bytes(bufC);
   return 0;
 }
@@ -9,22 +9,14 @@
 #include <string>   // <- add this
 
 
-void* aligned_alloc_bytes(size_t alignment, size_t bytes) {
-#if defined(_MSC_VER)
-    return _aligned_malloc(bytes, alignment);  // Windows path
-#else
-    void* p = nullptr;
-    if (::posix_memalign(&p, alignment, bytes) != 0) return nullptr;  // Linux/WSL
-    return p;
-#endif
+PageBuffer aligned_alloc_bytes(size_t alignment, size_t bytes, PageKind pages) {
+    // Default: _aligned_malloc (Windows) / posix_memalign (Linux/WSL);
+    // 4k/thp/hugetlb: page-aligned mmap, which satisfies any alignment <= 4 KiB
+    return page_alloc(bytes, pages, alignment);
 }
 
-void aligned_free_bytes(void* ptr) {
-#if defined(_MSC_VER)
-    _aligned_free(ptr);  // Windows path
-#else
-    free(ptr);  // Linux/WSL - posix_memalign uses regular free
-#endif
+void aligned_free_bytes(PageBuffer& buf) {
+    page_free(buf);
 }
 
 double now_ms() {
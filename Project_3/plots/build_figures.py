@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Incremental replacement for the plot loop in run_all_plots.sh.
+
+Each target is one plot_*.py script run on one CSV. For every target the
+manifest (<out>/.build_manifest.json) records the sha256 of its input CSV, of
+the script plus util.py and common/results_store.py (which util.R reads
+through), and the argument list; a target is rebuilt only when one of those
+changed or one of its PNGs is missing. Stale targets render in parallel, each
+in its own Python process.
+"""
+import argparse, hashlib, json, os, subprocess, sys
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MANIFEST = ".build_manifest.json"
+
+# (script, input csv, png arguments, pngs actually written)
+TARGETS = [
+    ("plot_zeroq.py", "zero_queue.csv", ["zeroqueue_bars.png"], ["zeroqueue_bars.png"]),
+    ("plot_bs_random.py", "bs_random.csv", ["bs_random.png", "bs_random_lat.png"],
+     ["bs_random_iops.png", "bs_random_mbps.png", "bs_random_lat.png"]),
+    ("plot_bs_seq.py", "bs_seq.csv", ["bs_seq.png", "bs_seq_lat.png"],
+     ["bs_seq_iops.png", "bs_seq_mbps.png", "bs_seq_lat.png"]),
+    ("plot_mix.py", "mix_sweep.csv", ["mix_bw.png", "mix_lat.png"], ["mix_bw.png", "mix_lat.png"]),
+    ("plot_qd.py", "qd_tradeoff.csv", ["qd_iops.png", "qd_lat.png", "qd_tradeoff.png"],
+     ["qd_iops.png", "qd_lat.png", "qd_tradeoff.png"]),
+    ("plot_tails.py", "tails.csv", ["tails.png"],
+     ["tails_p50.png", "tails_p95.png", "tails_p99.png", "tails_p999.png"]),
+    ("plot_granularity.py", "granularity_matrix.csv", ["granularity_bw.png", "granularity_lat.png"],
+     ["granularity_bw.png", "granularity_lat.png"]),
+    ("plot_wss.py", "working_set_sizes.csv", ["wss_bw.png", "wss_lat.png"], ["wss_bw.png", "wss_lat.png"]),
+    ("plot_cache.py", "impact_cache.csv", ["cache_bw.png", "cache_lat.png"], ["cache_bw.png", "cache_lat.png"]),
+    ("plot_tlb.py", "impact_tlb.csv", ["tlb_bw.png", "tlb_lat.png"], ["tlb_bw.png", "tlb_lat.png"]),
+]
+
+def sha(*paths):
+    h = hashlib.sha256()
+    for p in paths:
+        with open(p, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def load_manifest(path):
+    try:
+        with open(path) as f: return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def render(cmd):
+    env = dict(os.environ, MPLBACKEND="Agg")
+    p = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    return p.returncode, (p.stderr or "").strip()
+
+def build(data, out, jobs, force=False):
+    os.makedirs(out, exist_ok=True)
+    mpath = os.path.join(out, MANIFEST)
+    manifest = {} if force else load_manifest(mpath)
+    util_py = os.path.join(HERE, "util.py")
+    store_py = os.path.join(HERE, "..", "..", "common", "results_store.py")
+
+    stale = []
+    for script, csv_name, png_args, outputs in TARGETS:
+        name = f"{script}:{csv_name}"
+        inp = os.path.join(data, csv_name)
+        if not os.path.exists(inp):
+            print(f"[skip] {name}: {inp} not found"); continue
+        script_path = os.path.join(HERE, script)
+        args = [inp] + [os.path.join(out, p) for p in png_args]
+        rec = {"input": sha(inp), "recipe": sha(script_path, util_py, store_py), "args": args}
+        have_all = all(os.path.exists(os.path.join(out, p)) for p in outputs)
+        if manifest.get(name) == rec and have_all:
+            continue
+        stale.append((name, [sys.executable, script_path] + args, rec))
+
+    print(f"{len(stale)}/{len(TARGETS)} figure targets stale")
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for (name, cmd, rec), (rc, err) in zip(stale, pool.map(lambda t: render(t[1]), stale)):
+            if rc == 0:
+                manifest[name] = rec; print(f"[built] {name}")
+            else:
+                manifest.pop(name, None); failed += 1; print(f"[fail] {name}: {err[-300:]}")
+
+    tmp = mpath + ".tmp"
+    with open(tmp, "w") as f: json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, mpath)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    a = argparse.ArgumentParser()
+    a.add_argument("--data", default="data"); a.add_argument("--out", default="figures")
+    a.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1)
+    a.add_argument("--force", action="store_true", help="rebuild every figure")
+    A = a.parse_args()
+    sys.exit(build(A.data, A.out, A.jobs, A.force))
@@ -1,7 +1,8 @@
-import csv, os, matplotlib.pyplot as plt
+import os, sys, matplotlib.pyplot as plt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from results_store import load
 def R(p): 
-    with open(p, newline='') as f: 
-        return list(csv.DictReader(f))
+    return load(p, records=True)
 def F(x): 
     try: return float(x)
     except: return None
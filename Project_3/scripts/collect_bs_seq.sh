@@ -1,6 +1,7 @@
 #!/usr/bin/env bash
 set -euo pipefail
 mkdir -p results
+source "$(dirname "$0")/fio_common.sh"
 for bs in 4k 16k 64k 128k 256k; do
-  fio --name=bs_seq_${bs} --rw=read --bs=${bs} --iodepth=1 --time_based=1 --runtime=30s --numjobs=1 --direct=1 --ioengine=psync --output-format=json --output=results/bs_seq_${bs}.json
+  fio --name=bs_seq_${bs} --rw=read --bs=${bs} --iodepth=1 --time_based=1 --runtime=30s --direct=1 "${ENGINE_ARGS[@]}" "${JOB_ARGS[@]}" --output-format=json --output=results/bs_seq_${bs}.json
 done
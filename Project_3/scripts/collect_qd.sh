@@ -1,6 +1,7 @@
 #!/usr/bin/env bash
 set -euo pipefail
 mkdir -p results
+source "$(dirname "$0")/fio_common.sh"
 for qd in 1 2 4 8 16 32 64 128; do
-  fio --name=qd_randread_4k_qd${qd} --rw=randread --bs=4k --iodepth=${qd} --time_based=1 --runtime=30s --numjobs=1 --direct=1 --ioengine=psync --output-format=json --output=results/qd_randread_4k_qd${qd}.json
+  fio --name=qd_randread_4k_qd${qd} --rw=randread --bs=4k --iodepth=${qd} --time_based=1 --runtime=30s --direct=1 "${ENGINE_ARGS[@]}" "${JOB_ARGS[@]}" --output-format=json --output=results/qd_randread_4k_qd${qd}.json
 done
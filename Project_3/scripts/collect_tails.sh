@@ -1,6 +1,7 @@
 #!/usr/bin/env bash
 set -euo pipefail
 mkdir -p results
+source "$(dirname "$0")/fio_common.sh"
 for qd in 16 64; do
-  fio --name=tails_randread_4k_qd${qd} --rw=randread --bs=4k --iodepth=${qd} --time_based=1 --runtime=30s --numjobs=1 --direct=1 --ioengine=psync --percentile_list=50,95,99,99.9 --output-format=json --output=results/tails_randread_4k_qd${qd}.json
+  fio --name=tails_randread_4k_qd${qd} --rw=randread --bs=4k --iodepth=${qd} --time_based=1 --runtime=30s --direct=1 "${ENGINE_ARGS[@]}" "${JOB_ARGS[@]}" --percentile_list=50,95,99,99.9 --output-format=json --output=results/tails_randread_4k_qd${qd}.json
 done
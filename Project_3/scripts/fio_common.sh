@@ -0,0 +1,57 @@
+#!/usr/bin/env bash
+# Shared fio engine/job options for the collect_*.sh scripts (source this file).
+#
+#   ENGINE=auto|io_uring|libaio|psync   auto: io_uring, else libaio, else psync,
+#                                       whichever actually runs on this host
+#   NUMJOBS=<n>                         jobs per run (default 1); >1 adds --group_reporting
+#   FIXEDBUFS=1                         io_uring only: registered buffers + fixed files
+#
+# psync issues one I/O at a time, so --iodepth>1 only means something with an
+# async engine. Collectors pass "${ENGINE_ARGS[@]}" "${JOB_ARGS[@]}" to fio.
+
+ENGINE="${ENGINE:-auto}"
+NUMJOBS="${NUMJOBS:-1}"
+FIXEDBUFS="${FIXEDBUFS:-0}"
+
+fio_engine_works() {
+  local probe rc
+  probe=$(mktemp "${TMPDIR:-/tmp}/fio_probe.XXXXXX")
+  if fio --name=probe --ioengine="$1" --filename="$probe" --size=1m --rw=randread --bs=4k \
+         --iodepth=4 --output-format=terse --output=/dev/null >/dev/null 2>&1; then
+    rc=0
+  else
+    rc=1
+  fi
+  rm -f "$probe"
+  return $rc
+}
+
+if [[ "$ENGINE" == "auto" ]]; then
+  ENGINE=psync
+  for e in io_uring libaio; do
+    if fio_engine_works "$e"; then ENGINE="$e"; break; fi
+  done
+fi
+
+case "$ENGINE" in
+  io_uring)
+    ENGINE_ARGS=(--ioengine=io_uring)
+    if [[ "$FIXEDBUFS" == "1" ]]; then ENGINE_ARGS+=(--fixedbufs --registerfiles); fi
+    ;;
+  libaio)
+    ENGINE_ARGS=(--ioengine=libaio)
+    ;;
+  psync)
+    ENGINE_ARGS=(--ioengine=psync)
+    echo "WARN: psync engine: --iodepth>1 is ignored (one I/O in flight per job)" >&2
+    ;;
+  *)
+    echo "ERROR: unknown ENGINE=$ENGINE (auto|io_uring|libaio|psync)" >&2
+    exit 2
+    ;;
+esac
+
+JOB_ARGS=(--numjobs="$NUMJOBS")
+if [[ "$NUMJOBS" -gt 1 ]]; then JOB_ARGS+=(--group_reporting); fi
+
+echo "fio engine: ${ENGINE_ARGS[*]} ${JOB_ARGS[*]}" >&2
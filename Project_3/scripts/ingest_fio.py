@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Build the data/*.csv tables that plots/ reads from the fio JSON written by
+scripts/collect_*.sh.
+
+Every results/**/*.json file is classified by its name (the --output names the
+collectors use), reduced to a small per-run summary and cached in
+<results>/.ingest_cache.json keyed by path, size and mtime, so re-ingesting
+only parses new or changed files. Repeats of one configuration are files that
+share a name in different subdirectories (results/rep1/qd_..., results/rep2/...)
+or differ only by an _r<k> suffix (qd_randread_4k_qd32_r2.json); their summaries
+are aggregated into mean/std. With a single repeat, std falls back to fio's own
+within-run deviation (iops_stddev, bw_dev, lat_ns.stddev).
+
+Only tables that have at least one source file are rewritten, so hand-maintained
+tables without a collector (working_set_sizes, impact_cache, impact_tlb) are
+left alone.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import statistics
+
+CACHE_NAME = ".ingest_cache.json"
+CACHE_VERSION = 2
+CPU_GHZ = 3.5
+
+# table -> (filename regex, CSV columns)
+TABLES = {
+    "zero_queue": (re.compile(r"^zeroq_(?P<workload>\w+?)_(?P<bs>\d+[kKmM])_qd(?P<qd>\d+)$"),
+                   ["pattern", "workload", "op", "bs", "qd", "iops_mean", "iops_std", "bw_mib_s_mean",
+                    "bw_mib_s_std", "lat_us_mean", "lat_us_std", "cycles_at_3p5ghz_mean",
+                    "cycles_at_3p5ghz_std", "p95_us", "p99_us"]),
+    "bs_random": (re.compile(r"^bs_rand_(?P<bs>\d+[kKmM])$"),
+                  ["bs", "bs_bytes", "iops", "mbps", "lat_us"]),
+    "bs_seq": (re.compile(r"^bs_seq_(?P<bs>\d+[kKmM])$"),
+               ["bs", "bs_bytes", "iops", "mbps", "lat_us"]),
+    "granularity_matrix": (re.compile(r"^gran_(?P<pattern>seq|rand)_(?P<stride>\d+)$"),
+                           ["pattern", "stride_B", "bandwidth_mib_s", "bandwidth_mib_s_std",
+                            "latency_us", "latency_us_std"]),
+    "mix_sweep": (re.compile(r"^mix_(?P<mix>[RW0-9]+)_(?P<bs>\d+[kKmM])_qd(?P<qd>\d+)$"),
+                  ["mix", "bandwidth_mib_s", "bandwidth_mib_s_std", "latency_us", "latency_us_std"]),
+    "qd_tradeoff": (re.compile(r"^qd_randread_(?P<bs>\d+[kKmM])_qd(?P<qd>\d+)$"),
+                    ["qd", "iops", "iops_std", "bandwidth_mib_s", "bandwidth_mib_s_std",
+                     "latency_us", "latency_us_std"]),
+    "tails": (re.compile(r"^tails_randread_(?P<bs>\d+[kKmM])_qd(?P<qd>\d+)$"),
+              ["qd", "p50_us", "p95_us", "p99_us", "p999_us"]),
+}
+
+MIX_ORDER = ["R100", "R70W30", "R50W50", "W100"]
+REPEAT_RE = re.compile(r"_r\d+$")
+
+
+def bs_bytes(bs):
+    mult = {"k": 1 << 10, "m": 1 << 20}[bs[-1].lower()]
+    return int(bs[:-1]) * mult
+
+
+def classify(stem):
+    stem = REPEAT_RE.sub("", stem)
+    for table, (rx, _) in TABLES.items():
+        m = rx.match(stem)
+        if m:
+            return table, stem, m.groupdict()
+    return None, stem, None
+
+
+def load_fio_json(path):
+    """
+    fio may print notes before the JSON document; start at the first '{'.
+    """
+    with open(path, encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    start = text.find("{")
+    if start < 0:
+        raise ValueError("no JSON object")
+    doc, _ = json.JSONDecoder().raw_decode(text, start)
+    return doc
+
+
+def percentile(clat, p):
+    pct = (clat or {}).get("percentile") or {}
+    for k, v in pct.items():
+        if abs(float(k) - p) < 1e-6:
+            return v / 1000.0
+    return None
+
+
+def io_count(job, st):
+    """
+    Completed I/Os of one job direction: total_ios, else the latency sample
+    count, else io_bytes / bs.
+    """
+    ios = st.get("total_ios") or (st.get("lat_ns") or {}).get("N") or (st.get("clat_ns") or {}).get("N")
+    if ios:
+        return int(ios)
+    bs = (job.get("job options") or {}).get("bs", "")
+    if st.get("io_bytes") and re.fullmatch(r"\d+[kKmM]", bs):
+        return int(st["io_bytes"]) // bs_bytes(bs)
+    return 0
+
+
+def summarize(doc):
+    """
+    Collapse one fio run into IOPS, bandwidth, mean latency and clat
+    percentiles (µs) over every job and both directions. Concurrent jobs add
+    IOPS/bandwidth; latency is the I/O-weighted mean; percentiles take the
+    worst job.
+    """
+    s = {"iops": 0.0, "iops_sd": 0.0, "bw_bytes": 0.0, "bw_sd_bytes": 0.0,
+         "lat_us": 0.0, "lat_sd_us": 0.0, "ios": 0}
+    pcts = {50.0: None, 95.0: None, 99.0: None, 99.9: None}
+    lat_sum = 0.0
+    lat_sq = 0.0
+    for job in doc.get("jobs", []):
+        for d in ("read", "write"):
+            st = job.get(d) or {}
+            ios = io_count(job, st)
+            if ios <= 0 and not st.get("iops"):
+                continue
+            s["iops"] += float(st.get("iops", 0.0))
+            s["iops_sd"] += float(st.get("iops_stddev", 0.0))
+            s["bw_bytes"] += float(st.get("bw_bytes", float(st.get("bw", 0.0)) * 1024.0))
+            s["bw_sd_bytes"] += float(st.get("bw_dev", 0.0)) * 1024.0
+            lat = st.get("lat_ns") or {}
+            mean_us = float(lat.get("mean", 0.0)) / 1000.0
+            sd_us = float(lat.get("stddev", 0.0)) / 1000.0
+            lat_sum += ios * mean_us
+            lat_sq += ios * (sd_us * sd_us + mean_us * mean_us)
+            s["ios"] += ios
+            for p in pcts:
+                v = percentile(st.get("clat_ns"), p)
+                if v is not None and (pcts[p] is None or v > pcts[p]):
+                    pcts[p] = v
+    if s["ios"] > 0:
+        s["lat_us"] = lat_sum / s["ios"]
+        s["lat_sd_us"] = max(0.0, lat_sq / s["ios"] - s["lat_us"] ** 2) ** 0.5
+    s["p50_us"], s["p95_us"], s["p99_us"], s["p999_us"] = (pcts[50.0], pcts[95.0], pcts[99.0], pcts[99.9])
+    return s
+
+
+def mean_std(runs, key, within_key=None):
+    vals = [r[key] for r in runs if r.get(key) is not None]
+    if not vals:
+        return None, None
+    if len(vals) > 1:
+        return statistics.mean(vals), statistics.stdev(vals)
+    return vals[0], (runs[0].get(within_key) or 0.0) if within_key else 0.0
+
+
+def r3(x):
+    return "" if x is None else round(x, 3)
+
+
+def build_rows(table, groups):
+    """
+    groups: {(stem, params-tuple): [summary, ...]} for one table.
+    """
+    rows = []
+    for (stem, params), runs in groups.items():
+        p = dict(params)
+        iops, iops_sd = mean_std(runs, "iops", "iops_sd")
+        bw, bw_sd = mean_std(runs, "bw_bytes", "bw_sd_bytes")
+        lat, lat_sd = mean_std(runs, "lat_us", "lat_sd_us")
+        mib = float(1 << 20)
+        if table == "zero_queue":
+            wl = p["workload"]
+            p95, _ = mean_std(runs, "p95_us")
+            p99, _ = mean_std(runs, "p99_us")
+            rows.append({
+                "pattern": "random" if wl.startswith("rand") else "sequential",
+                "workload": wl, "op": "write" if "write" in wl else "read",
+                "bs": p["bs"].lower(), "qd": int(p["qd"]),
+                "iops_mean": r3(iops), "iops_std": r3(iops_sd),
+                "bw_mib_s_mean": r3(bw / mib), "bw_mib_s_std": r3(bw_sd / mib),
+                "lat_us_mean": r3(lat), "lat_us_std": r3(lat_sd),
+                "cycles_at_3p5ghz_mean": round(lat * CPU_GHZ * 1000.0),
+                "cycles_at_3p5ghz_std": round(lat_sd * CPU_GHZ * 1000.0),
+                "p95_us": r3(p95), "p99_us": r3(p99),
+            })
+        elif table in ("bs_random", "bs_seq"):
+            rows.append({"bs": p["bs"].lower(), "bs_bytes": bs_bytes(p["bs"]), "iops": r3(iops),
+                         "mbps": r3(bw / 1e6), "lat_us": r3(lat)})
+        elif table == "granularity_matrix":
+            rows.append({"pattern": p["pattern"], "stride_B": int(p["stride"]),
+                         "bandwidth_mib_s": r3(bw / mib), "bandwidth_mib_s_std": r3(bw_sd / mib),
+                         "latency_us": r3(lat), "latency_us_std": r3(lat_sd)})
+        elif table == "mix_sweep":
+            rows.append({"mix": p["mix"], "bandwidth_mib_s": r3(bw / mib),
+                         "bandwidth_mib_s_std": r3(bw_sd / mib),
+                         "latency_us": r3(lat), "latency_us_std": r3(lat_sd)})
+        elif table == "qd_tradeoff":
+            rows.append({"qd": int(p["qd"]), "iops": r3(iops), "iops_std": r3(iops_sd),
+                         "bandwidth_mib_s": r3(bw / mib), "bandwidth_mib_s_std": r3(bw_sd / mib),
+                         "latency_us": r3(lat), "latency_us_std": r3(lat_sd)})
+        elif table == "tails":
+            row = {"qd": int(p["qd"])}
+            for k in ("p50_us", "p95_us", "p99_us", "p999_us"):
+                row[k] = r3(mean_std(runs, k)[0])
+            rows.append(row)
+
+    if table == "zero_queue":
+        rows.sort(key=lambda r: (r["pattern"] != "random", r["bs"], r["op"]))
+    elif table in ("bs_random", "bs_seq"):
+        rows.sort(key=lambda r: r["bs_bytes"])
+    elif table == "granularity_matrix":
+        rows.sort(key=lambda r: (r["pattern"] != "seq", r["stride_B"]))
+    elif table == "mix_sweep":
+        rows.sort(key=lambda r: MIX_ORDER.index(r["mix"]) if r["mix"] in MIX_ORDER else len(MIX_ORDER))
+    else:
+        rows.sort(key=lambda r: r["qd"])
+    return rows
+
+
+def load_cache(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") == CACHE_VERSION:
+            return cache["files"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def ingest(results, data, force=False):
+    cache_path = os.path.join(results, CACHE_NAME)
+    cache = {} if force else load_cache(cache_path)
+    new_cache = {}
+    parsed = skipped = 0
+    groups = {t: {} for t in TABLES}
+
+    for root, _, files in os.walk(results):
+        for name in sorted(files):
+            if not name.endswith(".json") or name == CACHE_NAME:
+                continue
+            table, stem, params = classify(name[:-5])
+            if table is None:
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, results)
+            st = os.stat(path)
+            sig = [st.st_size, st.st_mtime_ns]
+            hit = cache.get(rel)
+            if hit and hit["sig"] == sig:
+                summary = hit["summary"]
+                skipped += 1
+            else:
+                try:
+                    summary = summarize(load_fio_json(path))
+                except (OSError, ValueError) as e:
+                    print(f"[skip] {rel}: {e}")
+                    continue
+                parsed += 1
+            new_cache[rel] = {"sig": sig, "summary": summary}
+            key = (stem, tuple(sorted(params.items())))
+            groups[table].setdefault(key, []).append(summary)
+
+    os.makedirs(data, exist_ok=True)
+    for table, (_, cols) in TABLES.items():
+        if not groups[table]:
+            continue
+        rows = build_rows(table, groups[table])
+        out = os.path.join(data, f"{table}.csv")
+        with open(out, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=cols)
+            w.writeheader()
+            w.writerows(rows)
+        n = sum(len(v) for v in groups[table].values())
+        print(f"wrote {out} ({len(rows)} rows from {n} runs)")
+
+    tmp = cache_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "files": new_cache}, f)
+    os.replace(tmp, cache_path)
+    print(f"parsed {parsed} fio JSON files, {skipped} unchanged")
+
+
+if __name__ == "__main__":
+    a = argparse.ArgumentParser()
+    a.add_argument("--results", default="results")
+    a.add_argument("--data", default="data")
+    a.add_argument("--force", action="store_true", help="re-parse every file, ignoring the cache")
+    A = a.parse_args()
+    ingest(A.results, A.data, A.force)
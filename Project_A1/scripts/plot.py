@@ -13,8 +13,8 @@ def make_label(row: pd.Series) -> str:
         base = "row"
 
     parts = []
-    for col in ["case", "mode", "pattern", "stride_elems", "threads", "pinned", "thp"]:
-        if col in row and pd.notna(row[col]) and str(row[col]).strip() != "":
+    for col in ["case", "mode", "gen", "pattern", "stride_elems", "pages", "threads", "pinned", "thp"]:
+        if col in row and pd.notna(row[col]) and str(row[col]).strip() not in ("", "none"):
             parts.append(f"{col}={row[col]}")
     if parts:
         return base + " (" + ", ".join(parts) + ")"
@@ -37,10 +37,35 @@ def plot_with_errorbars(df: pd.DataFrame, ycol: str, sdcol: str, ylabel: str, ti
     plt.savefig(outpath, dpi=200)
     plt.close(fig)
 
+def plot_c2c_heatmap(matrix_csv: str, outpath: str):
+    """
+    Heatmap of the c2c round-trip matrix (rows: initiating CPU, columns:
+    responding CPU). SMT siblings, cores of one package and cross-package
+    pairs show up as blocks.
+    """
+    m = pd.read_csv(matrix_csv, index_col="cpu")
+    vals = m.to_numpy(dtype=float)
+    n = len(m.index)
+
+    fig = plt.figure(figsize=(max(5, 0.35 * n + 2), max(4, 0.35 * n + 1)))
+    im = plt.imshow(vals, cmap="viridis", interpolation="nearest")
+    plt.colorbar(im, label="Round trip (ns)")
+    step = max(1, n // 32)
+    plt.xticks(range(0, n, step), list(m.columns)[::step], rotation=90)
+    plt.yticks(range(0, n, step), list(m.index)[::step])
+    plt.xlabel("Responding CPU")
+    plt.ylabel("Initiating CPU")
+    plt.title("Core-to-core cache-line round trip")
+    plt.tight_layout()
+    plt.savefig(outpath, dpi=200)
+    plt.close(fig)
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--csv", default="results.csv")
     ap.add_argument("--outdir", default="plots")
+    ap.add_argument("--c2c", default=None,
+                    help="c2c round-trip matrix (default: c2c_matrix.csv next to --csv)")
     args = ap.parse_args()
 
     df = pd.read_csv(args.csv)
@@ -71,6 +96,10 @@ def main():
             outpath=os.path.join(args.outdir, "perf_cycles.png"),
         )
 
+    c2c = args.c2c or os.path.join(os.path.dirname(os.path.abspath(args.csv)), "c2c_matrix.csv")
+    if os.path.exists(c2c):
+        plot_c2c_heatmap(c2c, os.path.join(args.outdir, "c2c_latency_heatmap.png"))
+
     print(f"Wrote plots into: {args.outdir}/")
 
 if __name__ == "__main__":
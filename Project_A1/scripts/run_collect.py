@@ -1,20 +1,63 @@
 #!/usr/bin/env python3
 import argparse
+import contextlib
 import csv
+import functools
+import math
 import os
 import re
 import shutil
 import statistics
 import subprocess
+import sys
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from bench_client import BenchServer  # noqa: E402
+from perf_events import PerfCounters, PerfUnavailable  # noqa: E402
+
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
 os.chdir(ROOT_DIR)
 
+@functools.lru_cache(maxsize=None)
 def has_perf():
     return shutil.which("perf") is not None
 
+def resolve_counter_backend(choice):
+    """
+    Pick the counter backend once: "syscall" (perf_event_open group opened per
+    experiment), "perf" (wrap every run in perf stat) or "none".
+    "auto" prefers syscall and falls back when perf_event_open is restricted.
+    """
+    if choice in ("auto", "syscall"):
+        try:
+            PerfCounters().close()
+            return "syscall"
+        except PerfUnavailable as e:
+            if choice == "syscall":
+                raise SystemExit(f"--counters syscall: {e}")
+            print(f"NOTE: {e}; falling back", flush=True)
+    if choice in ("auto", "perf") and has_perf():
+        return "perf"
+    return "none"
+
+def open_counters(backend, pid=0):
+    """
+    Per-experiment counter handle for run_once(); pid attaches the group to a
+    resident --serve process instead of the children of this one.
+    """
+    if backend == "syscall":
+        return PerfCounters(pid=pid)
+    return backend
+
+def serving(binary, enabled):
+    """
+    Context manager yielding a resident BenchServer for binary, or None when
+    --no-serve is given (every run is then a fresh process).
+    """
+    return BenchServer([binary]) if enabled else contextlib.nullcontext()
+
 KV_RE = re.compile(r'(\w+)=(".*?"|[^\s]+)')
 
 def parse_kv(stdout: str):
@@ -29,19 +72,45 @@ def parse_kv(stdout: str):
         kv[k] = v
     return kv
 
-def run_once(cmd):
+def run_once(cmd, counters=None, server=None):
     """
     Run cmd exactly once.
-    If perf exists, wrap it and parse:
-      - cycles:u
-      - seconds time elapsed
-    Returns (stdout_kv, cycles_or_None, perf_elapsed_or_None, stderr_snip)
+    counters is what open_counters() returned:
+      - PerfCounters: read the group around the child (all events, wall time)
+      - "perf": wrap in perf stat and parse cycles:u / seconds time elapsed
+      - anything else: no counters
+    With a server (BenchServer for cmd[0]) the run goes to the resident
+    process instead: cmd[1:] are sent as one "run" command, and the counters
+    and wall time cover that run only, not process start-up or dataset setup
+    already done by an earlier run.
+    Returns (stdout_kv, counts_dict, elapsed_or_None, stderr_snip)
     """
-    cycles = None
-    pelapsed = None
-    stderr_note = ""
+    if server is not None:
+        counts = {}
+        t0 = time.perf_counter()
+        if isinstance(counters, PerfCounters):
+            out, counts = counters.measure(lambda: server.run(cmd[1:]))
+        else:
+            out = server.run(cmd[1:])
+        elapsed = time.perf_counter() - t0 if isinstance(counters, PerfCounters) else None
+        return parse_kv(out.strip()), counts, elapsed, server.stderr().strip()[:300]
+
+    if isinstance(counters, PerfCounters):
+        t0 = time.perf_counter()
+        p, counts = counters.measure(
+            lambda: subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True))
+        elapsed = time.perf_counter() - t0
+        out = (p.stdout or "").strip()
+        err = (p.stderr or "").strip()
+
+        if p.returncode != 0:
+            raise RuntimeError(f"Command failed: {cmd}\nstdout={out}\nstderr={err}")
 
-    if has_perf():
+        return parse_kv(out), counts, elapsed, err[:300]
+
+    if counters == "perf":
+        counts = {}
+        pelapsed = None
         perf_cmd = ["perf", "stat", "-e", "cycles:u", "--"] + cmd
         p = subprocess.run(perf_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
         out = (p.stdout or "").strip()
@@ -52,14 +121,13 @@ def run_once(cmd):
 
         m = re.search(r'\s([0-9,]+)\s+cycles:u', err)
         if m:
-            cycles = int(m.group(1).replace(",", ""))
+            counts["cycles"] = int(m.group(1).replace(",", ""))
 
         m2 = re.search(r'\s([0-9.]+)\s+seconds time elapsed', err)
         if m2:
             pelapsed = float(m2.group(1))
 
-        stderr_note = err[:300]
-        return parse_kv(out), cycles, pelapsed, stderr_note
+        return parse_kv(out), counts, pelapsed, err[:300]
 
     p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     out = (p.stdout or "").strip()
@@ -68,7 +136,7 @@ def run_once(cmd):
     if p.returncode != 0:
         raise RuntimeError(f"Command failed: {cmd}\nstdout={out}\nstderr={err}")
 
-    return parse_kv(out), None, None, err[:300]
+    return parse_kv(out), {}, None, err[:300]
 
 def mean_sd(vals):
     if not vals:
@@ -77,34 +145,58 @@ def mean_sd(vals):
         return vals[0], 0.0
     return statistics.mean(vals), statistics.pstdev(vals)
 
-def collect(cmd, repeats, warmup_s, extra_cols):
-    """
-    Repeats running cmd and aggregates metrics.
-    """
-    if warmup_s > 0:
-        t_end = time.time() + warmup_s
-        while time.time() < t_end:
-            try:
-                run_once(cmd)
-            except Exception:
-                pass
-            time.sleep(0.05)
+# Two-sided 95% Student-t critical values for df = 1..30; 1.96 beyond that.
+T95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+       2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+       2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
 
-    kvs = []
-    cycles_list = []
-    pelapsed_list = []
-    stderr_notes = []
+PRIMARY_METRICS = ["touches_per_s", "accesses_per_s", "seconds"]
 
-    for _ in range(repeats):
-        kv, cycles, pelapsed, note = run_once(cmd)
-        kvs.append(kv)
-        if cycles is not None:
-            cycles_list.append(cycles)
-        if pelapsed is not None:
-            pelapsed_list.append(pelapsed)
-        if note:
-            stderr_notes.append(note)
-        time.sleep(0.05)
+def ci95_rel(vals):
+    """
+    Half-width of the 95% CI of the mean, relative to the mean.
+    Returns inf when it cannot be estimated yet.
+    """
+    n = len(vals)
+    if n < 2:
+        return math.inf
+    m = statistics.mean(vals)
+    if m == 0:
+        return math.inf
+    t = T95[n - 2] if n - 1 <= len(T95) else 1.96
+    return t * statistics.stdev(vals) / math.sqrt(n) / abs(m)
+
+def warmup_cut(vals, keep):
+    """
+    Number of leading samples to treat as warmup: the first sample is dropped
+    while it sits outside median +/- 3*MAD of the samples after it, always
+    leaving at least `keep` samples.
+    """
+    cut = 0
+    while len(vals) - cut > keep:
+        rest = vals[cut + 1:]
+        med = statistics.median(rest)
+        mad = statistics.median([abs(v - med) for v in rest])
+        mad = max(mad, 1e-3 * abs(med))
+        if abs(vals[cut] - med) <= 3.0 * mad:
+            break
+        cut += 1
+    return cut
+
+def primary_metric(kv):
+    for base in PRIMARY_METRICS:
+        if base in kv:
+            return base
+    return None
+
+def aggregate(samples, extra_cols):
+    """
+    Build one CSV row from a list of run_once() results.
+    """
+    kvs = [kv for kv, _, _, _ in samples]
+    counts = [c for _, c, _, _ in samples]
+    pelapsed_list = [e for _, _, e, _ in samples if e is not None]
+    stderr_notes = [n for _, _, _, n in samples if n]
 
     row = dict(extra_cols)
 
@@ -125,12 +217,16 @@ def collect(cmd, repeats, warmup_s, extra_cols):
             row[f"{base}_mean"] = m
             row[f"{base}_sd"] = sd
 
-    if cycles_list:
-        row["cycles_mean"] = statistics.mean(cycles_list)
-        row["cycles_sd"] = statistics.pstdev(cycles_list) if len(cycles_list) > 1 else 0.0
-    else:
+    events = []
+    for c in counts:
+        events += [e for e in c if e not in events]
+    if "cycles" not in events:
         row["cycles_mean"] = "NA"
         row["cycles_sd"] = "NA"
+    for ev in events:
+        vals = [c[ev] for c in counts if ev in c]
+        row[f"{ev}_mean"] = statistics.mean(vals)
+        row[f"{ev}_sd"] = statistics.pstdev(vals) if len(vals) > 1 else 0.0
 
     if pelapsed_list:
         row["perf_elapsed_mean"] = statistics.mean(pelapsed_list)
@@ -139,46 +235,179 @@ def collect(cmd, repeats, warmup_s, extra_cols):
         row["perf_elapsed_mean"] = "NA"
         row["perf_elapsed_sd"] = "NA"
 
+    row["runs"] = len(samples)
     row["stderr_note"] = (" | ".join(stderr_notes))[:300] if stderr_notes else ""
     return row
 
+def collect(cmd, repeats, warmup_s, extra_cols, counters=None, server=None):
+    """
+    Repeats running cmd and aggregates metrics.
+    """
+    if warmup_s > 0:
+        t_end = time.time() + warmup_s
+        while time.time() < t_end:
+            try:
+                run_once(cmd, counters, server)
+            except Exception:
+                pass
+            time.sleep(0.05)
+
+    samples = []
+    for _ in range(repeats):
+        samples.append(run_once(cmd, counters, server))
+        time.sleep(0.05)
+
+    return aggregate(samples, extra_cols)
+
+def collect_adaptive(cmd, target_ci, min_runs, max_runs, extra_cols, counters=None, server=None):
+    """
+    Run cmd until the 95% CI of its primary metric (touches_per_s,
+    accesses_per_s or seconds) is within target_ci of the mean, or max_runs
+    is reached. Leading samples that look like warmup are discarded instead
+    of spending a fixed wall-clock warmup on every experiment.
+    """
+    samples = []
+    vals = []
+    metric = None
+    cut = 0
+    rel = math.inf
+
+    while len(samples) < max_runs:
+        sample = run_once(cmd, counters, server)
+        samples.append(sample)
+        if metric is None:
+            metric = primary_metric(sample[0])
+        try:
+            vals.append(float(sample[0][metric]))
+        except (KeyError, TypeError, ValueError):
+            vals.append(math.nan)
+        time.sleep(0.05)
+
+        if len(vals) < min_runs or any(math.isnan(v) for v in vals):
+            continue
+        cut = warmup_cut(vals, min_runs)
+        rel = ci95_rel(vals[cut:])
+        if rel <= target_ci:
+            break
+
+    row = aggregate(samples[cut:], extra_cols)
+    row["primary_metric"] = metric or "NA"
+    row["ci95_rel"] = rel if math.isfinite(rel) else "NA"
+    row["warmup_dropped"] = cut
+    return row
+
+def collect_c2c(matrix_path, rounds, samples):
+    """
+    One run of the core-to-core ping-pong over every allowed CPU pair. The
+    binary already takes the median of `samples` timed samples per pair, so
+    it runs once; the N x N matrix goes to matrix_path and the summary
+    (min/median/max, SMT-sibling / same-package / cross-package means) to the row.
+    """
+    cmd = ["./c2c", "--rounds", str(rounds), "--samples", str(samples), "--matrix", matrix_path]
+    row = aggregate([run_once(cmd)], {"experiment": "c2c"})
+    row["matrix"] = matrix_path
+    return row
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--repeats", type=int, default=7)
     ap.add_argument("--warmup", type=float, default=1.0)
     ap.add_argument("--out", default="results.csv")
+    ap.add_argument("--adaptive", action="store_true",
+                    help="sample until the 95%% CI of the primary metric is tight instead of a fixed --repeats")
+    ap.add_argument("--target-ci", type=float, default=0.02,
+                    help="adaptive: stop when CI half-width / mean <= this (default 0.02)")
+    ap.add_argument("--min-runs", type=int, default=3)
+    ap.add_argument("--max-runs", type=int, default=30)
+    ap.add_argument("--counters", choices=["auto", "syscall", "perf", "none"], default="auto",
+                    help="counter backend: perf_event_open group, perf stat wrapper, or none")
+    ap.add_argument("--no-serve", action="store_true",
+                    help="spawn mmu/prefetch per run instead of keeping one --serve process with resident datasets")
+    ap.add_argument("--c2c-rounds", type=int, default=20000,
+                    help="round trips per timed sample of each CPU pair in the c2c matrix")
+    ap.add_argument("--no-c2c", action="store_true",
+                    help="skip the c2c matrix (N*(N-1) CPU pairs, (repeats+1) samples of --c2c-rounds each)")
+    ap.add_argument("--pages", default="4k,thp,hugetlb",
+                    help="page-size axis of the mmu stride sweep (default, 4k, thp, hugetlb); "
+                         "hugetlb falls back to thp unless vm.nr_hugepages is reserved")
     args = ap.parse_args()
 
+    backend = resolve_counter_backend(args.counters)
+    print(f"Counter backend: {backend}", flush=True)
+    serve = not args.no_serve
+    if serve and backend == "perf":
+        # perf stat wraps a whole process, so it cannot scope to one served run
+        print("NOTE: perf stat backend; running mmu/prefetch as fresh processes", flush=True)
+        serve = False
+
+    def collect_fn(cmd, extra_cols, server=None):
+        # one counter group per experiment, shared by its warmup and repetitions
+        counters = open_counters(backend, server.pid if server else 0)
+        try:
+            if args.adaptive:
+                row = collect_adaptive(cmd, args.target_ci, args.min_runs, args.max_runs, extra_cols,
+                                       counters, server)
+            else:
+                row = collect(cmd, args.repeats, args.warmup, extra_cols, counters, server)
+        finally:
+            if isinstance(counters, PerfCounters):
+                counters.close()
+        row["counters"] = backend
+        row["served"] = 1 if server else 0
+        return row
+
     rows = []
 
     for pinned in [0, 1]:
         cmd = ["./affinity", "--threads", "2", "--iters", "300000000", "--pinned", str(pinned)]
-        rows.append(collect(cmd, args.repeats, args.warmup, {
+        rows.append(collect_fn(cmd, {
             "experiment": "affinity",
             "pinned": pinned
         }))
 
     for case in ["same", "spread"]:
         cmd = ["./smt", case, "30000000"]
-        rows.append(collect(cmd, args.repeats, args.warmup, {
+        rows.append(collect_fn(cmd, {
             "experiment": "smt",
             "case": case
         }))
 
-    for stride in [16, 64, 256, 1024]:
-        cmd = ["./mmu", "--mb", "256", "--stride", str(stride), "--reps", "5"]
-        rows.append(collect(cmd, args.repeats, args.warmup, {
-            "experiment": "mmu",
-            "stride_elems": stride
-        }))
-
-
-    for mode in ["seq", "rand_idx", "ptr_chase"]:
-        cmd = ["./prefetch", mode, "268435456", "200000000"]
-        rows.append(collect(cmd, args.repeats, args.warmup, {
-            "experiment": "prefetch",
-            "mode": mode
-        }))
+    # The 256 MB array is allocated and first-touched once per page size for
+    # all strides. mmu reports the backing it verified in /proc/self/smaps
+    # (page_backing, huge_pct) next to the requested pages.
+    with serving("./mmu", serve) as srv:
+        for pages in [p.strip() for p in args.pages.split(",") if p.strip()]:
+            for stride in [16, 64, 256, 1024]:
+                cmd = ["./mmu", "--mb", "256", "--stride", str(stride), "--reps", "5", "--pages", pages]
+                rows.append(collect_fn(cmd, {
+                    "experiment": "mmu",
+                    "stride_elems": stride,
+                    "pages": pages
+                }, srv))
+
+
+    # The array, the 200M-entry index vector and the chase cycle are built once.
+    # rand_idx runs with both index generators: gen=table reads the
+    # precomputed index vector, gen=hash computes the indices in registers.
+    with serving("./prefetch", serve) as srv:
+        for mode, gen in [("seq", "none"), ("rand_idx", "table"), ("rand_idx", "hash"), ("ptr_chase", "none")]:
+            cmd = ["./prefetch", mode, "268435456", "200000000"] + ([gen] if mode == "rand_idx" else [])
+            rows.append(collect_fn(cmd, {
+                "experiment": "prefetch",
+                "mode": mode,
+                "gen": gen
+            }, srv))
+
+    matrix_path = os.path.join(os.path.dirname(os.path.abspath(args.out)), "c2c_matrix.csv")
+    if not args.no_c2c and not os.path.exists("./c2c"):
+        print("NOTE: c2c skipped: ./c2c is not built (make c2c)", flush=True)
+    elif not args.no_c2c:
+        try:
+            rows.append(collect_c2c(matrix_path, args.c2c_rounds, args.repeats))
+            print(f"Wrote {matrix_path}", flush=True)
+        except (RuntimeError, OSError) as e:
+            # e.g. a single allowed CPU: there is no pair to measure
+            print(f"NOTE: c2c skipped: {str(e).splitlines()[-1]}", flush=True)
 
     fieldnames = []
     seen = set()
@@ -0,0 +1,169 @@
+// Core-to-core cache-line transfer latency.
+//
+// For every ordered pair (a, b) of CPUs, two threads pinned to a and b bounce
+// one shared cache line: a writes 2r+1 and spins until it reads 2r+2, which b
+// writes as soon as it sees 2r+1. Each round trip moves the line a->b->a, so
+// the time per round is two coherence transfers. Each pair runs one warm-up
+// sample plus --samples timed samples of --rounds round trips; the median
+// sample goes into the matrix.
+//
+// ./c2c [--cpus <list>] [--rounds 20000] [--samples 5] [--matrix c2c_matrix.csv]
+//
+// stdout is one key=value summary line; --matrix writes the N x N round-trip
+// matrix (ns, rows = cpu a, columns = cpu b, empty diagonal).
+#include "topology.h"
+
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <cmath>
+#include <cstdint>
+#include <cstdio>
+#include <cstring>
+#include <iostream>
+#include <thread>
+#include <vector>
+
+static inline uint64_t ns_now() {
+    return (uint64_t)std::chrono::duration_cast<std::chrono::nanoseconds>(
+        std::chrono::steady_clock::now().time_since_epoch()).count();
+}
+
+static inline void cpu_relax() {
+#if defined(__x86_64__) || defined(__i386__)
+    __builtin_ia32_pause();
+#endif
+}
+
+struct alignas(64) SharedLine {
+    std::atomic<uint64_t> v{0};
+    char pad[64 - sizeof(std::atomic<uint64_t>)];
+};
+
+// Median round-trip ns between cpu_a and cpu_b, or -1 if either pin failed.
+static double pingpong_ns(int cpu_a, int cpu_b, uint64_t rounds, int samples) {
+    SharedLine line;
+    std::atomic<int> ready{0};
+    std::atomic<bool> pin_failed{false};
+    const uint64_t total = rounds * (uint64_t)(samples + 1);
+    std::vector<double> per_sample;
+
+    std::thread responder([&] {
+        if (!pin_to_cpu(cpu_b)) pin_failed.store(true);
+        ready.fetch_add(1);
+        while (ready.load(std::memory_order_acquire) < 2) cpu_relax();
+        if (pin_failed.load()) return;
+        for (uint64_t r = 0; r < total; r++) {
+            uint64_t want = 2 * r + 1;
+            while (line.v.load(std::memory_order_acquire) != want) cpu_relax();
+            line.v.store(want + 1, std::memory_order_release);
+        }
+    });
+
+    std::thread initiator([&] {
+        if (!pin_to_cpu(cpu_a)) pin_failed.store(true);
+        ready.fetch_add(1);
+        while (ready.load(std::memory_order_acquire) < 2) cpu_relax();
+        if (pin_failed.load()) return;
+        uint64_t r = 0;
+        for (int s = 0; s <= samples; s++) {
+            uint64_t t0 = ns_now();
+            for (uint64_t i = 0; i < rounds; i++, r++) {
+                line.v.store(2 * r + 1, std::memory_order_release);
+                while (line.v.load(std::memory_order_acquire) != 2 * r + 2) cpu_relax();
+            }
+            uint64_t t1 = ns_now();
+            if (s > 0) per_sample.push_back((double)(t1 - t0) / (double)rounds);  // sample 0 is warm-up
+        }
+    });
+
+    initiator.join();
+    responder.join();
+    if (pin_failed.load() || per_sample.empty()) return -1.0;
+    std::sort(per_sample.begin(), per_sample.end());
+    return per_sample[per_sample.size() / 2];
+}
+
+static double mean_or_nan(const std::vector<double>& v) {
+    if (v.empty()) return std::nan("");
+    double s = 0.0;
+    for (double x : v) s += x;
+    return s / (double)v.size();
+}
+
+int main(int argc, char** argv) {
+    std::vector<int> cpus = allowed_cpus();
+    uint64_t rounds = 20000;
+    int samples = 5;
+    std::string matrix_path;
+
+    for (int i = 1; i < argc; i++) {
+        if (!strcmp(argv[i], "--cpus") && i + 1 < argc) cpus = parse_cpu_list(argv[++i]);
+        else if (!strcmp(argv[i], "--rounds") && i + 1 < argc) rounds = std::stoull(argv[++i]);
+        else if (!strcmp(argv[i], "--samples") && i + 1 < argc) samples = std::max(1, atoi(argv[++i]));
+        else if (!strcmp(argv[i], "--matrix") && i + 1 < argc) matrix_path = argv[++i];
+    }
+    if (cpus.size() < 2) {
+        std::cerr << "ERROR: need at least two CPUs (got " << cpus.size() << ")\n";
+        return 2;
+    }
+
+    const size_t n = cpus.size();
+    std::vector<double> rt(n * n, -1.0);
+    std::vector<double> all, smt, same_pkg, cross_pkg;
+    int pin_failures = 0;
+
+    for (size_t i = 0; i < n; i++) {
+        for (size_t j = 0; j < n; j++) {
+            if (i == j) continue;
+            double ns = pingpong_ns(cpus[i], cpus[j], rounds, samples);
+            rt[i * n + j] = ns;
+            if (ns < 0) { pin_failures++; continue; }
+            all.push_back(ns);
+
+            auto ci = core_id_of_cpu(cpus[i]), cj = core_id_of_cpu(cpus[j]);
+            auto pi = pkg_id_of_cpu(cpus[i]), pj = pkg_id_of_cpu(cpus[j]);
+            if (!pi || !pj) continue;
+            if (*pi != *pj) cross_pkg.push_back(ns);
+            else if (ci && cj && *ci == *cj) smt.push_back(ns);
+            else same_pkg.push_back(ns);
+        }
+    }
+
+    if (!matrix_path.empty()) {
+        FILE* f = std::fopen(matrix_path.c_str(), "w");
+        if (!f) { std::perror("fopen matrix"); return 3; }
+        std::fprintf(f, "cpu");
+        for (int c : cpus) std::fprintf(f, ",%d", c);
+        std::fprintf(f, "\n");
+        for (size_t i = 0; i < n; i++) {
+            std::fprintf(f, "%d", cpus[i]);
+            for (size_t j = 0; j < n; j++) {
+                double v = rt[i * n + j];
+                if (v < 0) std::fprintf(f, ",");
+                else std::fprintf(f, ",%.2f", v);
+            }
+            std::fprintf(f, "\n");
+        }
+        std::fclose(f);
+    }
+
+    std::vector<double> sorted = all;
+    std::sort(sorted.begin(), sorted.end());
+    auto pct = [&](double p) { return sorted.empty() ? std::nan("") : sorted[(size_t)(p * (sorted.size() - 1))]; };
+
+    std::cout << "feature=c2c"
+              << " cpus=" << n
+              << " pairs=" << all.size()
+              << " pin_failures=" << pin_failures
+              << " rounds=" << rounds
+              << " samples=" << samples
+              << " rt_min_ns=" << pct(0.0)
+              << " rt_median_ns=" << pct(0.5)
+              << " rt_max_ns=" << pct(1.0)
+              << " smt_rt_ns=" << mean_or_nan(smt)
+              << " same_pkg_rt_ns=" << mean_or_nan(same_pkg)
+              << " cross_pkg_rt_ns=" << mean_or_nan(cross_pkg)
+              << "\n";
+    return 0;
+}
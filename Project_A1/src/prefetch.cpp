@@ -9,6 +9,8 @@
 #include <string>
 #include <vector>
 
+#include "bench_serve.hpp"
+
 static inline uint64_t ns_now() {
     return (uint64_t)std::chrono::duration_cast<std::chrono::nanoseconds>(
                std::chrono::steady_clock::now().time_since_epoch())
@@ -17,20 +19,69 @@ static inline uint64_t ns_now() {
 
 static void usage(const char* prog) {
     std::cerr
-        << "Usage: " << prog << " [mode] [bytes] [iters]\n"
+        << "Usage: " << prog << " [mode] [bytes] [iters] [gen]\n"
         << "  mode: seq | rand_idx | ptr_chase\n"
         << "  bytes: size of array (default 64MiB)\n"
-        << "  iters: number of element accesses (default 200000000)\n";
+        << "  iters: number of element accesses (default 200000000)\n"
+        << "  gen: rand_idx index source, table | hash (default table)\n";
+}
+
+// gen=hash: the i-th random index is computed in registers as a counter-based
+// hash of i (splitmix64 finalizer), masked onto [0, n) when n is a power of two
+// and mapped with a multiply-high otherwise. No index array exists, so setup
+// is free, memory use does not grow with iters, and the only stream through
+// the caches/TLB is the data array itself.
+static constexpr uint64_t HASH_SEED = 12345;
+static constexpr unsigned HASH_BATCH = 8;
+
+static inline uint64_t splitmix64(uint64_t x) {
+    x += 0x9e3779b97f4a7c15ull;
+    x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9ull;
+    x = (x ^ (x >> 27)) * 0x94d049bb133111ebull;
+    return x ^ (x >> 31);
+}
+
+// HASH_BATCH independent loads per step, each into its own accumulator, so
+// no add chain limits how many misses the core keeps in flight.
+template <class Range>
+static uint64_t sum_hashed(const uint64_t* a, uint64_t iters, Range range) {
+    uint64_t acc[HASH_BATCH] = {};
+    uint64_t i = 0;
+    for (; i + HASH_BATCH <= iters; i += HASH_BATCH) {
+#pragma GCC unroll 8
+        for (unsigned j = 0; j < HASH_BATCH; j++) acc[j] += a[range(splitmix64((i + j) ^ HASH_SEED))];
+    }
+    uint64_t sum = 0;
+    for (; i < iters; i++) sum += a[range(splitmix64(i ^ HASH_SEED))];
+    for (unsigned j = 0; j < HASH_BATCH; j++) sum += acc[j];
+    return sum;
 }
 
 static volatile uint64_t sink = 0;
 
-int main(int argc, char** argv) {
+// Datasets kept resident between --serve runs: the array (by size), the
+// random index vector (by size and iters) and the pointer-chase cycle (by size).
+// All are built from the same fixed seed, so a reused one is identical to a
+// freshly generated one.
+static std::vector<uint64_t> a;
+static std::vector<uint32_t> idx;
+static std::vector<uint32_t> next;
+static size_t idx_n = 0, next_n = 0;
+
+static void reset_datasets() {
+    std::vector<uint64_t>().swap(a);
+    std::vector<uint32_t>().swap(idx);
+    std::vector<uint32_t>().swap(next);
+    idx_n = next_n = 0;
+}
+
+static int run(int argc, char** argv) {
     std::string mode = (argc >= 2) ? argv[1] : "seq";
     size_t bytes = (argc >= 3) ? (size_t)std::stoull(argv[2]) : (64ull << 20);
     uint64_t iters = (argc >= 4) ? (uint64_t)std::stoull(argv[3]) : 200000000ull;
+    std::string gen = (argc >= 5) ? argv[4] : "table";
 
-    if (mode != "seq" && mode != "rand_idx" && mode != "ptr_chase") {
+    if ((mode != "seq" && mode != "rand_idx" && mode != "ptr_chase") || (gen != "table" && gen != "hash")) {
         usage(argv[0]);
         return 2;
     }
@@ -41,26 +92,28 @@ int main(int argc, char** argv) {
         return 2;
     }
 
-    std::vector<uint64_t> a(n);
-    for (size_t i = 0; i < n; i++) a[i] = (uint64_t)i * 1315423911ull;
-
-
-    std::vector<uint32_t> idx;
-
-    std::vector<uint32_t> next;
+    if (a.size() != n) {
+        std::vector<uint64_t>().swap(a);
+        a.resize(n);
+        for (size_t i = 0; i < n; i++) a[i] = (uint64_t)i * 1315423911ull;
+    }
 
     std::mt19937 rng(12345);
-    if (mode == "rand_idx") {
+    if (mode == "rand_idx" && gen == "table" && (idx_n != n || idx.size() != (size_t)iters)) {
+        std::vector<uint32_t>().swap(idx);
         idx.resize((size_t)iters);
         std::uniform_int_distribution<uint32_t> dist(0u, (uint32_t)(n - 1));
         for (size_t i = 0; i < idx.size(); i++) idx[i] = dist(rng);
-    } else if (mode == "ptr_chase") {
+        idx_n = n;
+    } else if (mode == "ptr_chase" && next_n != n) {
+        std::vector<uint32_t>().swap(next);
         next.resize(n);
         std::vector<uint32_t> perm(n);
         std::iota(perm.begin(), perm.end(), 0u);
         std::shuffle(perm.begin(), perm.end(), rng);
         for (size_t i = 0; i < n - 1; i++) next[perm[i]] = perm[i + 1];
         next[perm[n - 1]] = perm[0];
+        next_n = n;
     }
 
 
@@ -79,6 +132,11 @@ int main(int argc, char** argv) {
             p++;
             if (p == n) p = 0;
         }
+    } else if (mode == "rand_idx" && gen == "hash") {
+        if ((n & (n - 1)) == 0)
+            sum = sum_hashed(a.data(), iters, [m = n - 1](uint64_t h) { return (size_t)(h & m); });
+        else
+            sum = sum_hashed(a.data(), iters, [n](uint64_t h) { return (size_t)(((unsigned __int128)h * n) >> 64); });
     } else if (mode == "rand_idx") {
         for (uint64_t i = 0; i < iters; i++) {
             sum += a[idx[(size_t)i]];
@@ -102,7 +160,18 @@ int main(int argc, char** argv) {
         << "mode=" << mode << " "
         << "bytes=" << bytes << " "
         << "iters=" << iters << " "
+        << "gen=" << (mode == "rand_idx" ? gen : "none") << " "
         << "seconds=" << seconds << "\n";
 
     return 0;
 }
+
+int main(int argc, char** argv) {
+    if (serve_requested(argc, argv)) {
+        return serve_loop(argv[0], run, reset_datasets,
+            [](std::ostream& o) { o << " array_bytes=" << a.size() * sizeof(uint64_t)
+                                    << " idx_entries=" << idx.size() << " next_entries=" << next.size(); },
+            [] { return (uint64_t)(a.size() * sizeof(uint64_t) + (idx.size() + next.size()) * sizeof(uint32_t)); });
+    }
+    return run(argc, argv);
+}
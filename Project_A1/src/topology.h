@@ -0,0 +1,91 @@
+#pragma once
+// CPU topology and pinning helpers (sysfs), shared by smt.cpp and c2c.cpp.
+#ifndef _GNU_SOURCE
+#define _GNU_SOURCE
+#endif
+
+#include <sched.h>
+#include <unistd.h>
+
+#include <fstream>
+#include <optional>
+#include <sstream>
+#include <string>
+#include <utility>
+#include <vector>
+
+static inline bool pin_to_cpu(int cpu) {
+    cpu_set_t set;
+    CPU_ZERO(&set);
+    CPU_SET(cpu, &set);
+    return sched_setaffinity(0, sizeof(set), &set) == 0;
+}
+
+static inline int cpu_count_online() {
+    long n = sysconf(_SC_NPROCESSORS_ONLN);
+    return (n > 0) ? (int)n : 1;
+}
+
+static inline std::optional<int> read_int_file(const std::string& path) {
+    std::ifstream f(path);
+    if (!f.is_open()) return std::nullopt;
+    int v;
+    f >> v;
+    if (!f.good()) return std::nullopt;
+    return v;
+}
+
+static inline std::optional<std::string> read_str_file(const std::string& path) {
+    std::ifstream f(path);
+    if (!f.is_open()) return std::nullopt;
+    std::string s;
+    std::getline(f, s);
+    if (!f.good() && s.empty()) return std::nullopt;
+    return s;
+}
+
+static inline std::optional<int> core_id_of_cpu(int cpu) {
+    return read_int_file("/sys/devices/system/cpu/cpu" + std::to_string(cpu) + "/topology/core_id");
+}
+
+static inline std::optional<int> pkg_id_of_cpu(int cpu) {
+    return read_int_file("/sys/devices/system/cpu/cpu" + std::to_string(cpu) + "/topology/physical_package_id");
+}
+
+static inline std::vector<int> parse_cpu_list(const std::string& s) {
+    std::vector<int> out;
+    std::stringstream ss(s);
+    std::string token;
+    while (std::getline(ss, token, ',')) {
+        if (token.empty()) continue;
+        auto dash = token.find('-');
+        if (dash == std::string::npos) {
+            out.push_back(std::stoi(token));
+        } else {
+            int a = std::stoi(token.substr(0, dash));
+            int b = std::stoi(token.substr(dash + 1));
+            if (a > b) std::swap(a, b);
+            for (int i = a; i <= b; i++) out.push_back(i);
+        }
+    }
+    return out;
+}
+
+static inline std::optional<std::vector<int>> thread_siblings_of_cpu(int cpu) {
+    auto s = read_str_file("/sys/devices/system/cpu/cpu" + std::to_string(cpu) + "/topology/thread_siblings_list");
+    if (!s) return std::nullopt;
+    auto v = parse_cpu_list(*s);
+    if (v.empty()) return std::nullopt;
+    return v;
+}
+
+// CPUs this process may run on (inherited from taskset / the collector).
+static inline std::vector<int> allowed_cpus() {
+    std::vector<int> cpus;
+    cpu_set_t set;
+    CPU_ZERO(&set);
+    if (sched_getaffinity(0, sizeof(set), &set) == 0) {
+        for (int c = 0; c < CPU_SETSIZE; c++) if (CPU_ISSET(c, &set)) cpus.push_back(c);
+    }
+    return cpus;
+}
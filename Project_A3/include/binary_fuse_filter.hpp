@@ -0,0 +1,180 @@
+#pragma once
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <vector>
+#include "hash.hpp"
+#include "util.hpp"
+#include "snapshot.hpp"
+
+// Binary fuse filter (Graf & Lemire, "Binary Fuse Filters: Fast and Smaller
+// Than Xor Filters", 2022), Arity = 3 or 4. Like XorFilter a key's
+// fingerprint is the xor of Arity array cells, but the array is cut into
+// segments and the cells of a key lie in Arity consecutive segments starting
+// at a random one. That peels at ~1.125 (3-wise) / ~1.075 (4-wise) cells per
+// key instead of 1.23, and a key's cells sit close together in memory.
+template <int Arity>
+class BinaryFuseFilter {
+    static_assert(Arity == 3 || Arity == 4, "binary fuse filters are 3- or 4-wise");
+public:
+    explicit BinaryFuseFilter(HashKind hash = HashKind::Splitmix) : hash_(hash) {}
+
+    void build(const std::vector<uint64_t>& keys, int fp_bits, uint64_t seed=1) {
+        fp_bits_ = fp_bits;
+        n_ = keys.size();
+        size_layout(n_);
+        for (int attempt = 0; attempt < 100; attempt++) {
+            h_ = Hasher64(seed + 0x9e3779b97f4a7c15ULL * (uint64_t)attempt, hash_);
+            if (try_build(keys)) { built_ = true; return; }
+        }
+        built_ = false;
+        fp_.clear();
+    }
+
+    inline bool contains(uint64_t key) const {
+        if (!built_) return false;
+        uint64_t h = h_(key);
+        uint32_t p[Arity];
+        positions(h, p);
+        uint16_t r = fp_[p[0]];
+        for (int i = 1; i < Arity; i++) r ^= fp_[p[i]];
+        return r == fp_of(h);
+    }
+
+    inline void contains_batch(const uint64_t* keys, size_t n, uint64_t* out_bits) const {
+        clear_bits(out_bits, n);
+        if (!built_) return;
+        uint64_t h[AMQ_BATCH_GROUP];
+        uint32_t p[AMQ_BATCH_GROUP][Arity];
+        for (size_t g = 0; g < n; g += AMQ_BATCH_GROUP) {
+            size_t m = std::min(n - g, AMQ_BATCH_GROUP);
+            h_.batch(keys + g, m, h);
+            for (size_t i = 0; i < m; i++) {
+                positions(h[i], p[i]);
+                for (int j = 0; j < Arity; j++) prefetch_ro(&fp_[p[i][j]]);
+            }
+            for (size_t i = 0; i < m; i++) {
+                uint16_t r = fp_[p[i][0]];
+                for (int j = 1; j < Arity; j++) r ^= fp_[p[i][j]];
+                if (r == fp_of(h[i])) set_bit(out_bits, g+i);
+            }
+        }
+    }
+
+    double bits_per_entry(uint64_t n) const {
+        return (double)fp_.size() * (double)fp_bits_ / (double)n;
+    }
+
+    // Snapshot (snapshot.hpp); a loaded filter borrows its fingerprints from the mapping.
+    void save(SnapshotWriter& w) const {
+        w.scalar(built_); w.scalar(n_); w.scalar((uint64_t)fp_bits_); w.scalar(h_.seed);
+        w.scalar(segment_length_); w.scalar(segment_count_); w.scalar(array_length_); w.scalar((uint64_t)hash_);
+        w.section(fp_.data(), fp_.size() * sizeof(uint16_t));
+    }
+
+    bool load(const std::shared_ptr<SnapshotMap>& s) {
+        if (s->filter() != (Arity == 3 ? "fuse3" : "fuse4")) return false;
+        built_ = s->scalar(0) != 0;
+        n_ = (size_t)s->scalar(1);
+        fp_bits_ = (int)s->scalar(2);
+        hash_ = (HashKind)s->scalar(7);
+        h_ = Hasher64(s->scalar(3), hash_);
+        segment_length_ = (uint32_t)s->scalar(4);
+        segment_mask_ = segment_length_ - 1;
+        segment_count_ = (uint32_t)s->scalar(5);
+        segment_count_length_ = segment_count_ * segment_length_;
+        array_length_ = (uint32_t)s->scalar(6);
+        return borrow_section(s, 0, built_ ? array_length_ : 0, fp_);
+    }
+
+    uint32_t array_size() const { return array_length_; }
+    int fp_bits() const { return fp_bits_; }
+
+private:
+    // Segment length and array size from the paper's fits (3-wise / 4-wise).
+    void size_layout(size_t n) {
+        double ln = std::log((double)std::max<size_t>(n, 2));
+        int exp = Arity == 3 ? (int)std::floor(ln / std::log(3.33) + 2.25)
+                             : (int)std::floor(ln / std::log(2.91) - 0.5);
+        exp = std::max(2, std::min(18, exp));
+        segment_length_ = 1u << exp;
+        segment_mask_ = segment_length_ - 1;
+        double factor = Arity == 3 ? std::max(1.125, 0.875 + 0.25 * std::log(1e6) / ln)
+                                   : std::max(1.075, 0.77 + 0.305 * std::log(6e5) / ln);
+        uint64_t capacity = (uint64_t)std::llround((double)n * factor);
+        uint64_t segments = (capacity + segment_length_ - 1) / segment_length_;
+        segment_count_ = (uint32_t)std::max<int64_t>(1, (int64_t)segments - (Arity - 1));
+        segment_count_length_ = segment_count_ * segment_length_;
+        array_length_ = (segment_count_ + Arity - 1) * segment_length_;
+    }
+
+    // Cell j of hash h lies in segment (first segment + j); the offsets within
+    // the later segments are perturbed by other bits of h.
+    inline void positions(uint64_t h, uint32_t* p) const {
+        uint32_t p0 = (uint32_t)(((__uint128_t)h * segment_count_length_) >> 64);
+        p[0] = p0;
+        p[1] = (p0 + segment_length_) ^ (uint32_t)((h >> 18) & segment_mask_);
+        p[2] = (p0 + 2 * segment_length_) ^ (uint32_t)(h & segment_mask_);
+        if (Arity == 4) p[Arity - 1] = (p0 + 3 * segment_length_) ^ (uint32_t)((h >> 36) & segment_mask_);
+    }
+
+    inline uint16_t fp_of(uint64_t h) const {
+        return (uint16_t)fingerprint(h ^ (h >> 32), fp_bits_);
+    }
+
+    // Peel the hypergraph of key hashes: a cell hit by exactly one remaining
+    // key fixes that key, which is removed from its other cells. Keys are then
+    // assigned in reverse peeling order. false if the peel gets stuck.
+    bool try_build(const std::vector<uint64_t>& keys) {
+        std::vector<uint32_t> count(array_length_, 0);
+        std::vector<uint64_t> xorh(array_length_, 0);
+        uint32_t p[Arity];
+        for (uint64_t k : keys) {
+            uint64_t h = h_(k);
+            positions(h, p);
+            for (int j = 0; j < Arity; j++) { count[p[j]]++; xorh[p[j]] ^= h; }
+        }
+
+        std::vector<uint32_t> queue;
+        for (uint32_t i = 0; i < array_length_; i++) if (count[i] == 1) queue.push_back(i);
+        struct StackEnt { uint32_t idx; uint64_t h; };
+        std::vector<StackEnt> st;
+        st.reserve(n_);
+        while (!queue.empty()) {
+            uint32_t i = queue.back();
+            queue.pop_back();
+            if (count[i] != 1) continue;
+            uint64_t h = xorh[i];
+            st.push_back({i, h});
+            positions(h, p);
+            for (int j = 0; j < Arity; j++) {
+                count[p[j]]--;
+                xorh[p[j]] ^= h;
+                if (count[p[j]] == 1) queue.push_back(p[j]);
+            }
+        }
+        if (st.size() != n_) return false;
+
+        fp_.assign(array_length_, 0);
+        for (size_t si = st.size(); si-- > 0;) {
+            positions(st[si].h, p);
+            uint16_t v = fp_of(st[si].h);
+            for (int j = 0; j < Arity; j++) v ^= fp_[p[j]];
+            fp_[st[si].idx] = v;
+        }
+        return true;
+    }
+
+    bool built_{false};
+    size_t n_{0};
+    int fp_bits_{12};
+    uint32_t segment_length_{4}, segment_mask_{3};
+    uint32_t segment_count_{1}, segment_count_length_{4};
+    uint32_t array_length_{0};
+    Slab<uint16_t> fp_;
+    HashKind hash_;
+    Hasher64 h_{1};
+};
+
+using Fuse3Filter = BinaryFuseFilter<3>;
+using Fuse4Filter = BinaryFuseFilter<4>;
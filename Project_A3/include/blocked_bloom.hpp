@@ -3,10 +3,11 @@
 #include <vector>
 #include "hash.hpp"
 #include "util.hpp"
+#include "snapshot.hpp"
 
 class BlockedBloom {
 public:
-    BlockedBloom() = default;
+    explicit BlockedBloom(HashKind hash = HashKind::Splitmix) : hash_(hash) {}
 
     void init(uint64_t n, double target_fpr, uint64_t seed=1) {
         const double ln2 = 0.6931471805599453;
@@ -16,8 +17,8 @@ public:
         num_blocks_ = (m_bits + block_bits_ - 1)/block_bits_;
         num_blocks_ = next_pow2(num_blocks_);
         bits_.assign((num_blocks_*block_bits_)/64, 0);
-        h1_ = Hasher64(seed);
-        h2_ = Hasher64(seed ^ 0x9e3779b97f4a7c15ULL);
+        h1_ = Hasher64(seed, hash_);
+        h2_ = Hasher64(seed ^ 0x9e3779b97f4a7c15ULL, hash_);
     }
 
     inline void insert(uint64_t key) {
@@ -31,6 +32,19 @@ public:
         }
     }
 
+    // insert() for several concurrent writers (parallel construction): the
+    // word updates are atomic ORs, so racing inserts never lose a bit.
+    inline void insert_concurrent(uint64_t key) {
+        uint64_t h = h1_(key);
+        uint64_t b = (h >> 32) & (num_blocks_-1);
+        uint64_t base = b * (block_bits_/64);
+        uint64_t hstep = h2_(key);
+        for (uint32_t i=0;i<k_;i++) {
+            uint64_t bit = (splitmix64(h + i*hstep) & (block_bits_-1));
+            __atomic_fetch_or(&bits_[base + (bit>>6)], 1ULL << (bit & 63), __ATOMIC_RELAXED);
+        }
+    }
+
     inline bool contains(uint64_t key) const {
         uint64_t h = h1_(key);
         uint64_t b = (h >> 32) & (num_blocks_-1);
@@ -43,14 +57,56 @@ public:
         return true;
     }
 
+    inline void contains_batch(const uint64_t* keys, size_t n, uint64_t* out_bits) const {
+        clear_bits(out_bits, n);
+        const uint64_t words = block_bits_/64;
+        uint64_t h[AMQ_BATCH_GROUP], hstep[AMQ_BATCH_GROUP], base[AMQ_BATCH_GROUP];
+        for (size_t g = 0; g < n; g += AMQ_BATCH_GROUP) {
+            size_t m = std::min(n - g, AMQ_BATCH_GROUP);
+            h1_.batch(keys + g, m, h);
+            h2_.batch(keys + g, m, hstep);
+            for (size_t i = 0; i < m; i++) {
+                base[i] = ((h[i] >> 32) & (num_blocks_-1)) * words;
+                prefetch_ro(&bits_[base[i]]);
+                prefetch_ro(&bits_[base[i] + words - 1]);  // a block may straddle two lines
+            }
+            for (size_t i = 0; i < m; i++) {
+                bool hit = true;
+                for (uint32_t j=0;j<k_ && hit;j++) {
+                    uint64_t bit = (splitmix64(h[i] + j*hstep[i]) & (block_bits_-1));
+                    hit = (bits_[base[i] + (bit>>6)] & (1ULL << (bit & 63))) != 0;
+                }
+                if (hit) set_bit(out_bits, g+i);
+            }
+        }
+    }
+
+    // Snapshot (snapshot.hpp); a loaded filter borrows its bit array from the mapping.
+    void save(SnapshotWriter& w) const {
+        w.scalar(num_blocks_); w.scalar(k_); w.scalar(block_bits_); w.scalar(h1_.seed); w.scalar(h2_.seed);
+        w.scalar((uint64_t)hash_);
+        w.section(bits_.data(), bits_.size() * sizeof(uint64_t));
+    }
+
+    bool load(const std::shared_ptr<SnapshotMap>& s) {
+        if (s->filter() != "bloom") return false;
+        num_blocks_ = s->scalar(0);
+        k_ = (uint32_t)s->scalar(1);
+        block_bits_ = (uint32_t)s->scalar(2);
+        hash_ = (HashKind)s->scalar(5);
+        h1_ = Hasher64(s->scalar(3), hash_); h2_ = Hasher64(s->scalar(4), hash_);
+        return block_bits_ == 512 && borrow_section(s, 0, num_blocks_ * (block_bits_/64), bits_);
+    }
+
     double bits_per_entry(uint64_t n) const {
         return (double)(bits_.size()*64) / (double)n;
     }
 
 private:
-    std::vector<uint64_t> bits_;
+    Slab<uint64_t> bits_;
     uint64_t num_blocks_{0};
     uint32_t k_{0};
     uint32_t block_bits_{512};
+    HashKind hash_;
     Hasher64 h1_{1}, h2_{2};
 };
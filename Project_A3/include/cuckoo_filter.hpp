@@ -1,9 +1,13 @@
 #pragma once
+#include <atomic>
 #include <cstdint>
+#include <memory>
+#include <mutex>
 #include <vector>
 #include <random>
 #include "hash.hpp"
 #include "util.hpp"
+#include "snapshot.hpp"
 
 __attribute__((used)) static const char CUCKOO_PATCH_TAG[] = "CUCKOO_PATCH_TAG_v3";
 
@@ -20,6 +24,8 @@ public:
         uint64_t fp_checks=0;
     };
 
+    explicit CuckooFilter(HashKind hash = HashKind::Splitmix) : hash_(hash) {}
+
     void init(uint64_t n, double load_factor, int fp_bits, uint64_t seed=1,
               uint32_t bucket_size=4, uint32_t max_kicks=500) {
         fp_bits_ = fp_bits;
@@ -33,8 +39,8 @@ public:
         table_.assign(num_buckets_ * bucket_size_, 0);
         stash_.clear();
 
-        h_ = Hasher64(seed);
-        halt_ = Hasher64(seed ^ 0xfeedbeef12345678ULL);
+        h_ = Hasher64(seed, hash_);
+        halt_ = Hasher64(seed ^ 0xfeedbeef12345678ULL, hash_);
 
         stats_ = {};
         rng_.seed(seed ^ 0xabcdef9876543210ULL);
@@ -50,15 +56,30 @@ public:
         uint32_t i2 = alt_index(i1, fp);
 
         if (bucket_has(i1, fp) || bucket_has(i2, fp)) return true;
+        return stash_has(fp, i1, i2);
+    }
 
-        for (auto &e : stash_) {
-            if (e.fp == fp &&
-                (e.i1 == i1 || e.i2 == i1 || e.i1 == i2 || e.i2 == i2)) {
-                stats_.stash_hits++;
-                return true;
+    inline void contains_batch(const uint64_t* keys, size_t n, uint64_t* out_bits) {
+        clear_bits(out_bits, n);
+        uint64_t h[AMQ_BATCH_GROUP];
+        uint16_t fp[AMQ_BATCH_GROUP];
+        uint32_t b1[AMQ_BATCH_GROUP], b2[AMQ_BATCH_GROUP];
+        for (size_t g = 0; g < n; g += AMQ_BATCH_GROUP) {
+            size_t m = std::min(n - g, AMQ_BATCH_GROUP);
+            h_.batch(keys + g, m, h);
+            for (size_t i = 0; i < m; i++) {
+                fp[i] = cuckoo_fp(h[i]);
+                b1[i] = (uint32_t)(h[i] & mask_);
+                b2[i] = alt_index(b1[i], fp[i]);
+                prefetch_ro(&table_[b1[i] * bucket_size_]);
+                prefetch_ro(&table_[b2[i] * bucket_size_]);
+            }
+            for (size_t i = 0; i < m; i++) {
+                stats_.lookups++;
+                if (bucket_has(b1[i], fp[i]) || bucket_has(b2[i], fp[i]) || stash_has(fp[i], b1[i], b2[i]))
+                    set_bit(out_bits, g+i);
             }
         }
-        return false;
     }
 
     inline bool insert(uint64_t key) {
@@ -134,6 +155,155 @@ public:
         return bits / (double)n;
     }
 
+    // ---- Concurrent mode -------------------------------------------------
+    //
+    // The *_concurrent calls may run from any number of threads at once once
+    // enable_concurrency() has been called (after a single-threaded build, if
+    // any). Buckets map to lock stripes; each stripe has a mutex for writers and
+    // a sequence counter (odd while a writer is inside) for readers:
+    //
+    //  - contains_concurrent takes no lock: it reads the stripe counters of both
+    //    candidate buckets, probes them, and retries if either counter was odd or
+    //    moved. It does not count lookups / fp_checks (a shared counter would
+    //    serialize the readers); stash_hits are counted.
+    //  - insert/erase lock the stripes of both candidate buckets (lower stripe
+    //    first). When both are full, insert searches a displacement path without
+    //    locks and then executes it backwards from the free slot, one move at a
+    //    time under the two stripes involved, re-checking each move. A moved
+    //    fingerprint is therefore always in one of its two buckets, so readers
+    //    never miss it; a path invalidated by another writer is searched again.
+    //  - the stash has its own mutex; readers only take it when it is non-empty.
+    //
+    // The plain contains/insert/erase stay single-threaded and unchanged.
+    void enable_concurrency(size_t stripes = 1024) {
+        stripes = (size_t)next_pow2(std::max<uint64_t>(1, std::min<uint64_t>(stripes, num_buckets_)));
+        stripes_.reset(new Stripe[stripes]);
+        stripe_mask_ = stripes - 1;
+        stash_n_.store(stash_.size(), std::memory_order_relaxed);
+    }
+
+    bool concurrent() const { return stripes_ != nullptr; }
+
+    inline bool contains_concurrent(uint64_t key) {
+        uint64_t h = h_(key);
+        uint16_t fp = cuckoo_fp(h);
+        uint32_t i1 = (uint32_t)(h & mask_);
+        uint32_t i2 = alt_index(i1, fp);
+
+        std::atomic<uint64_t> &q1 = stripes_[i1 & stripe_mask_].seq;
+        std::atomic<uint64_t> &q2 = stripes_[i2 & stripe_mask_].seq;
+        for (;;) {
+            uint64_t s1 = q1.load(std::memory_order_acquire);
+            uint64_t s2 = q2.load(std::memory_order_acquire);
+            if ((s1 | s2) & 1) { cpu_relax(); continue; }
+            bool hit = bucket_has_relaxed(i1, fp) || bucket_has_relaxed(i2, fp);
+            std::atomic_thread_fence(std::memory_order_acquire);
+            if (q1.load(std::memory_order_relaxed) == s1 && q2.load(std::memory_order_relaxed) == s2) {
+                if (hit) return true;
+                break;
+            }
+        }
+
+        if (stash_n_.load(std::memory_order_acquire) == 0) return false;
+        std::lock_guard<std::mutex> g(stash_mu_);
+        for (auto &e : stash_) {
+            if (e.fp == fp &&
+                (e.i1 == i1 || e.i2 == i1 || e.i1 == i2 || e.i2 == i2)) {
+                stat_add(stats_.stash_hits, 1);
+                return true;
+            }
+        }
+        return false;
+    }
+
+    // Prefetches both buckets of a group, then resolves each key with contains_concurrent.
+    inline void contains_batch_concurrent(const uint64_t* keys, size_t n, uint64_t* out_bits) {
+        clear_bits(out_bits, n);
+        uint64_t h[AMQ_BATCH_GROUP];
+        for (size_t g = 0; g < n; g += AMQ_BATCH_GROUP) {
+            size_t m = std::min(n - g, AMQ_BATCH_GROUP);
+            h_.batch(keys + g, m, h);
+            for (size_t i = 0; i < m; i++) {
+                uint32_t i1 = (uint32_t)(h[i] & mask_);
+                prefetch_ro(&table_[i1 * bucket_size_]);
+                prefetch_ro(&table_[alt_index(i1, cuckoo_fp(h[i])) * bucket_size_]);
+            }
+            for (size_t i = 0; i < m; i++)
+                if (contains_concurrent(keys[g+i])) set_bit(out_bits, g+i);
+        }
+    }
+
+    inline bool insert_concurrent(uint64_t key) {
+        stat_add(stats_.inserts, 1);
+
+        uint64_t h = h_(key);
+        uint16_t fp = cuckoo_fp(h);
+        uint32_t i1 = (uint32_t)(h & mask_);
+        uint32_t i2 = alt_index(i1, fp);
+
+        {
+            StripePair g(*this, i1, i2);
+            if (bucket_insert_relaxed(i1, fp) || bucket_insert_relaxed(i2, fp)) return true;
+        }
+
+        // thread-private random walk state (rng_ belongs to the single-threaded path)
+        thread_local uint64_t walk = 0x9e3779b97f4a7c15ULL;
+        walk += (uint64_t)(uintptr_t)&walk ^ key;
+
+        std::vector<PathStep> path;
+        uint64_t kicks = 0;
+        for (int attempt = 0; attempt < 8; attempt++) {
+            uint32_t first = (splitmix64(walk++) & 1) ? i1 : i2;
+            if (!find_path(first, path, walk)) break;
+            kicks += path.size() - 1;
+            if (execute_path(path, fp, i1, i2)) {
+                stat_add(stats_.kicks, path.size() - 1);
+                stat_max(stats_.max_kicks, path.size() - 1);
+                return true;
+            }
+        }
+
+        stat_add(stats_.kicks, kicks);
+        stat_max(stats_.max_kicks, kicks);
+        std::lock_guard<std::mutex> g(stash_mu_);
+        if (stash_.size() < stash_cap_) {
+            stash_.push_back({fp, i1, i2});
+            stash_n_.store(stash_.size(), std::memory_order_release);
+            stat_add(stats_.stash_inserts, 1);
+            return true;
+        }
+        stat_add(stats_.insert_fail, 1);
+        return false;
+    }
+
+    inline bool erase_concurrent(uint64_t key) {
+        stat_add(stats_.deletes, 1);
+
+        uint64_t h = h_(key);
+        uint16_t fp = cuckoo_fp(h);
+        uint32_t i1 = (uint32_t)(h & mask_);
+        uint32_t i2 = alt_index(i1, fp);
+
+        {
+            StripePair g(*this, i1, i2);
+            if (bucket_erase_relaxed(i1, fp) || bucket_erase_relaxed(i2, fp)) return true;
+        }
+
+        if (stash_n_.load(std::memory_order_acquire) == 0) return false;
+        std::lock_guard<std::mutex> g(stash_mu_);
+        for (size_t i = 0; i < stash_.size(); i++) {
+            if (stash_[i].fp == fp &&
+                (stash_[i].i1 == i1 || stash_[i].i2 == i2 ||
+                 stash_[i].i2 == i1 || stash_[i].i1 == i2)) {
+                stash_[i] = stash_.back();
+                stash_.pop_back();
+                stash_n_.store(stash_.size(), std::memory_order_release);
+                return true;
+            }
+        }
+        return false;
+    }
+
     const Stats& stats() const { return stats_; }
     void reset_stats() { stats_ = {}; }
 
@@ -142,9 +312,140 @@ public:
     int fp_bits() const { return fp_bits_; }
     size_t stash_size() const { return stash_.size(); }
 
+    // Snapshot (snapshot.hpp). A loaded filter borrows its table from the
+    // (copy-on-write) mapping and copies the small stash; stats start at zero
+    // and the concurrent mode is off until enable_concurrency().
+    void save(SnapshotWriter& w) const {
+        w.scalar((uint64_t)fp_bits_); w.scalar(bucket_size_); w.scalar(max_kicks_);
+        w.scalar(num_buckets_); w.scalar(stash_cap_); w.scalar(h_.seed); w.scalar(halt_.seed);
+        w.scalar((uint64_t)hash_);
+        w.section(table_.data(), table_.size() * sizeof(uint16_t));
+        w.section(stash_.data(), stash_.size() * sizeof(StashEntry));
+    }
+
+    bool load(const std::shared_ptr<SnapshotMap>& s) {
+        if (s->filter() != "cuckoo") return false;
+        fp_bits_ = (int)s->scalar(0);
+        bucket_size_ = (uint32_t)s->scalar(1);
+        max_kicks_ = (uint32_t)s->scalar(2);
+        num_buckets_ = s->scalar(3);
+        mask_ = num_buckets_ - 1;
+        stash_cap_ = (size_t)s->scalar(4);
+        hash_ = (HashKind)s->scalar(7);
+        h_ = Hasher64(s->scalar(5), hash_);
+        halt_ = Hasher64(s->scalar(6), hash_);
+        if (!borrow_section(s, 0, num_buckets_ * bucket_size_, table_)) return false;
+        size_t ns = 0;
+        const StashEntry* st = s->section<StashEntry>(1, ns);
+        if (!st && ns) return false;
+        stash_.assign(st, st + ns);
+        stats_ = {};
+        rng_.seed(h_.seed ^ 0xabcdef9876543210ULL);
+        stripes_.reset();
+        stash_n_.store(stash_.size(), std::memory_order_relaxed);
+        return true;
+    }
+
 private:
     struct StashEntry { uint16_t fp; uint32_t i1, i2; };
 
+    struct alignas(64) Stripe {
+        std::mutex mu;
+        std::atomic<uint64_t> seq{0};
+    };
+
+    // Both candidate buckets' stripes, locked lower-first and marked odd for readers.
+    struct StripePair {
+        Stripe *a, *b;
+        StripePair(CuckooFilter &f, uint32_t i1, uint32_t i2) {
+            size_t s1 = i1 & f.stripe_mask_, s2 = i2 & f.stripe_mask_;
+            a = &f.stripes_[std::min(s1, s2)];
+            b = s1 == s2 ? nullptr : &f.stripes_[std::max(s1, s2)];
+            a->mu.lock();
+            if (b) b->mu.lock();
+            begin(a);
+            if (b) begin(b);
+            std::atomic_thread_fence(std::memory_order_release);
+        }
+        ~StripePair() {
+            end(a);
+            a->mu.unlock();
+            if (b) { end(b); b->mu.unlock(); }
+        }
+        static void begin(Stripe *s) { s->seq.store(s->seq.load(std::memory_order_relaxed) + 1, std::memory_order_relaxed); }
+        static void end(Stripe *s) { s->seq.store(s->seq.load(std::memory_order_relaxed) + 1, std::memory_order_release); }
+    };
+
+    struct PathStep { uint32_t bucket, slot; uint16_t fp; };
+
+    inline uint16_t slot_load(uint32_t off) const { return __atomic_load_n(&table_[off], __ATOMIC_RELAXED); }
+    inline void slot_store(uint32_t off, uint16_t v) { __atomic_store_n(&table_[off], v, __ATOMIC_RELAXED); }
+
+    // Random-walk displacement path from bucket `first` to a free slot, read
+    // without locks (execute_path re-checks every step). path[k+1].bucket is
+    // the alternate bucket of path[k].fp; the last step is the free slot.
+    inline bool find_path(uint32_t first, std::vector<PathStep> &path, uint64_t &walk) const {
+        path.clear();
+        uint32_t idx = first;
+        for (uint64_t kicks = 0; kicks < max_kicks_; kicks++) {
+            uint32_t slot = (uint32_t)(splitmix64(walk++) % bucket_size_);
+            uint16_t v = slot_load(idx * bucket_size_ + slot);
+            path.push_back({idx, slot, v});
+            if (v == 0) return true;  // freed since the bucket was found full
+            uint32_t nxt = alt_index(idx, v);
+            for (uint32_t j = 0; j < bucket_size_; j++) {
+                if (slot_load(nxt * bucket_size_ + j) == 0) {
+                    path.push_back({nxt, j, 0});
+                    return true;
+                }
+            }
+            idx = nxt;
+        }
+        return false;
+    }
+
+    // Moves path[k] into path[k+1] from the free end back to path[0], then
+    // stores fp in the slot path[0] frees (a bucket of the new key). false if
+    // another writer changed a slot on the path first.
+    inline bool execute_path(const std::vector<PathStep> &path, uint16_t fp, uint32_t i1, uint32_t i2) {
+        for (size_t k = path.size() - 1; k > 0; k--) {
+            const PathStep &from = path[k - 1], &to = path[k];
+            StripePair g(*this, from.bucket, to.bucket);
+            uint32_t src = from.bucket * bucket_size_ + from.slot, dst = to.bucket * bucket_size_ + to.slot;
+            if (slot_load(dst) != 0 || slot_load(src) != from.fp) return false;
+            slot_store(dst, from.fp);
+            slot_store(src, 0);
+        }
+        StripePair g(*this, i1, i2);
+        uint32_t off = path[0].bucket * bucket_size_ + path[0].slot;
+        if (slot_load(off) != 0) return bucket_insert_relaxed(i1, fp) || bucket_insert_relaxed(i2, fp);
+        slot_store(off, fp);
+        return true;
+    }
+
+    inline bool bucket_has_relaxed(uint32_t b, uint16_t fp) const {
+        uint32_t base = b * bucket_size_;
+        for (uint32_t j = 0; j < bucket_size_; j++)
+            if (slot_load(base + j) == fp) return true;
+        return false;
+    }
+
+    inline bool bucket_insert_relaxed(uint32_t b, uint16_t fp) {
+        uint32_t base = b * bucket_size_;
+        for (uint32_t j = 0; j < bucket_size_; j++) {
+            if (slot_load(base + j) == 0) { slot_store(base + j, fp); return true; }
+        }
+        return false;
+    }
+
+    inline bool bucket_erase_relaxed(uint32_t b, uint16_t fp) {
+        uint32_t base = b * bucket_size_;
+        for (uint32_t j = 0; j < bucket_size_; j++) {
+            if (slot_load(base + j) == fp) { slot_store(base + j, 0); return true; }
+        }
+        return false;
+    }
+
     inline uint16_t cuckoo_fp(uint64_t h) const {
         uint64_t mask;
         if (fp_bits_ >= 16) mask = 0xFFFFULL;
@@ -161,6 +462,17 @@ private:
         return (uint32_t)((i ^ (uint32_t)hh) & mask_);
     }
 
+    inline bool stash_has(uint16_t fp, uint32_t i1, uint32_t i2) {
+        for (auto &e : stash_) {
+            if (e.fp == fp &&
+                (e.i1 == i1 || e.i2 == i1 || e.i1 == i2 || e.i2 == i2)) {
+                stats_.stash_hits++;
+                return true;
+            }
+        }
+        return false;
+    }
+
     inline bool bucket_has(uint32_t b, uint16_t fp) {
         uint32_t base = b * bucket_size_;
         for (uint32_t j = 0; j < bucket_size_; j++) {
@@ -196,13 +508,19 @@ private:
     uint64_t num_buckets_{0};
     uint64_t mask_{0};
 
-    std::vector<uint16_t> table_;
+    Slab<uint16_t> table_;
     std::vector<StashEntry> stash_;
     size_t stash_cap_{32};
 
+    HashKind hash_;
     Hasher64 h_{1};
     Hasher64 halt_{2};
 
     Stats stats_{};
     std::mt19937_64 rng_;
+
+    std::unique_ptr<Stripe[]> stripes_;
+    size_t stripe_mask_{0};
+    std::mutex stash_mu_;
+    std::atomic<size_t> stash_n_{0};
 };
@@ -1,6 +1,10 @@
 #pragma once
 #include <cstdint>
 #include <cstddef>
+#include <string>
+#if defined(__SSE4_2__)
+#include <nmmintrin.h>
+#endif
 
 static inline uint64_t splitmix64(uint64_t x) {
     x += 0x9e3779b97f4a7c15ULL;
@@ -9,11 +13,140 @@ static inline uint64_t splitmix64(uint64_t x) {
     return x ^ (x >> 31);
 }
 
+// murmur3's 64-bit finalizer: a bijection on uint64_t (xor-shifts and odd
+// multipliers are invertible), so distinct inputs give distinct outputs.
+static inline uint64_t fmix64(uint64_t x) {
+    x ^= x >> 33;
+    x *= 0xff51afd7ed558ccdULL;
+    x ^= x >> 33;
+    x *= 0xc4ceb9fe1a85ec53ULL;
+    x ^= x >> 33;
+    return x;
+}
+
+// The i-th key of a seed's key stream: distinct for distinct i without a
+// dedup set, and random-looking. Disjoint sets are disjoint index ranges.
+static inline uint64_t unique_key(uint64_t i, uint64_t seed) {
+    return fmix64(i ^ fmix64(seed + 0x9e3779b97f4a7c15ULL));
+}
+
+// Hash backends for the filters (amq_bench --hash):
+//   splitmix   splitmix64(x ^ seed), the original hash
+//   wyhash     wyhash's 8-byte path: two 64x64->128 multiply-folds
+//   xxh3       XXH3's 4..8-byte path: keyed xor + rrmxmx finalizer
+//   crc32c     two CRC32C (SSE4.2 crc32 instruction) over x and rot(x, 32),
+//              folded by one multiply. CRC is linear, so without the fold the
+//              seeds of a filter's hashes would only xor a constant into them.
+//   mulshift   multiply-add-shift: bits 64..127 of a*x + b with a 128-bit a
+//              and a 64-bit b (one 64x64->128 and one 64x64 multiply);
+//              universal. The high half of a 64-bit a*x alone would only
+//              span [0, a).
+enum class HashKind { Splitmix, Wyhash, Xxh3, Crc32c, MulShift };
+
+static inline bool parse_hash_kind(const std::string& s, HashKind& k) {
+    if (s == "splitmix") k = HashKind::Splitmix;
+    else if (s == "wyhash") k = HashKind::Wyhash;
+    else if (s == "xxh3") k = HashKind::Xxh3;
+    else if (s == "crc32c") k = HashKind::Crc32c;
+    else if (s == "mulshift") k = HashKind::MulShift;
+    else return false;
+    return true;
+}
+
+static inline const char* hash_kind_name(HashKind k) {
+    switch (k) {
+    case HashKind::Wyhash: return "wyhash";
+    case HashKind::Xxh3: return "xxh3";
+    case HashKind::Crc32c: return "crc32c";
+    case HashKind::MulShift: return "mulshift";
+    default: return "splitmix";
+    }
+}
+
+static inline uint64_t mul_fold(uint64_t a, uint64_t b) {
+    __uint128_t r = (__uint128_t)a * b;
+    return (uint64_t)r ^ (uint64_t)(r >> 64);
+}
+
+static inline uint64_t rotl64(uint64_t x, int r) { return (x << r) | (x >> (64 - r)); }
+
+static inline uint32_t crc32c_u64(uint32_t crc, uint64_t x) {
+#if defined(__SSE4_2__)
+    return (uint32_t)_mm_crc32_u64(crc, x);
+#else
+    for (int i = 0; i < 64; i++, x >>= 1) crc = (crc >> 1) ^ (0x82f63b78u & (0u - ((crc ^ (uint32_t)x) & 1u)));
+    return crc;
+#endif
+}
+
+static constexpr uint64_t WY_P0 = 0xa0761d6478bd642fULL, WY_P1 = 0xe7037ed1a0b428dbULL;
+
 struct Hasher64 {
     uint64_t seed;
-    explicit Hasher64(uint64_t s=0x123456789abcdef0ULL) : seed(s) {}
+    HashKind kind;
+    uint64_t k0, k1, k2;  // per-seed constants of the backend
+
+    explicit Hasher64(uint64_t s=0x123456789abcdef0ULL, HashKind k=HashKind::Splitmix) : seed(s), kind(k) {
+        switch (k) {
+        case HashKind::Wyhash: k0 = s ^ mul_fold(s ^ WY_P0, WY_P1); k1 = k2 = 0; break;
+        case HashKind::Xxh3: {
+            uint64_t sd = s ^ ((uint64_t)__builtin_bswap32((uint32_t)s) << 32);
+            k0 = (0x1cad21f72c81017cULL ^ 0xdb979083e96dd4deULL) - sd;
+            k1 = k2 = 0;
+            break;
+        }
+        case HashKind::Crc32c: k0 = splitmix64(s); k1 = splitmix64(s + 1) | 1; k2 = 0; break;
+        case HashKind::MulShift: k0 = splitmix64(s); k1 = splitmix64(s + 1); k2 = splitmix64(s + 2) | 1; break;
+        default: k0 = k1 = k2 = 0;
+        }
+    }
+
     inline uint64_t operator()(uint64_t x) const {
-        return splitmix64(x ^ seed);
+        switch (kind) {
+        case HashKind::Wyhash: return wyhash(x);
+        case HashKind::Xxh3: return xxh3(x);
+        case HashKind::Crc32c: return crc(x);
+        case HashKind::MulShift: return mulshift(x);
+        default: return splitmix64(x ^ seed);
+        }
+    }
+
+    // out[i] = (*this)(keys[i]). Still the scalar hash per key: the backend is
+    // picked once per call instead of once per key, and the keys' independent
+    // multiply / crc32 chains overlap in the out-of-order core.
+    inline void batch(const uint64_t* keys, size_t n, uint64_t* out) const {
+        switch (kind) {
+        case HashKind::Wyhash: for (size_t i = 0; i < n; i++) out[i] = wyhash(keys[i]); break;
+        case HashKind::Xxh3: for (size_t i = 0; i < n; i++) out[i] = xxh3(keys[i]); break;
+        case HashKind::Crc32c: for (size_t i = 0; i < n; i++) out[i] = crc(keys[i]); break;
+        case HashKind::MulShift: for (size_t i = 0; i < n; i++) out[i] = mulshift(keys[i]); break;
+        default: for (size_t i = 0; i < n; i++) out[i] = splitmix64(keys[i] ^ seed);
+        }
+    }
+
+private:
+    inline uint64_t wyhash(uint64_t x) const {
+        __uint128_t r = (__uint128_t)(rotl64(x, 32) ^ WY_P1) * (x ^ k0);
+        return mul_fold((uint64_t)r ^ WY_P0 ^ 8, (uint64_t)(r >> 64) ^ WY_P1);
+    }
+
+    inline uint64_t xxh3(uint64_t x) const {
+        uint64_t h = rotl64(x, 32) ^ k0;
+        h ^= rotl64(h, 49) ^ rotl64(h, 24);
+        h *= 0x9fb21c651e98df25ULL;
+        h ^= (h >> 35) + 8;
+        h *= 0x9fb21c651e98df25ULL;
+        return h ^ (h >> 28);
+    }
+
+    inline uint64_t crc(uint64_t x) const {
+        uint64_t c = ((uint64_t)crc32c_u64((uint32_t)(k0 >> 32), rotl64(x, 32)) << 32) | crc32c_u64((uint32_t)k0, x);
+        return mul_fold(c, k1);
+    }
+
+    inline uint64_t mulshift(uint64_t x) const {
+        // a = k2:k0, b = k1
+        return k2 * x + (uint64_t)(((__uint128_t)k0 * x + k1) >> 64);
     }
 };
 
@@ -4,10 +4,14 @@
 #include <cstdint>
 #include <cmath>
 #include <limits>
+#include <memory>
+#include <mutex>
 #include <utility>
 #include <vector>
 
 #include "hash.hpp"
+#include "util.hpp"
+#include "snapshot.hpp"
 
 class QuotientFilter {
 public:
@@ -20,7 +24,7 @@ public:
         uint64_t max_probe = 0;
     };
 
-    QuotientFilter() = default;
+    explicit QuotientFilter(HashKind hash = HashKind::Splitmix) : hash_(hash) {}
 
     inline void init(uint64_t n, double load, int fp_bits, uint64_t seed) {
         rbits_ = std::min(16, std::max(4, fp_bits));
@@ -39,29 +43,170 @@ public:
         cont_.assign(m_, 0);
         shft_.assign(m_, 0);
 
-        h_ = Hasher64(seed);
+        h_ = Hasher64(seed, hash_);
         count_ = 0;
         stats_ = {};
     }
 
     inline uint64_t capacity() const { return m_; }
 
+    // Snapshot (snapshot.hpp). A loaded filter borrows its arrays from the
+    // (copy-on-write) mapping; stats start at zero and the concurrent mode is
+    // off until enable_concurrency().
+    void save(SnapshotWriter& w) const {
+        w.scalar((uint64_t)rbits_); w.scalar((uint64_t)qbits_); w.scalar(m_); w.scalar(count_); w.scalar(h_.seed);
+        w.scalar((uint64_t)hash_);
+        w.section(rem_.data(), rem_.size() * sizeof(uint16_t));
+        w.section(occ_.data(), occ_.size());
+        w.section(cont_.data(), cont_.size());
+        w.section(shft_.data(), shft_.size());
+    }
+
+    bool load(const std::shared_ptr<SnapshotMap>& s) {
+        if (s->filter() != "qf") return false;
+        rbits_ = (int)s->scalar(0);
+        qbits_ = (int)s->scalar(1);
+        m_ = s->scalar(2);
+        mask_ = m_ - 1;
+        count_ = s->scalar(3);
+        hash_ = (HashKind)s->scalar(5);
+        h_ = Hasher64(s->scalar(4), hash_);
+        stats_ = {};
+        region_locks_.reset();
+        regions_ = 0;
+        return borrow_section(s, 0, m_, rem_) && borrow_section(s, 1, m_, occ_) &&
+               borrow_section(s, 2, m_, cont_) && borrow_section(s, 3, m_, shft_);
+    }
+
     inline double bits_per_entry(uint64_t n) const {
         double total = (double)m_ * ((double)rbits_ + 3.0);
         return total / (double)n;
     }
 
-    inline Stats stats() const { return stats_; }
-    inline void reset_stats() { stats_ = {}; }
+    // Plain-path counters plus the per-region counters of the concurrent path;
+    // call while no *_concurrent operation is running.
+    inline Stats stats() const {
+        Stats s = stats_;
+        for (uint64_t i = 0; region_locks_ && i < regions_; i++) {
+            const Stats& t = region_locks_[i].stats;
+            s.inserts += t.inserts; s.insert_fail += t.insert_fail;
+            s.deletes += t.deletes; s.delete_miss += t.delete_miss;
+            s.lookups += t.lookups; s.scan_steps += t.scan_steps; s.probes += t.probes;
+            s.max_probe = std::max(s.max_probe, t.max_probe);
+        }
+        return s;
+    }
+    inline void reset_stats() {
+        stats_ = {};
+        for (uint64_t i = 0; region_locks_ && i < regions_; i++) region_locks_[i].stats = {};
+    }
 
     inline bool contains(uint64_t key) {
-        stats_.lookups++;
         auto [q, r] = qr(key);
-        if (!occ_[q]) { record_probe(1); return false; }
+        return contains_qr<false>(q, r);
+    }
+
+    inline bool insert(uint64_t key) {
+        auto [q, r] = qr(key);
+        return insert_qr<false>(q, r);
+    }
+
+    inline bool erase(uint64_t key) {
+        auto [q, r] = qr(key);
+        return erase_qr<false>(q, r);
+    }
+
+    // The home slot's metadata is prefetched for a group; the cluster walk that
+    // follows stays a dependent scan.
+    inline void contains_batch(const uint64_t* keys, size_t n, uint64_t* out_bits) {
+        batch_lookup(keys, n, out_bits, [&](uint64_t q, uint16_t r) { return contains_qr<false>(q, r); });
+    }
+
+    // ---- Concurrent mode -------------------------------------------------
+    //
+    // After enable_concurrency() the *_concurrent calls may run from any number
+    // of threads. The slots are split into regions of 2^region_bits; an
+    // operation on quotient q locks the regions covering q's whole cluster (from
+    // its first slot to the empty slot that ends it), since insert and erase
+    // rewrite the cluster in place. It starts with q's region and the next one,
+    // checks that the cluster stays inside, and otherwise retries with one more
+    // region on the side it spilled over. Regions are locked in ascending index
+    // order, so overlapping operations cannot deadlock. Lookups lock too: a
+    // cluster rewrite is not a single store a reader could validate cheaply.
+    // The stats of a concurrent operation go to q's region, whose lock it
+    // holds, so they are plain increments on a line the operation already
+    // owns; stats() adds them up. The plain path keeps its own plain counters.
+    void enable_concurrency(int region_bits = 12) {
+        region_bits_ = std::min(region_bits, std::max(qbits_, 0));
+        regions_ = m_ >> region_bits_;
+        if (regions_ == 0) regions_ = 1;
+        region_locks_.reset(new RegionLock[regions_]);
+    }
+
+    bool concurrent() const { return region_locks_ != nullptr; }
+
+    inline bool contains_concurrent(uint64_t key) {
+        auto [q, r] = qr(key);
+        return with_cluster_locked(q, [&] { return contains_qr<true>(q, r); });
+    }
+
+    inline bool insert_concurrent(uint64_t key) {
+        auto [q, r] = qr(key);
+        return with_cluster_locked(q, [&] { return insert_qr<true>(q, r); });
+    }
+
+    inline bool erase_concurrent(uint64_t key) {
+        auto [q, r] = qr(key);
+        return with_cluster_locked(q, [&] { return erase_qr<true>(q, r); });
+    }
+
+    inline void contains_batch_concurrent(const uint64_t* keys, size_t n, uint64_t* out_bits) {
+        batch_lookup(keys, n, out_bits,
+                     [&](uint64_t q, uint16_t r) { return with_cluster_locked(q, [&] { return contains_qr<true>(q, r); }); });
+    }
+
+private:
+    template <class F>
+    inline void batch_lookup(const uint64_t* keys, size_t n, uint64_t* out_bits, F lookup) {
+        clear_bits(out_bits, n);
+        if (m_ == 0) return;
+        uint64_t h[AMQ_BATCH_GROUP], q[AMQ_BATCH_GROUP];
+        uint16_t r[AMQ_BATCH_GROUP];
+        for (size_t g = 0; g < n; g += AMQ_BATCH_GROUP) {
+            size_t m = std::min(n - g, AMQ_BATCH_GROUP);
+            h_.batch(keys + g, m, h);
+            for (size_t i = 0; i < m; i++) {
+                auto qr_i = qr_of_hash(h[i]);
+                q[i] = qr_i.first;
+                r[i] = qr_i.second;
+                prefetch_ro(&occ_[q[i]]);
+                prefetch_ro(&shft_[q[i]]);
+                prefetch_ro(&rem_[q[i]]);
+            }
+            for (size_t i = 0; i < m; i++)
+                if (lookup(q[i], r[i])) set_bit(out_bits, g+i);
+        }
+    }
+
+    // Sync: called under with_cluster_locked (stats to q's region, atomic count_).
+    template <bool Sync>
+    inline Stats& stats_at(uint64_t q) { return Sync ? region_locks_[region_of(q)].stats : stats_; }
+
+    template <bool Sync>
+    inline void count_add(int64_t d) {
+        if (Sync) __atomic_fetch_add(&count_, (uint64_t)d, __ATOMIC_RELAXED);
+        else count_ += (uint64_t)d;
+    }
+
+    template <bool Sync>
+    inline bool contains_qr(uint64_t q, uint16_t r) {
+        Stats& st = stats_at<Sync>(q);
+        st.lookups++;
+        if (!occ_[q]) { record_probe(st, 1); return false; }
 
         uint64_t cluster = find_cluster_start(q);
         uint64_t end = find_cluster_end(cluster);
-        if (end == std::numeric_limits<uint64_t>::max()) { record_probe(m_); return false; }
+        if (end == std::numeric_limits<uint64_t>::max()) { record_probe(st, m_); return false; }
 
         std::vector<std::pair<uint64_t, std::vector<uint16_t>>> runs;
         std::vector<uint64_t> old_occ_buckets;
@@ -70,32 +215,32 @@ public:
             if (br.first != q) continue;
             auto &vec = br.second;
             bool ok = std::binary_search(vec.begin(), vec.end(), r);
-            record_probe(distance_mod(cluster, end));
+            record_probe(st, distance_mod(cluster, end));
             return ok;
         }
-        record_probe(distance_mod(cluster, end));
+        record_probe(st, distance_mod(cluster, end));
         return false;
     }
 
-    inline bool insert(uint64_t key) {
-        stats_.inserts++;
-        if (m_ == 0) { stats_.insert_fail++; return false; }
-
-        auto [q, r] = qr(key);
+    template <bool Sync>
+    inline bool insert_qr(uint64_t q, uint16_t r) {
+        if (m_ == 0) { stats_.inserts++; stats_.insert_fail++; return false; }
+        Stats& st = stats_at<Sync>(q);
+        st.inserts++;
 
         if (!occ_[q] && is_empty(q)) {
             rem_[q] = r;
             occ_[q] = 1;
             cont_[q] = 0;
             shft_[q] = 0;
-            count_++;
-            record_probe(1);
+            count_add<Sync>(1);
+            record_probe(st, 1);
             return true;
         }
 
         uint64_t cluster = find_cluster_start(q);
         uint64_t end = find_cluster_end(cluster);
-        if (end == std::numeric_limits<uint64_t>::max()) { stats_.insert_fail++; return false; }
+        if (end == std::numeric_limits<uint64_t>::max()) { st.insert_fail++; return false; }
 
         std::vector<std::pair<uint64_t, std::vector<uint16_t>>> runs;
         std::vector<uint64_t> old_occ_buckets;
@@ -118,32 +263,32 @@ public:
         for (auto &br : runs) needed += br.second.size();
         uint64_t avail = distance_mod(cluster, end);
         if (needed > avail) {
-            stats_.insert_fail++;
+            st.insert_fail++;
             return false;
         }
 
         rewrite_cluster(cluster, end, runs, old_occ_buckets);
         occ_[q] = 1;
-        count_++;
-        record_probe(avail);
+        count_add<Sync>(1);
+        record_probe(st, avail);
         return true;
     }
 
-    inline bool erase(uint64_t key) {
-        stats_.deletes++;
-        if (m_ == 0) { stats_.delete_miss++; return false; }
-
-        auto [q, r] = qr(key);
+    template <bool Sync>
+    inline bool erase_qr(uint64_t q, uint16_t r) {
+        if (m_ == 0) { stats_.deletes++; stats_.delete_miss++; return false; }
+        Stats& st = stats_at<Sync>(q);
+        st.deletes++;
         if (!occ_[q]) {
-            stats_.delete_miss++;
-            record_probe(1);
+            st.delete_miss++;
+            record_probe(st, 1);
             return false;
         }
 
         uint64_t cluster = find_cluster_start(q);
         uint64_t end = find_cluster_end(cluster);
         if (end == std::numeric_limits<uint64_t>::max()) {
-            stats_.delete_miss++;
+            st.delete_miss++;
             return false;
         }
 
@@ -167,8 +312,8 @@ public:
         }
 
         if (!removed) {
-            stats_.delete_miss++;
-            record_probe(distance_mod(cluster, end));
+            st.delete_miss++;
+            record_probe(st, distance_mod(cluster, end));
             return false;
         }
 
@@ -178,11 +323,59 @@ public:
         } else {
             occ_[q] = 1;
         }
-        count_--;
-        record_probe(distance_mod(cluster, end));
+        count_add<Sync>(-1);
+        record_probe(st, distance_mod(cluster, end));
         return true;
     }
 
+    struct alignas(64) RegionLock {
+        std::mutex mu;
+        Stats stats;
+    };
+
+    inline uint64_t region_of(uint64_t i) const { return i >> region_bits_; }
+
+    // Runs fn() with every region of q's cluster [start, end] locked.
+    template <class F>
+    inline bool with_cluster_locked(uint64_t q, F fn) {
+        uint64_t lo = region_of(q), span = std::min<uint64_t>(2, regions_);
+        std::vector<uint64_t> held;
+        for (;;) {
+            held.clear();
+            for (uint64_t k = 0; k < span; k++) held.push_back((lo + k) % regions_);
+            std::sort(held.begin(), held.end());
+            for (uint64_t id : held) region_locks_[id].mu.lock();
+
+            int spill = span >= regions_ ? 0 : cluster_spill(q, lo, span);
+            if (spill == 0) {
+                bool ok = fn();
+                for (auto it = held.rbegin(); it != held.rend(); ++it) region_locks_[*it].mu.unlock();
+                return ok;
+            }
+            for (auto it = held.rbegin(); it != held.rend(); ++it) region_locks_[*it].mu.unlock();
+            if (spill < 0) lo = (lo + regions_ - 1) % regions_;
+            span++;
+        }
+    }
+
+    // 0 if q's cluster (including its terminating empty slot) lies in the
+    // locked regions lo .. lo+span-1, -1 / +1 if it runs past the left / right
+    // end. Only reads slots inside the locked regions.
+    inline int cluster_spill(uint64_t q, uint64_t lo, uint64_t span) const {
+        auto locked = [&](uint64_t i) { return (region_of(i) + regions_ - lo) % regions_ < span; };
+        uint64_t i = q;
+        for (uint64_t steps = 0; shft_[i] && steps < m_; steps++) {
+            i = prev(i);
+            if (!locked(i)) return -1;
+        }
+        for (uint64_t steps = 0; !is_empty(i) && steps < m_; steps++) {
+            i = next(i);
+            if (!locked(i)) return 1;
+        }
+        return 0;
+    }
+
+public:
     inline uint64_t cluster_len_at(uint64_t i) const {
         if (m_ == 0) return 0;
         if (is_empty(i)) return 0;
@@ -227,8 +420,9 @@ public:
     }
 
 private:
-    inline std::pair<uint64_t, uint16_t> qr(uint64_t key) const {
-        uint64_t x = h_(key);
+    inline std::pair<uint64_t, uint16_t> qr(uint64_t key) const { return qr_of_hash(h_(key)); }
+
+    inline std::pair<uint64_t, uint16_t> qr_of_hash(uint64_t x) const {
         uint64_t q = x & mask_;
         uint16_t r = (uint16_t)((x >> qbits_) & ((1ULL << rbits_) - 1ULL));
         if (r == 0) r = 1;
@@ -242,10 +436,10 @@ private:
         return rem_[i] == 0 && cont_[i] == 0 && shft_[i] == 0;
     }
 
-    inline void record_probe(uint64_t p) {
-        stats_.probes += p;
-        stats_.scan_steps += p;
-        if (p > stats_.max_probe) stats_.max_probe = p;
+    static inline void record_probe(Stats& st, uint64_t p) {
+        st.probes += p;
+        st.scan_steps += p;
+        if (p > st.max_probe) st.max_probe = p;
     }
 
     inline uint64_t find_cluster_start(uint64_t q) const {
@@ -361,8 +555,13 @@ private:
     uint64_t m_{0}, mask_{0};
     uint64_t count_{0};
 
-    std::vector<uint16_t> rem_;
-    std::vector<uint8_t> occ_, cont_, shft_;
+    Slab<uint16_t> rem_;
+    Slab<uint8_t> occ_, cont_, shft_;
+    HashKind hash_;
     Hasher64 h_{1};
     Stats stats_{};
+
+    int region_bits_{12};
+    uint64_t regions_{0};
+    std::unique_ptr<RegionLock[]> region_locks_;
 };
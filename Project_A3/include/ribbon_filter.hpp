@@ -0,0 +1,161 @@
+#pragma once
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <vector>
+#include "hash.hpp"
+#include "util.hpp"
+#include "snapshot.hpp"
+
+// Homogeneous Ribbon filter (Dillinger & Walzer, "Ribbon filter: practically
+// smaller than Bloom and Xor", 2021) with 64-bit coefficient rows. Each key
+// is a linear equation over GF(2): a 64-bit coefficient row c starting at a
+// random slot s, whose dot product with the fp_bits-bit solution values
+// S[s..s+63] must be 0. Banding (on-the-fly Gaussian elimination) keeps the
+// rows in echelon form; back substitution yields S, with random values for
+// the free slots, so a non-key's row evaluates to 0 with probability
+// ~2^-fp_bits. Unlike standard Ribbon (per-key fingerprints on the right-hand
+// side) the system can never be inconsistent, so construction is one pass
+// with no retries, at any overhead. OVERHEAD trades space for FPR: rows near
+// the end of the band are the most crowded, and a non-key row that falls in
+// their span always matches; at 64-bit rows 10% keeps that share well under
+// 2^-16 (5% leaves an FPR floor of ~1.5%).
+// S is stored "interleaved": per 64-slot block, fp_bits words, word b holding
+// bit b of the block's 64 slots, so a query is fp_bits (and-popcount-parity)
+// over at most two adjacent blocks.
+class RibbonFilter {
+public:
+    static constexpr double OVERHEAD = 0.10;  // slots per key - 1
+
+    explicit RibbonFilter(HashKind hash = HashKind::Splitmix) : hash_(hash) {}
+
+    void build(const std::vector<uint64_t>& keys, int fp_bits, uint64_t seed=1) {
+        fp_bits_ = std::max(1, std::min(16, fp_bits));
+        n_ = keys.size();
+        h_ = Hasher64(seed, hash_);
+        uint64_t slots = (uint64_t)std::ceil((double)n_ * (1.0 + OVERHEAD)) + 63;
+        num_blocks_ = (slots + 63) / 64;
+        num_starts_ = num_blocks_ * 64 - 63;
+        solve(keys);
+        built_ = true;
+    }
+
+    inline bool contains(uint64_t key) const {
+        if (!built_) return false;
+        uint64_t start, c;
+        row(h_(key), start, c);
+        return eval(start, c) == 0;
+    }
+
+    inline void contains_batch(const uint64_t* keys, size_t n, uint64_t* out_bits) const {
+        clear_bits(out_bits, n);
+        if (!built_) return;
+        uint64_t h[AMQ_BATCH_GROUP], start[AMQ_BATCH_GROUP], c[AMQ_BATCH_GROUP];
+        for (size_t g = 0; g < n; g += AMQ_BATCH_GROUP) {
+            size_t m = std::min(n - g, AMQ_BATCH_GROUP);
+            h_.batch(keys + g, m, h);
+            for (size_t i = 0; i < m; i++) {
+                row(h[i], start[i], c[i]);
+                const uint64_t* w = &words_[(start[i] >> 6) * fp_bits_];
+                prefetch_ro(w);
+                prefetch_ro(w + 2 * fp_bits_ - 1);  // the row may reach into the next block
+            }
+            for (size_t i = 0; i < m; i++)
+                if (eval(start[i], c[i]) == 0) set_bit(out_bits, g+i);
+        }
+    }
+
+    double bits_per_entry(uint64_t n) const {
+        return (double)words_.size() * 64.0 / (double)n;
+    }
+
+    // Snapshot (snapshot.hpp); a loaded filter borrows its solution words from the mapping.
+    void save(SnapshotWriter& w) const {
+        w.scalar(built_); w.scalar(n_); w.scalar((uint64_t)fp_bits_); w.scalar(h_.seed); w.scalar(num_blocks_);
+        w.scalar((uint64_t)hash_);
+        w.section(words_.data(), words_.size() * sizeof(uint64_t));
+    }
+
+    bool load(const std::shared_ptr<SnapshotMap>& s) {
+        if (s->filter() != "ribbon") return false;
+        built_ = s->scalar(0) != 0;
+        n_ = (size_t)s->scalar(1);
+        fp_bits_ = (int)s->scalar(2);
+        hash_ = (HashKind)s->scalar(5);
+        h_ = Hasher64(s->scalar(3), hash_);
+        num_blocks_ = s->scalar(4);
+        num_starts_ = num_blocks_ * 64 - 63;
+        return borrow_section(s, 0, built_ ? num_blocks_ * fp_bits_ : 0, words_);
+    }
+
+    uint64_t slots() const { return num_blocks_ * 64; }
+    int fp_bits() const { return fp_bits_; }
+
+private:
+    // Start slot and coefficient row (bit 0 set: the row's leading 1 is at start) of a key hash.
+    inline void row(uint64_t h, uint64_t& start, uint64_t& c) const {
+        start = (uint64_t)(((__uint128_t)h * num_starts_) >> 64);
+        c = splitmix64(h) | 1;
+    }
+
+    inline uint16_t eval(uint64_t start, uint64_t c) const {
+        const uint64_t* w = &words_[(start >> 6) * fp_bits_];
+        unsigned off = (unsigned)(start & 63);
+        uint16_t acc = 0;
+        for (int b = 0; b < fp_bits_; b++) {
+            uint64_t s = w[b] >> off;
+            if (off) s |= w[fp_bits_ + b] << (64 - off);
+            acc |= (uint16_t)(__builtin_popcountll(s & c) & 1) << b;
+        }
+        return acc;
+    }
+
+    // Banding, then back substitution into the interleaved layout.
+    void solve(const std::vector<uint64_t>& keys) {
+        const uint64_t m = num_blocks_ * 64;
+        std::vector<uint64_t> coeff(m, 0);
+        for (uint64_t k : keys) {
+            uint64_t i, c;
+            row(h_(k), i, c);
+            for (;;) {
+                if (coeff[i] == 0) { coeff[i] = c; break; }
+                c ^= coeff[i];
+                if (c == 0) break;  // linearly dependent on earlier keys: already satisfied
+                int tz = __builtin_ctzll(c);
+                i += (uint64_t)tz;
+                c >>= tz;
+            }
+        }
+
+        const uint16_t mask = (uint16_t)((1u << fp_bits_) - 1);
+        std::vector<uint16_t> sol(m + 64, 0);
+        for (uint64_t i = m; i-- > 0;) {
+            if (coeff[i] == 0) {  // free variable
+                sol[i] = (uint16_t)(splitmix64(h_.seed ^ i) & mask);
+                continue;
+            }
+            uint64_t c = coeff[i] >> 1;
+            uint16_t v = 0;
+            while (c) {
+                v ^= sol[i + 1 + (uint64_t)__builtin_ctzll(c)];
+                c &= c - 1;
+            }
+            sol[i] = v;
+        }
+
+        words_.assign(num_blocks_ * fp_bits_, 0);
+        for (uint64_t i = 0; i < m; i++) {
+            uint64_t* w = &words_[(i >> 6) * fp_bits_];
+            for (int b = 0; b < fp_bits_; b++)
+                w[b] |= (uint64_t)((sol[i] >> b) & 1) << (i & 63);
+        }
+    }
+
+    bool built_{false};
+    size_t n_{0};
+    int fp_bits_{12};
+    uint64_t num_blocks_{0}, num_starts_{1};
+    Slab<uint64_t> words_;
+    HashKind hash_;
+    Hasher64 h_{1};
+};
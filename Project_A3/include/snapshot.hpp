@@ -0,0 +1,180 @@
+#pragma once
+// On-disk filter snapshots, loaded zero-copy with mmap.
+//
+// File layout (little-endian, native struct layout):
+//   SnapshotHeader                  magic, version, filter name, build key,
+//                                   up to 24 uint64 scalars, up to 8 sections
+//   section 0, section 1, ...       raw filter arrays, each page-aligned
+//
+// Filters implement save(SnapshotWriter&) and load(snapshot) and keep their
+// arrays in Slab<T>, which either owns a std::vector or borrows a section of
+// the mapping. The mapping is MAP_PRIVATE and writable, so cuckoo/QF updates
+// after a load are copy-on-write and never reach the file.
+#include <cstdint>
+#include <cstdio>
+#include <cstring>
+#include <memory>
+#include <string>
+#include <utility>
+#include <vector>
+
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+static constexpr char AMQ_SNAPSHOT_MAGIC[8] = {'A','M','Q','S','N','A','P','\0'};
+static constexpr uint32_t AMQ_SNAPSHOT_VERSION = 2;
+static constexpr size_t AMQ_SNAPSHOT_ALIGN = 4096;
+
+struct SnapshotHeader {
+    char magic[8];
+    uint32_t version;
+    uint32_t nscalars, nsections;
+    uint32_t reserved;
+    char filter[16];
+    char key[160];          // build parameters the caller keyed the file by
+    uint64_t scalars[24];
+    struct { uint64_t offset, bytes; } sections[8];
+};
+
+// A mapped snapshot file; filters that borrow its sections hold a shared_ptr.
+class SnapshotMap {
+public:
+    ~SnapshotMap() { if (base_) munmap(base_, len_); }
+
+    // nullptr (and *err set) if the file is missing, truncated or not a snapshot.
+    static std::shared_ptr<SnapshotMap> open(const std::string& path, bool populate, std::string* err = nullptr) {
+        auto fail = [&](const char* why) { if (err) *err = path + ": " + why; return nullptr; };
+        int fd = ::open(path.c_str(), O_RDONLY);
+        if (fd < 0) return fail("cannot open");
+        struct stat st;
+        if (fstat(fd, &st) != 0 || (size_t)st.st_size < sizeof(SnapshotHeader)) { ::close(fd); return fail("too short"); }
+        int flags = MAP_PRIVATE;
+#ifdef MAP_POPULATE
+        if (populate) flags |= MAP_POPULATE;
+#endif
+        void* p = mmap(nullptr, (size_t)st.st_size, PROT_READ | PROT_WRITE, flags, fd, 0);
+        ::close(fd);
+        if (p == MAP_FAILED) return fail("mmap failed");
+        std::shared_ptr<SnapshotMap> m(new SnapshotMap(p, (size_t)st.st_size));
+        const SnapshotHeader& h = m->header();
+        if (std::memcmp(h.magic, AMQ_SNAPSHOT_MAGIC, 8) != 0 || h.version != AMQ_SNAPSHOT_VERSION ||
+            h.nscalars > 24 || h.nsections > 8)
+            return fail("not an amq snapshot of this version");
+        for (uint32_t i = 0; i < h.nsections; i++)
+            if (h.sections[i].bytes && (h.sections[i].offset > m->len_ ||
+                                        h.sections[i].bytes > m->len_ - h.sections[i].offset))
+                return fail("section past end of file");
+        return m;
+    }
+
+    const SnapshotHeader& header() const { return *(const SnapshotHeader*)base_; }
+    std::string filter() const { return std::string(header().filter, strnlen(header().filter, 16)); }
+    std::string key() const { return std::string(header().key, strnlen(header().key, 160)); }
+    size_t bytes() const { return len_; }
+
+    uint64_t scalar(uint32_t i) const { return i < header().nscalars ? header().scalars[i] : 0; }
+
+    // Section i as `count` elements of T; nullptr if absent or not a whole number of T.
+    template <class T>
+    T* section(uint32_t i, size_t& count) const {
+        const SnapshotHeader& h = header();
+        if (i >= h.nsections || h.sections[i].bytes % sizeof(T) != 0) return nullptr;
+        count = h.sections[i].bytes / sizeof(T);
+        return (T*)((char*)base_ + h.sections[i].offset);
+    }
+
+private:
+    SnapshotMap(void* base, size_t len) : base_(base), len_(len) {}
+    void* base_;
+    size_t len_;
+};
+
+// Collects a filter's scalars and arrays, then writes the file in one go.
+class SnapshotWriter {
+public:
+    explicit SnapshotWriter(const char* filter) {
+        std::memset(&h_, 0, sizeof(h_));
+        std::memcpy(h_.magic, AMQ_SNAPSHOT_MAGIC, 8);
+        h_.version = AMQ_SNAPSHOT_VERSION;
+        std::strncpy(h_.filter, filter, sizeof(h_.filter) - 1);
+    }
+
+    void scalar(uint64_t v) { if (h_.nscalars < 24) h_.scalars[h_.nscalars++] = v; }
+    void section(const void* p, size_t bytes) { if (h_.nsections < 8) secs_[h_.nsections++] = {p, bytes}; }
+
+    // Written to a temporary name and renamed, so concurrent writers of the
+    // same key (parallel sweep jobs) never expose a half-written file.
+    bool write(const std::string& path, const std::string& key) {
+        std::strncpy(h_.key, key.c_str(), sizeof(h_.key) - 1);
+        uint64_t off = (sizeof(h_) + AMQ_SNAPSHOT_ALIGN - 1) & ~(uint64_t)(AMQ_SNAPSHOT_ALIGN - 1);
+        for (uint32_t i = 0; i < h_.nsections; i++) {
+            h_.sections[i].offset = off;
+            h_.sections[i].bytes = secs_[i].second;
+            off = (off + secs_[i].second + AMQ_SNAPSHOT_ALIGN - 1) & ~(uint64_t)(AMQ_SNAPSHOT_ALIGN - 1);
+        }
+        std::string tmp = path + ".tmp." + std::to_string(getpid());
+        FILE* f = std::fopen(tmp.c_str(), "wb");
+        if (!f) return false;
+        bool ok = std::fwrite(&h_, sizeof(h_), 1, f) == 1;
+        for (uint32_t i = 0; ok && i < h_.nsections; i++) {
+            ok = std::fseek(f, (long)h_.sections[i].offset, SEEK_SET) == 0 &&
+                 (secs_[i].second == 0 || std::fwrite(secs_[i].first, secs_[i].second, 1, f) == 1);
+        }
+        ok = (std::fclose(f) == 0) && ok;
+        if (ok) ok = std::rename(tmp.c_str(), path.c_str()) == 0;
+        if (!ok) std::remove(tmp.c_str());
+        return ok;
+    }
+
+private:
+    SnapshotHeader h_;
+    std::pair<const void*, size_t> secs_[8];
+};
+
+// Contiguous T[]: owned (a std::vector, after assign) or borrowed from a
+// mapped snapshot (after borrow), with the vector calls the filters use.
+template <class T>
+class Slab {
+public:
+    Slab() = default;
+    Slab(const Slab& o) : own_(o.own_), keep_(o.keep_), p_(o.keep_ ? o.p_ : own_.data()), n_(o.n_) {}
+    Slab(Slab&& o) noexcept : own_(std::move(o.own_)), keep_(std::move(o.keep_)), p_(o.p_), n_(o.n_) {
+        o.p_ = nullptr; o.n_ = 0;
+    }
+    Slab& operator=(Slab o) noexcept {
+        std::swap(own_, o.own_); std::swap(keep_, o.keep_); std::swap(p_, o.p_); std::swap(n_, o.n_);
+        return *this;
+    }
+
+    void assign(size_t n, const T& v) { keep_.reset(); own_.assign(n, v); p_ = own_.data(); n_ = n; }
+    void clear() { keep_.reset(); own_.clear(); p_ = own_.data(); n_ = 0; }
+    void borrow(std::shared_ptr<SnapshotMap> keep, T* p, size_t n) {
+        std::vector<T>().swap(own_);
+        keep_ = std::move(keep); p_ = p; n_ = n;
+    }
+    bool borrowed() const { return keep_ != nullptr; }
+
+    size_t size() const { return n_; }
+    T* data() { return p_; }
+    const T* data() const { return p_; }
+    T& operator[](size_t i) { return p_[i]; }
+    const T& operator[](size_t i) const { return p_[i]; }
+
+private:
+    std::vector<T> own_;
+    std::shared_ptr<SnapshotMap> keep_;
+    T* p_ = nullptr;
+    size_t n_ = 0;
+};
+
+// Borrow section i into s if it holds exactly `expect` elements.
+template <class T>
+static inline bool borrow_section(const std::shared_ptr<SnapshotMap>& m, uint32_t i, size_t expect, Slab<T>& s) {
+    size_t count = 0;
+    T* p = m->section<T>(i, count);
+    if (!p || count != expect) return false;
+    s.borrow(m, p, count);
+    return true;
+}
@@ -2,7 +2,12 @@
 #include <cstdint>
 #include <vector>
 #include <algorithm>
+#include <array>
+#include <atomic>
 #include <chrono>
+#include <cmath>
+#include <string>
+#include <thread>
 
 static inline uint64_t now_ns() {
     return (uint64_t)std::chrono::duration_cast<std::chrono::nanoseconds>(
@@ -19,21 +24,131 @@ static inline uint64_t next_pow2(uint64_t x) {
 template <class T>
 static inline T clamp(T v, T lo, T hi) { return std::max(lo, std::min(v, hi)); }
 
+// Relaxed atomic updates of plain uint64_t stats fields, for the filters'
+// concurrent paths where several writers bump the same counters.
+static inline void stat_add(uint64_t &x, uint64_t v) { __atomic_fetch_add(&x, v, __ATOMIC_RELAXED); }
+static inline void stat_max(uint64_t &x, uint64_t v) {
+    uint64_t cur = __atomic_load_n(&x, __ATOMIC_RELAXED);
+    while (v > cur && !__atomic_compare_exchange_n(&x, &cur, v, true, __ATOMIC_RELAXED, __ATOMIC_RELAXED)) {}
+}
+
+// fn(begin, end) over [0, n) split into `threads` contiguous chunks, one
+// std::thread each (inline when threads <= 1 or n is small).
+template <class F>
+static inline void parallel_for(size_t n, int threads, F fn) {
+    size_t t = (size_t)std::max(1, threads);
+    if (t == 1 || n < 4096) { fn((size_t)0, n); return; }
+    std::vector<std::thread> ts;
+    ts.reserve(t);
+    for (size_t i = 0; i < t; i++) ts.emplace_back(fn, n * i / t, n * (i + 1) / t);
+    for (auto &th : ts) th.join();
+}
+
+// contains_batch(keys, n, out_bits) on every filter: bit i of out_bits
+// (ceil(n/64) words) is contains(keys[i]). Keys are hashed and their
+// blocks/buckets prefetched AMQ_BATCH_GROUP at a time before any is resolved,
+// so the cache misses of a group overlap instead of being paid one by one.
+static constexpr size_t AMQ_BATCH_GROUP = 32;
+
+static inline void prefetch_ro(const void* p) { __builtin_prefetch(p, 0, 3); }
+
+static inline void clear_bits(uint64_t* bits, size_t n) {
+    for (size_t w = 0; w < (n + 63) / 64; w++) bits[w] = 0;
+}
+static inline void set_bit(uint64_t* bits, size_t i) { bits[i >> 6] |= 1ULL << (i & 63); }
+
+static inline void cpu_relax() {
+#if defined(__x86_64__) || defined(__i386__)
+    __builtin_ia32_pause();
+#endif
+}
+
+// Log-bucketed latency histogram (HDR-style): values below 64 ns get their own
+// bucket, above that every power of two is split into 32 linear sub-buckets
+// (<= ~3% relative error). Fixed size, so memory does not grow with --ops.
+struct LatencyHistogram {
+    static constexpr int SUB_BITS = 5;
+    static constexpr uint64_t SUB = 1ull << SUB_BITS;
+    static constexpr size_t BUCKETS = (64 - SUB_BITS + 1) * SUB;
+
+    std::array<uint64_t, BUCKETS> counts{};
+    uint64_t total = 0;
+    uint64_t max = 0;
+
+    static inline size_t index(uint64_t v) {
+        if (v < 2*SUB) return (size_t)v;
+        int e = 63 - __builtin_clzll(v);
+        int shift = e - SUB_BITS;
+        return (size_t)(shift + 1) * SUB + (size_t)((v >> shift) - SUB);
+    }
+    // Largest value that lands in bucket i.
+    static inline uint64_t upper(size_t i) {
+        if (i < 2*SUB) return (uint64_t)i;
+        int shift = (int)(i / SUB) - 1;
+        uint64_t mant = SUB + i % SUB;
+        return ((mant + 1) << shift) - 1;
+    }
+
+    inline void record(uint64_t v) {
+        counts[index(v)]++;
+        total++;
+        if (v > max) max = v;
+    }
+
+    uint64_t percentile(double p) const {
+        if (total == 0) return 0;
+        uint64_t rank = (uint64_t)std::ceil(p * (double)total);
+        if (rank < 1) rank = 1;
+        uint64_t seen = 0;
+        for (size_t i = 0; i < BUCKETS; i++) {
+            seen += counts[i];
+            if (seen >= rank) return std::min(upper(i), max);
+        }
+        return max;
+    }
+};
+
+// Shared sink the worker threads fold their private histograms into with
+// relaxed atomic adds (no lock, no sample copies).
+struct AtomicLatencyHistogram {
+    std::array<std::atomic<uint64_t>, LatencyHistogram::BUCKETS> counts{};
+    std::atomic<uint64_t> total{0};
+    std::atomic<uint64_t> max{0};
+
+    void merge(const LatencyHistogram& h) {
+        for (size_t i = 0; i < LatencyHistogram::BUCKETS; i++)
+            if (h.counts[i]) counts[i].fetch_add(h.counts[i], std::memory_order_relaxed);
+        total.fetch_add(h.total, std::memory_order_relaxed);
+        uint64_t cur = max.load(std::memory_order_relaxed);
+        while (h.max > cur && !max.compare_exchange_weak(cur, h.max, std::memory_order_relaxed)) {}
+    }
+
+    LatencyHistogram snapshot() const {
+        LatencyHistogram h;
+        for (size_t i = 0; i < LatencyHistogram::BUCKETS; i++) h.counts[i] = counts[i].load(std::memory_order_relaxed);
+        h.total = total.load(std::memory_order_relaxed);
+        h.max = max.load(std::memory_order_relaxed);
+        return h;
+    }
+};
+
 struct LatencyStats {
-    double p50=0, p95=0, p99=0;
+    double p50=0, p95=0, p99=0, p999=0, max=0;
+    std::string hist; // sparse "bucket:count|..." so runs can be merged offline
 };
 
-static inline LatencyStats compute_latency_stats(std::vector<uint64_t>& ns) {
+static inline LatencyStats compute_latency_stats(const LatencyHistogram& h) {
     LatencyStats s;
-    if (ns.empty()) return s;
-    std::sort(ns.begin(), ns.end());
-    auto pct = [&](double p)->double {
-        double idx = p * (ns.size()-1);
-        size_t i = (size_t)idx;
-        return (double)ns[i];
-    };
-    s.p50 = pct(0.50);
-    s.p95 = pct(0.95);
-    s.p99 = pct(0.99);
+    if (h.total == 0) return s;
+    s.p50 = (double)h.percentile(0.50);
+    s.p95 = (double)h.percentile(0.95);
+    s.p99 = (double)h.percentile(0.99);
+    s.p999 = (double)h.percentile(0.999);
+    s.max = (double)h.max;
+    for (size_t i = 0; i < LatencyHistogram::BUCKETS; i++) {
+        if (!h.counts[i]) continue;
+        if (!s.hist.empty()) s.hist += '|';
+        s.hist += std::to_string(i) + ':' + std::to_string(h.counts[i]);
+    }
     return s;
 }
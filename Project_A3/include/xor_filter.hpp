@@ -1,24 +1,35 @@
 #pragma once
+#include <atomic>
 #include <cstdint>
 #include <vector>
 #include <queue>
 #include <cmath>
 #include "hash.hpp"
 #include "util.hpp"
+#include "snapshot.hpp"
 
 class XorFilter {
 public:
-    void build(const std::vector<uint64_t>& keys, int fp_bits, uint64_t seed=1) {
+    explicit XorFilter(HashKind hash = HashKind::Splitmix) : hash_(hash) {}
+
+    // threads > 1 builds with build_parallel (same filter layout rules, a
+    // different but equally valid peeling order).
+    void build(const std::vector<uint64_t>& keys, int fp_bits, uint64_t seed=1, int threads=1) {
         fp_bits_ = fp_bits;
         n_ = keys.size();
-        h0_ = Hasher64(seed);
-        h1_ = Hasher64(seed ^ 0x9e3779b97f4a7c15ULL);
-        h2_ = Hasher64(seed ^ 0xbf58476d1ce4e5b9ULL);
+        h0_ = Hasher64(seed, hash_);
+        h1_ = Hasher64(seed ^ 0x9e3779b97f4a7c15ULL, hash_);
+        h2_ = Hasher64(seed ^ 0xbf58476d1ce4e5b9ULL, hash_);
 
         m_ = (uint32_t)std::ceil((double)n_ * 1.23);
         m_ = (uint32_t)next_pow2(m_);
         mask_ = m_ - 1;
 
+        if (threads > 1) {
+            if (!build_parallel(keys, threads)) build(keys, fp_bits, seed + 0x9e3779b97f4a7c15ULL, threads);
+            return;
+        }
+
         std::vector<uint32_t> deg(m_, 0);
         std::vector<uint64_t> xorkey(m_, 0);
         std::vector<uint64_t> xorh(m_, 0);
@@ -82,15 +93,137 @@ public:
         return r == f;
     }
 
+    inline void contains_batch(const uint64_t* keys, size_t n, uint64_t* out_bits) const {
+        clear_bits(out_bits, n);
+        if (!built_) return;
+        uint64_t h[3][AMQ_BATCH_GROUP];
+        uint32_t p[AMQ_BATCH_GROUP][3];
+        for (size_t g = 0; g < n; g += AMQ_BATCH_GROUP) {
+            size_t m = std::min(n - g, AMQ_BATCH_GROUP);
+            h0_.batch(keys + g, m, h[0]);
+            h1_.batch(keys + g, m, h[1]);
+            h2_.batch(keys + g, m, h[2]);
+            for (size_t i = 0; i < m; i++) {
+                for (int j = 0; j < 3; j++) p[i][j] = (uint32_t)(h[j][i] & mask_);
+                prefetch_ro(&fp_[p[i][0]]);
+                prefetch_ro(&fp_[p[i][1]]);
+                prefetch_ro(&fp_[p[i][2]]);
+            }
+            for (size_t i = 0; i < m; i++) {
+                uint16_t f = (uint16_t)fingerprint(h[0][i] >> 32, fp_bits_);
+                if ((uint16_t)(fp_[p[i][0]] ^ fp_[p[i][1]] ^ fp_[p[i][2]]) == f) set_bit(out_bits, g+i);
+            }
+        }
+    }
+
     double bits_per_entry(uint64_t n) const {
         return (double)fp_.size() * (double)fp_bits_ / (double)n;
     }
 
+    // Snapshot (snapshot.hpp); a loaded filter borrows its fingerprints from the mapping.
+    void save(SnapshotWriter& w) const {
+        w.scalar(built_); w.scalar(n_); w.scalar(m_); w.scalar((uint64_t)fp_bits_);
+        w.scalar(h0_.seed); w.scalar(h1_.seed); w.scalar(h2_.seed); w.scalar((uint64_t)hash_);
+        w.section(fp_.data(), fp_.size() * sizeof(uint16_t));
+    }
+
+    bool load(const std::shared_ptr<SnapshotMap>& s) {
+        if (s->filter() != "xor") return false;
+        built_ = s->scalar(0) != 0;
+        n_ = (size_t)s->scalar(1);
+        m_ = (uint32_t)s->scalar(2);
+        mask_ = m_ ? m_ - 1 : 0;
+        fp_bits_ = (int)s->scalar(3);
+        hash_ = (HashKind)s->scalar(7);
+        h0_ = Hasher64(s->scalar(4), hash_); h1_ = Hasher64(s->scalar(5), hash_); h2_ = Hasher64(s->scalar(6), hash_);
+        return borrow_section(s, 0, built_ ? m_ : 0, fp_);
+    }
+
     uint32_t array_size() const { return m_; }
     int fp_bits() const { return fp_bits_; }
 
 private:
-    inline uint64_t hfinger(uint64_t k) const { return h0_(k); }
+    // Parallel construction. The per-key degree / key-xor accumulation runs on
+    // all threads with atomic updates. Peeling proceeds in rounds: each cell
+    // of degree 1 at the start of a round peels its key if it is the key's
+    // lowest-indexed degree-1 cell (so no key is peeled twice), and the round's
+    // removals are then applied in parallel, collecting the cells that drop to
+    // degree 1 as the next round. A key peeled in a round never touches another
+    // peel cell of that round (that cell held only its own key), so the
+    // assignment runs round by round in reverse with each round in parallel.
+    // false if the key set does not peel completely (the caller reseeds).
+    inline bool build_parallel(const std::vector<uint64_t>& keys, int threads) {
+        struct StackEnt { uint32_t idx; uint64_t key; };
+        std::vector<uint32_t> deg(m_, 0);
+        std::vector<uint64_t> xorkey(m_, 0);
+        parallel_for(n_, threads, [&](size_t b, size_t e) {
+            for (size_t i = b; i < e; i++) {
+                uint64_t k = keys[i];
+                for (uint32_t p : {pos0(k), pos1(k), pos2(k)}) {
+                    __atomic_fetch_add(&deg[p], 1u, __ATOMIC_RELAXED);
+                    __atomic_fetch_xor(&xorkey[p], k, __ATOMIC_RELAXED);
+                }
+            }
+        });
+
+        auto gather = [&](size_t n, auto body) {
+            std::vector<std::vector<StackEnt>> parts(threads);
+            std::vector<StackEnt> out;
+            std::atomic<int> slot{0};
+            parallel_for(n, threads, [&](size_t b, size_t e) {
+                auto &mine = parts[slot.fetch_add(1)];
+                for (size_t i = b; i < e; i++) body(i, mine);
+            });
+            for (auto &p : parts) out.insert(out.end(), p.begin(), p.end());
+            return out;
+        };
+
+        std::vector<StackEnt> frontier = gather(m_, [&](size_t i, std::vector<StackEnt> &out) {
+            if (deg[i] == 1) out.push_back({(uint32_t)i, 0});
+        });
+        std::vector<std::vector<StackEnt>> rounds;
+        size_t peeled = 0;
+        while (!frontier.empty()) {
+            std::vector<StackEnt> sel = gather(frontier.size(), [&](size_t j, std::vector<StackEnt> &out) {
+                uint32_t i = frontier[j].idx;
+                if (deg[i] != 1) return;
+                uint64_t k = xorkey[i];
+                uint32_t owner = i;
+                for (uint32_t p : {pos0(k), pos1(k), pos2(k)})
+                    if (deg[p] == 1 && p < owner) owner = p;
+                if (owner == i) out.push_back({i, k});
+            });
+            if (sel.empty()) break;
+            frontier = gather(sel.size(), [&](size_t j, std::vector<StackEnt> &out) {
+                uint64_t k = sel[j].key;
+                for (uint32_t p : {pos0(k), pos1(k), pos2(k)}) {
+                    __atomic_fetch_xor(&xorkey[p], k, __ATOMIC_RELAXED);
+                    if (__atomic_fetch_sub(&deg[p], 1u, __ATOMIC_RELAXED) == 2) out.push_back({p, 0});
+                }
+            });
+            peeled += sel.size();
+            rounds.push_back(std::move(sel));
+        }
+        if (peeled != n_) return false;
+
+        fp_.assign(m_, 0);
+        for (size_t r = rounds.size(); r-- > 0;) {
+            const auto &round = rounds[r];
+            parallel_for(round.size(), threads, [&](size_t b, size_t e) {
+                for (size_t j = b; j < e; j++) {
+                    uint64_t k = round[j].key;
+                    uint16_t f = (uint16_t)fingerprint(hfinger(k), fp_bits_);
+                    fp_[round[j].idx] = f ^ fp_[pos0(k)] ^ fp_[pos1(k)] ^ fp_[pos2(k)];
+                }
+            });
+        }
+        built_ = true;
+        return true;
+    }
+
+    // the high half of h0: its low bits are pos0, and a fingerprint equal to
+    // the cell index bits would match any key sharing that cell
+    inline uint64_t hfinger(uint64_t k) const { return h0_(k) >> 32; }
     inline uint32_t pos0(uint64_t k) const { return (uint32_t)(h0_(k) & mask_); }
     inline uint32_t pos1(uint64_t k) const { return (uint32_t)(h1_(k) & mask_); }
     inline uint32_t pos2(uint64_t k) const { return (uint32_t)(h2_(k) & mask_); }
@@ -99,6 +232,7 @@ private:
     size_t n_{0};
     uint32_t m_{0}, mask_{0};
     int fp_bits_{12};
-    std::vector<uint16_t> fp_;
+    Slab<uint16_t> fp_;
+    HashKind hash_;
     Hasher64 h0_{1}, h1_{2}, h2_{3};
 };
@@ -2,6 +2,11 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from results_store import load  # noqa: E402
 
 def ci95(x):
     x = np.asarray(x, dtype=float)
@@ -9,14 +14,69 @@ def ci95(x):
         return 0.0
     return 1.96 * x.std(ddof=1) / np.sqrt(len(x))
 
+# Must match LatencyHistogram in include/util.hpp.
+HIST_SUB_BITS = 5
+HIST_SUB = 1 << HIST_SUB_BITS
+
+def hist_upper(i):
+    """Largest latency (ns) that falls into bucket i."""
+    if i < 2 * HIST_SUB:
+        return i
+    shift = i // HIST_SUB - 1
+    return ((HIST_SUB + i % HIST_SUB + 1) << shift) - 1
+
+def hist_parse(s):
+    """Parse one lat_hist cell ("bucket:count|...") into {bucket: count}."""
+    h = {}
+    if isinstance(s, str) and s:
+        for tok in s.split("|"):
+            i, c = tok.split(":")
+            h[int(i)] = h.get(int(i), 0) + int(c)
+    return h
+
+def hist_merge(cells):
+    """Sum the histograms of several runs (the exact merged distribution, not an average of percentiles)."""
+    total = {}
+    for cell in cells:
+        for i, c in hist_parse(cell).items():
+            total[i] = total.get(i, 0) + c
+    return total
+
+def hist_percentiles(h, ps=(0.50, 0.95, 0.99, 0.999), max_ns=None):
+    """Bucket upper bound at each percentile, clamped to max_ns like LatencyHistogram::percentile."""
+    if not h:
+        return {p: np.nan for p in ps}
+    idx = np.array(sorted(h))
+    cum = np.cumsum([h[i] for i in idx])
+    ranks = np.maximum(1, np.ceil(np.array(ps) * cum[-1]))
+    pct = {p: hist_upper(int(idx[np.searchsorted(cum, r)])) for p, r in zip(ps, ranks)}
+    if max_ns is not None and not np.isnan(max_ns):
+        pct = {p: min(v, max_ns) for p, v in pct.items()}
+    return pct
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--csv", default="results.csv")
     ap.add_argument("--out_prefix", default="plot")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.csv)
-    grp_cols = ["filter","n","target_fpr","load","fp_bits","r_bits","threads","qfrac","neg_share","ops"]
+    df = load(args.csv, "a3")
+    if "dist" not in df.columns:  # CSVs from before the --dist axis
+        df["dist"] = "uniform"
+    df["dist"] = df["dist"].astype(str)
+    if "placement" not in df.columns:  # CSVs from before the --placement axis (tid-th allowed CPU)
+        df["placement"] = "compact"
+    df["placement"] = df["placement"].astype(str)
+    if "sync" not in df.columns:  # CSVs from before the concurrent update path
+        df["sync"] = "none"
+    df["sync"] = df["sync"].astype(str)
+    if "batch" not in df.columns:  # CSVs from before --batch
+        df["batch"] = 1
+    if "hash" not in df.columns:  # CSVs from before --hash
+        df["hash"] = "splitmix"
+    df["hash"] = df["hash"].astype(str)
+    grp_cols = ["filter","n","target_fpr","load","fp_bits","r_bits","threads","placement","sync","batch","hash","qfrac",
+                "neg_share","dist","ops"]
     g = df.groupby(grp_cols).agg(
         achieved_fpr_mean=("achieved_fpr","mean"),
         achieved_fpr_ci=("achieved_fpr", ci95),
@@ -26,12 +86,21 @@ def main():
         thr_ci=("throughput_ops_s", ci95),
         p95_mean=("p95_ns","mean"),
         p99_mean=("p99_ns","mean"),
+        p999_mean=("p999_ns","mean"),
+        max_ns=("max_ns","max"),
         insert_fail_mean=("insert_fail","mean"),
         kicks_mean=("kicks","mean"),
         stash_hits_mean=("stash_hits","mean"),
         fp_checks_mean=("fp_checks","mean"),
         scan_steps_mean=("scan_steps","mean"),
     ).reset_index()
+    g_hash = g
+    g_all = g = g[g["hash"]=="splitmix"]  # the default hash; the hash backends get their own figure
+    placements = sorted(g_all["placement"].unique(), key=lambda p: (p != "compact", p))
+    g = g[g["dist"]=="uniform"]  # the figures below are about uniform keys; skew gets its own
+    g = g[g["placement"]==placements[0]]  # ... and one placement; thread scaling gets its own
+    g = g[(g["threads"]>1) | (g["sync"]=="none")]  # 1-thread baselines: the unsynchronized calls
+    g = g[g["batch"]==1]  # one contains per key; batched lookups get their own figure
 
     plt.figure()
     for flt in sorted(g["filter"].unique()):
@@ -46,6 +115,11 @@ def main():
             fmt='o',
             label=flt
         )
+    # information-theoretic minimum: log2(1/FPR) bits per key
+    fprs = g.loc[(g["threads"]==1) & (g["qfrac"]==1.0) & (g["achieved_fpr_mean"]>0), "achieved_fpr_mean"]
+    if not fprs.empty:
+        fpr_line = np.logspace(np.log10(fprs.min()), np.log10(fprs.max()), 50)
+        plt.plot(-np.log2(fpr_line), fpr_line, "k--", linewidth=1, label="lower bound")
     plt.yscale("log")
     plt.xlabel("Bits per entry (mean)")
     plt.ylabel("Achieved FPR (mean)")
@@ -80,5 +154,129 @@ def main():
     plt.tight_layout()
     plt.savefig(f"{args.out_prefix}_ops_vs_load.png", dpi=160)
 
+    # Thread scaling per placement policy (query-only, uniform keys, smallest n).
+    sub_all = g_all[(g_all["dist"]=="uniform") & (g_all["n"]==n0) & (g_all["qfrac"]==1.0)]
+    if sub_all["threads"].nunique() > 1:
+        plt.figure()
+        for flt in sorted(sub_all["filter"].unique()):
+            for pl in placements:
+                sub = sub_all[(sub_all["filter"]==flt) & (sub_all["placement"]==pl)]
+                if sub.empty:
+                    continue
+                thr = sub.groupby("threads")["thr_mean"].median()
+                plt.plot(thr.index, thr.values, marker='o', label=f"{flt} {pl}")
+        plt.xlabel("Threads")
+        plt.ylabel("Ops/s (median over configs)")
+        plt.legend(fontsize=7)
+        plt.tight_layout()
+        plt.savefig(f"{args.out_prefix}_throughput_vs_threads.png", dpi=160)
+
+    # Batched lookups: query throughput vs contains_batch size, per filter and n.
+    bt = g_all[(g_all["threads"]==1) & (g_all["qfrac"]==1.0) & (g_all["dist"]=="uniform")
+               & (g_all["placement"]==placements[0])]
+    if bt["batch"].nunique() > 1:
+        plt.figure()
+        for (flt, n), sub in bt.groupby(["filter","n"]):
+            if sub["batch"].nunique() < 2:
+                continue
+            thr = sub.groupby("batch")["thr_mean"].median()
+            plt.plot(thr.index, thr.values, marker='o', label=f"{flt} n={n:g}")
+        plt.xscale("log", base=2)
+        plt.xlabel("Query batch size (keys per contains_batch)")
+        plt.ylabel("Ops/s (query-only)")
+        plt.legend(fontsize=7)
+        plt.tight_layout()
+        plt.savefig(f"{args.out_prefix}_throughput_vs_batch.png", dpi=160)
+
+    # Multi-writer scaling: mixed workloads on the concurrent cuckoo (striped)
+    # and QF (region) paths, one line per filter and query fraction.
+    mt = g_all[(g_all["sync"]!="none") & (g_all["qfrac"]<1.0) & (g_all["dist"]=="uniform")
+               & (g_all["placement"]==placements[0])]
+    if mt["threads"].nunique() > 1:
+        plt.figure()
+        for (flt, sync, qfrac), sub in mt.groupby(["filter","sync","qfrac"]):
+            thr = sub.groupby("threads")["thr_mean"].median()
+            ci = sub.groupby("threads")["thr_ci"].median()
+            plt.errorbar(thr.index, thr.values, yerr=ci.values, fmt='o-', capsize=3,
+                         label=f"{flt} ({sync} locks), qfrac={qfrac:g}")
+        plt.xlabel("Threads")
+        plt.ylabel("Ops/s (mixed, median over configs)")
+        plt.legend(fontsize=7)
+        plt.tight_layout()
+        plt.savefig(f"{args.out_prefix}_mixed_scaling.png", dpi=160)
+
+    # Skew axis: throughput per key distribution, per filter.
+    if g_all["dist"].nunique() > 1:
+        dists = sorted(g_all["dist"].unique(), key=lambda d: (d != "uniform", d))
+        plt.figure()
+        for flt in sorted(g_all["filter"].unique()):
+            sub = g_all[(g_all["filter"]==flt) & (g_all["n"]==n0) & (g_all["threads"]==1)
+                        & (g_all["placement"]==placements[0])]
+            if sub.empty:
+                continue
+            thr = sub.groupby("dist")["thr_mean"].median().reindex(dists)
+            plt.plot(dists, thr.values, marker='o', label=flt)
+        plt.xlabel("Key distribution")
+        plt.ylabel("Ops/s (median over configs)")
+        plt.legend()
+        plt.tight_layout()
+        plt.savefig(f"{args.out_prefix}_throughput_vs_dist.png", dpi=160)
+
+    # Hash backends: query throughput vs achieved FPR per filter (colour) and
+    # --hash (marker), scalar lookups and batched (Hasher64::batch) side by side.
+    hs = g_hash[(g_hash["threads"]==1) & (g_hash["qfrac"]==1.0) & (g_hash["dist"]=="uniform")
+                & (g_hash["placement"]==placements[0]) & (g_hash["n"]==n0)]
+    if hs["hash"].nunique() > 1:
+        hashes = sorted(hs["hash"].unique(), key=lambda h: (h != "splitmix", h))
+        filters = sorted(hs["filter"].unique())
+        hb = [x for x in sorted(hs["batch"].unique()) if hs[hs["batch"]==x]["hash"].nunique() > 1]
+        markers = "osD^vP*X"
+        colors = {flt: f"C{i}" for i, flt in enumerate(filters)}
+        fig, axes = plt.subplots(1, len(hb), figsize=(6*len(hb), 4.5), squeeze=False, sharey=True)
+        for ax, batch in zip(axes[0], hb):
+            for flt in filters:
+                for i, h in enumerate(hashes):
+                    sub = hs[(hs["filter"]==flt) & (hs["hash"]==h) & (hs["batch"]==batch)]
+                    if sub.empty:
+                        continue
+                    ax.errorbar(sub["achieved_fpr_mean"], sub["thr_mean"], yerr=sub["thr_ci"],
+                                fmt=markers[i % len(markers)], color=colors[flt], capsize=2)
+            ax.set_xscale("log")
+            ax.set_xlabel("Achieved FPR (mean)")
+            ax.set_title("one contains per key" if batch == 1 else f"contains_batch, batch={batch}")
+        axes[0][0].set_ylabel("Ops/s (query-only)")
+        handles = [plt.Line2D([], [], color=colors[f], marker="o", linestyle="", label=f) for f in filters]
+        handles += [plt.Line2D([], [], color="k", marker=markers[i % len(markers)], linestyle="", label=h)
+                    for i, h in enumerate(hashes)]
+        axes[0][-1].legend(handles=handles, fontsize=7)
+        plt.tight_layout()
+        plt.savefig(f"{args.out_prefix}_hash_throughput_vs_fpr.png", dpi=160)
+
+    # Tail latency from the merged histograms of every run (only --latency runs carry one).
+    # Same slice as g: batched rows time a whole batch / batch size per key, so
+    # only batch==1 runs are merged, with the default hash, uniform keys, one
+    # placement and one negative share.
+    tails = df[(df["batch"]==1) & (df["hash"]=="splitmix") & (df["dist"]=="uniform")
+               & (df["placement"]==placements[0]) & (df["sync"]=="none")
+               & (df["n"]==n0) & (df["threads"]==1) & (df["qfrac"]==1.0)]
+    if not tails.empty:
+        neg0 = 0.5 if (tails["neg_share"]==0.5).any() else tails["neg_share"].min()  # 0.5: the --neg default
+        tails = tails[tails["neg_share"]==neg0]
+    if "lat_hist" in tails.columns and tails["lat_hist"].notna().any():
+        ps = (0.50, 0.95, 0.99, 0.999)
+        plt.figure()
+        for flt in sorted(tails["filter"].unique()):
+            sub = tails[tails["filter"]==flt]
+            pct = hist_percentiles(hist_merge(sub["lat_hist"].dropna()), ps, sub["max_ns"].max())
+            if np.isnan(pct[ps[0]]):
+                continue
+            plt.plot([f"p{p*100:g}" for p in ps], [pct[p] for p in ps], marker='o', label=flt)
+        plt.yscale("log")
+        plt.xlabel(f"Percentile (all runs merged, neg={neg0:g})")
+        plt.ylabel("Query latency (ns)")
+        plt.legend()
+        plt.tight_layout()
+        plt.savefig(f"{args.out_prefix}_latency_tails.png", dpi=160)
+
 if __name__ == "__main__":
     main()
@@ -3,24 +3,180 @@
 from __future__ import annotations
 
 import argparse
+import contextlib
+import hashlib
 import itertools
+import json
 import os
 import subprocess
+import sys
+import time
 from pathlib import Path
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from bench_client import BenchServer  # noqa: E402
 
-def run(cmd: list[str]) -> None:
+
+def run(cmd: list[str], server: BenchServer | None = None) -> None:
     print(" ".join(cmd), flush=True)
-    subprocess.run(cmd, check=True)
+    if server is None:
+        subprocess.run(cmd, check=True)
+        return
+    server.run(cmd[1:])
+    sys.stderr.write(server.stderr())
+
+
+def parse_cpu_list(s: str) -> set[int]:
+    """Parse a sysfs/taskset style CPU list such as "0-3,8,10-11"."""
+    cpus: set[int] = set()
+    for tok in s.split(","):
+        tok = tok.strip()
+        if not tok:
+            continue
+        if "-" in tok:
+            a, b = (int(x) for x in tok.split("-", 1))
+            cpus.update(range(min(a, b), max(a, b) + 1))
+        else:
+            cpus.add(int(tok))
+    return cpus
+
+
+def core_groups(reserved: set[int]) -> list[list[int]]:
+    """
+    Group the CPUs we may use into physical cores (SMT siblings together),
+    dropping any core that has a reserved sibling.
+    """
+    cores: dict[tuple[int, int], list[int]] = {}
+    for cpu in sorted(os.sched_getaffinity(0)):
+        topo = Path(f"/sys/devices/system/cpu/cpu{cpu}/topology")
+        try:
+            key = (int((topo / "physical_package_id").read_text()), int((topo / "core_id").read_text()))
+        except (OSError, ValueError):
+            key = (-1, cpu)
+        cores.setdefault(key, []).append(cpu)
+    return [cpus for _, cpus in sorted(cores.items()) if not reserved.intersection(cpus)]
+
+
+def job_threads(cmd: list[str]) -> int:
+    return int(cmd[cmd.index("--threads") + 1]) if "--threads" in cmd else 1
+
+
+def job_placement(cmd: list[str]) -> str:
+    return cmd[cmd.index("--placement") + 1] if "--placement" in cmd else "compact"
+
+
+def binary_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def job_params(cmd: list[str]) -> dict[str, str]:
+    """The --flag value pairs of an amq_bench command (filter, n, fpr, load, ...)."""
+    return dict(zip(cmd[1::2], cmd[2::2]))
+
+
+def job_key(cmd: list[str], bin_sha: str) -> str:
+    """Content address of one run: its full parameter tuple plus the binary hash."""
+    blob = json.dumps({"params": job_params(cmd), "bin": bin_sha}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()[:24]
+
+
+def load_manifest(path: Path) -> dict[str, dict]:
+    """
+    Read the append-only manifest of finished runs. A torn last line (crash
+    while appending) or an entry whose shard has gone missing is ignored.
+    """
+    done: dict[str, dict] = {}
+    if not path.exists():
+        return done
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if (path.parent / f"{entry['key']}.csv").exists():
+            done[entry["key"]] = entry
+    return done
+
+
+def record_done(manifest: Path, key: str, cmd: list[str], bin_sha: str) -> None:
+    """Publish a finished run: move its shard into place, then append to the manifest."""
+    os.replace(manifest.parent / f"{key}.csv.part", manifest.parent / f"{key}.csv")
+    entry = {"key": key, "params": job_params(cmd), "bin_sha256": bin_sha, "finished": time.time()}
+    with open(manifest, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, sort_keys=True) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
 
 
-def physical_cores() -> int:
-    try:
-        out = subprocess.check_output(["bash", "-lc", "lscpu -p=CORE | grep -v '^#' | sort -u | wc -l"]).decode().strip()
-        v = int(out)
-        return max(1, v)
-    except Exception:
-        return max(1, os.cpu_count() or 1)
+def merge_shards(shards: list[Path], out: str) -> int:
+    """Rewrite out from the shard CSVs in job order, writing the header only once."""
+    rows = 0
+    have_header = False
+    with open(out, "w", encoding="utf-8") as dst:
+        for shard in shards:
+            if not shard.exists():
+                continue
+            lines = shard.read_text(encoding="utf-8").splitlines(keepends=True)
+            if not lines:
+                continue
+            if not have_header:
+                dst.write(lines[0])
+                have_header = True
+            dst.writelines(lines[1:])
+            rows += len(lines) - 1
+    return rows
+
+
+def run_parallel(jobs: list[list[str]], outs: list[Path], reserved: set[int], on_done) -> list[int]:
+    """
+    Pack jobs onto disjoint physical cores. A job with --threads T gets T whole
+    cores (SMT siblings stay idle) and is pinned to one logical CPU per core;
+    an smt-pairs job gets ceil(T / SMT width) cores with all their siblings.
+    amq_bench resolves its --placement within that affinity mask. Job i writes outs[i] and
+    on_done(i) is called as soon as it exits cleanly. Returns the failed indices.
+    """
+    cores = core_groups(reserved)
+    if not cores:
+        raise SystemExit("no usable cores left after --reserve-cpus")
+
+    print(f"[parallel] {len(jobs)} jobs on {len(cores)} cores (reserved: {sorted(reserved) or 'none'})", flush=True)
+    free = list(range(len(cores)))
+    pending = list(range(len(jobs)))
+    running: dict[subprocess.Popen, tuple[int, list[int]]] = {}
+    failed: list[int] = []
+
+    while pending or running:
+        # Launch every pending job that fits, in order; narrower jobs backfill
+        # around a wide job that is still waiting for cores.
+        for i in list(pending):
+            pairs = job_placement(jobs[i]) == "smt-pairs"
+            width = max(len(c) for c in cores) if pairs else 1
+            need = min(-(-job_threads(jobs[i]) // width), len(cores))
+            if need > len(free):
+                continue
+            mine, free = free[:need], free[need:]
+            cpus = {cpu for c in mine for cpu in (cores[c] if pairs else cores[c][:1])}
+            cmd = jobs[i] + ["--out", str(outs[i])]
+            print(f"[cpus {','.join(map(str, sorted(cpus)))}] " + " ".join(cmd), flush=True)
+            p = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, preexec_fn=lambda c=cpus: os.sched_setaffinity(0, c))
+            running[p] = (i, mine)
+            pending.remove(i)
+
+        for p in [p for p in running if p.poll() is not None]:
+            i, mine = running.pop(p)
+            free = sorted(free + mine)
+            if p.returncode != 0:
+                print(f"[parallel] job {i} failed with exit code {p.returncode}: {' '.join(jobs[i])}", flush=True)
+                failed.append(i)
+            else:
+                on_done(i)
+        time.sleep(0.02)
+
+    return failed
 
 
 def main() -> int:
@@ -30,6 +186,34 @@ def main() -> int:
     ap.add_argument("--ops", type=int, default=2_000_000)
     ap.add_argument("--runs", type=int, default=3)
     ap.add_argument("--quick", action="store_true", help="smaller matrix for sanity")
+    ap.add_argument("--parallel", action="store_true",
+                    help="pack independent runs onto disjoint physical cores")
+    ap.add_argument("--reserve-cpus", default="0",
+                    help="CPU list kept free for the OS/noise in --parallel mode (e.g. '0,1' or '')")
+    ap.add_argument("--cache-dir", default=None,
+                    help="per-run shard CSVs + manifest used to resume (default: <out>.cache)")
+    ap.add_argument("--fresh", action="store_true", help="ignore the manifest and rerun every configuration")
+    ap.add_argument("--no-serve", action="store_true",
+                    help="sequential mode: spawn amq_bench per configuration instead of one resident "
+                         "--serve process that keeps the key sets of the current --n")
+    ap.add_argument("--dists", default="uniform",
+                    help="comma-separated key distributions, e.g. 'uniform,zipf:0.99,hotspot:0.1:0.9'")
+    ap.add_argument("--batches", default="1,8,32,128,256",
+                    help="comma-separated query batch sizes (contains_batch) for the batched-lookup block")
+    ap.add_argument("--hashes", default="splitmix,wyhash,xxh3,crc32c,mulshift",
+                    help="comma-separated hash backends (--hash) for the hash comparison block")
+    ap.add_argument("--placements", default="compact,scatter,smt-pairs",
+                    help="comma-separated worker placements: compact, scatter, smt-pairs or list:<cpus> "
+                         "(a list uses ';' between CPUs here, e.g. 'list:0;2;4')")
+    ap.add_argument("--snapshot-dir", default=None,
+                    help="filter snapshots shared by configurations with the same build parameters "
+                         "(default: <cache-dir>/snapshots; one file per filter/n/params/run, so it can get large)")
+    ap.add_argument("--no-snapshots", action="store_true", help="build every filter from scratch")
+    ap.add_argument("--snapshot-populate", action="store_true",
+                    help="map snapshots with MAP_POPULATE instead of faulting them in on first touch")
+    ap.add_argument("--build-threads", type=int, default=0,
+                    help="threads for key generation, filter construction and FPR measurement "
+                         "(0: not passed, amq_bench builds serially)")
     args = ap.parse_args()
 
     b = args.bin
@@ -43,6 +227,10 @@ def main() -> int:
     loads = [round(x, 2) for x in [0.40, 0.50, 0.60, 0.70, 0.80, 0.85, 0.90, 0.95]]
     fpbits = [8, 12, 16]
     rbits = [8, 12, 16]
+    dists = [d.strip() for d in args.dists.split(",") if d.strip()]
+    placements = [p.strip().replace(";", ",") for p in args.placements.split(",") if p.strip()]
+    batches = [int(x) for x in args.batches.split(",") if x.strip()]
+    hashes = [h.strip() for h in args.hashes.split(",") if h.strip()]
 
     if args.quick:
         Ns = [1_000_000]
@@ -53,41 +241,142 @@ def main() -> int:
         fpbits = [12]
         rbits = [12]
 
-    cores = physical_cores()
+    # Physical cores from sysfs (SMT siblings grouped), not lscpu, so the count
+    # respects taskset; placements decide which of their CPUs the workers get.
+    cores = max(1, len(core_groups(set())))
     thread_list = list(range(1, cores + 1))
     if args.quick:
         thread_list = [1, min(2, cores)]
         thread_list = sorted(set(thread_list))
 
-    for n, fpr, neg, qfrac, t in itertools.product(Ns, fprs, negs, mixes, thread_list):
-        run([
+    jobs: list[list[str]] = []
+
+    for n, fpr, neg, qfrac, t, pl, dist in itertools.product(Ns, fprs, negs, mixes, thread_list, placements,
+                                                                dists):
+        jobs.append([
             b, "--filter", "bloom", "--n", str(n), "--fpr", str(fpr), "--neg", str(neg),
-            "--qfrac", str(qfrac), "--threads", str(t), "--ops", str(args.ops), "--runs", str(args.runs),
-            "--out", out
+            "--qfrac", str(qfrac), "--threads", str(t), "--placement", pl, "--ops", str(args.ops),
+            "--runs", str(args.runs), "--dist", dist
         ])
 
-    for n, fp, neg, t in itertools.product(Ns, fpbits, negs, thread_list):
-        run([
-            b, "--filter", "xor", "--n", str(n), "--fpbits", str(fp), "--neg", str(neg),
-            "--threads", str(t), "--ops", str(args.ops), "--runs", str(args.runs), "--out", out
+    # xor and its successors: static filters sized by fingerprint bits only
+    for n, flt, fp, neg, t, pl, dist in itertools.product(Ns, ["xor", "fuse3", "fuse4", "ribbon"], fpbits, negs,
+                                                          thread_list, placements, dists):
+        jobs.append([
+            b, "--filter", flt, "--n", str(n), "--fpbits", str(fp), "--neg", str(neg),
+            "--threads", str(t), "--placement", pl, "--ops", str(args.ops), "--runs", str(args.runs),
+            "--dist", dist
         ])
 
-    for n, load, fp, neg, qfrac, t in itertools.product(Ns, loads, fpbits, negs, mixes, thread_list):
-        run([
+    for n, load, fp, neg, qfrac, t, pl, dist in itertools.product(Ns, loads, fpbits, negs, mixes, thread_list,
+                                                                     placements, dists):
+        jobs.append([
             b, "--filter", "cuckoo", "--n", str(n), "--load", str(load), "--fpbits", str(fp),
-            "--neg", str(neg), "--qfrac", str(qfrac), "--threads", str(t), "--ops", str(args.ops),
-            "--runs", str(args.runs), "--out", out
+            "--neg", str(neg), "--qfrac", str(qfrac), "--threads", str(t), "--placement", pl, "--ops", str(args.ops),
+            "--runs", str(args.runs), "--dist", dist
         ])
 
-    for n, load, rb, neg, qfrac, t in itertools.product(Ns, loads, rbits, negs, mixes, thread_list):
-        run([
+    for n, load, rb, neg, qfrac, t, pl, dist in itertools.product(Ns, loads, rbits, negs, mixes, thread_list,
+                                                                     placements, dists):
+        jobs.append([
             b, "--filter", "qf", "--n", str(n), "--load", str(load), "--rbits", str(rb),
-            "--neg", str(neg), "--qfrac", str(qfrac), "--threads", str(t), "--ops", str(args.ops),
-            "--runs", str(args.runs), "--out", out
+            "--neg", str(neg), "--qfrac", str(qfrac), "--threads", str(t), "--placement", pl, "--ops", str(args.ops),
+            "--runs", str(args.runs), "--dist", dist
         ])
 
+    # Multi-writer scaling of the concurrent cuckoo / QF update paths. --sync on
+    # makes the 1-thread point run the same synchronized code as the others
+    # (the matrix above uses the unsynchronized calls at 1 thread).
+    for flt, qfrac, t, pl, dist in itertools.product(["cuckoo", "qf"], [m for m in mixes if m < 1.0], thread_list,
+                                                     placements, dists):
+        width = ["--fpbits", "12"] if flt == "cuckoo" else ["--rbits", "12"]
+        jobs.append([
+            b, "--filter", flt, "--n", str(Ns[0]), "--load", "0.8", *width, "--neg", "0.5", "--qfrac", str(qfrac),
+            "--threads", str(t), "--placement", pl, "--sync", "on", "--ops", str(args.ops), "--runs", str(args.runs),
+            "--dist", dist
+        ])
+
+    # Batched lookups: query-only runs per filter and --batch size (1 is the
+    # one-contains-per-key path), single thread, 50% negative queries.
+    filter_params = {
+        "bloom": ["--fpr", "0.01"],
+        "xor": ["--fpbits", "12"],
+        "fuse3": ["--fpbits", "12"],
+        "fuse4": ["--fpbits", "12"],
+        "ribbon": ["--fpbits", "12"],
+        "cuckoo": ["--load", "0.9", "--fpbits", "12"],
+        "qf": ["--load", "0.8", "--rbits", "12"],
+    }
+    for flt, n, batch, dist in itertools.product(filter_params, Ns, batches, dists):
+        jobs.append([
+            b, "--filter", flt, "--n", str(n), *filter_params[flt], "--neg", "0.5", "--qfrac", "1.0",
+            "--threads", "1", "--placement", placements[0], "--batch", str(batch), "--ops", str(args.ops),
+            "--runs", str(args.runs), "--dist", dist
+        ])
+
+    # Hash backends: the query-only runs of the batched block per --hash, scalar
+    # (batch 1) and batched (Hasher64::batch in contains_batch). Points the
+    # batched block already has (the default splitmix hash) are not repeated.
+    for n, flt, h, batch, dist in itertools.product(Ns, filter_params, hashes, [1, 32], dists):
+        if h == "splitmix" and batch in batches:
+            continue
+        jobs.append([
+            b, "--filter", flt, "--n", str(n), *filter_params[flt], "--neg", "0.5", "--qfrac", "1.0",
+            "--threads", "1", "--placement", placements[0], "--batch", str(batch), "--hash", h,
+            "--ops", str(args.ops), "--runs", str(args.runs), "--dist", dist
+        ])
+
+    if args.build_threads > 0:
+        jobs = [cmd + ["--build-threads", str(args.build_threads)] for cmd in jobs]
+
+    # Every run writes its own shard keyed by (parameters, binary hash) and out
+    # is rebuilt from the shards, so reruns never duplicate rows and an
+    # interrupted sweep resumes where it stopped. A rebuilt binary only misses
+    # its own keys; entries for other binaries stay in the manifest.
+    cache = Path(args.cache_dir) if args.cache_dir else Path(out + ".cache")
+    cache.mkdir(parents=True, exist_ok=True)
+    for stale in cache.glob("*.csv.part"):
+        stale.unlink()
+    manifest = cache / "manifest.jsonl"
+    bin_sha = binary_hash(b)
+    keys = [job_key(cmd, bin_sha) for cmd in jobs]
+    done = {} if args.fresh else load_manifest(manifest)
+    todo = [i for i, k in enumerate(keys) if k not in done]
+    print(f"[cache] {len(jobs) - len(todo)}/{len(jobs)} configurations already finished in {cache}", flush=True)
+
+    todo_jobs = [jobs[i] for i in todo]
+    parts = [cache / f"{keys[i]}.csv.part" for i in todo]
+
+    # Filter snapshots: the first configuration with given build parameters
+    # (filter, n, seed, run, fpr/load/fp/r bits) saves its filter and every
+    # later one maps it instead of building it again. Not part of the job key:
+    # loading changes how long a run takes, not what it measures.
+    snap = [] if args.no_snapshots else ["--snapshot-dir", args.snapshot_dir or str(cache / "snapshots")]
+    if snap and args.snapshot_populate:
+        snap.append("--snapshot-populate")
+    launch = [cmd + snap for cmd in todo_jobs]
+
+    def finish(j: int) -> None:
+        record_done(manifest, keys[todo[j]], todo_jobs[j], bin_sha)
+
+    rc = 0
+    if args.parallel:
+        failed = run_parallel(launch, parts, parse_cpu_list(args.reserve_cpus), finish)
+        rc = 1 if failed else 0
+    else:
+        # The resident server keeps the key set of the last --n, so run the jobs
+        # sorted by n (stable: block order within an n) and each key set is
+        # generated once per n instead of once per block that visits it.
+        order = sorted(range(len(launch)), key=lambda j: int(job_params(launch[j])["--n"]))
+        with (contextlib.nullcontext() if args.no_serve else BenchServer([b])) as srv:
+            for j in order:
+                run(launch[j] + ["--out", str(parts[j])], srv)
+                finish(j)
+
+    rows = merge_shards([cache / f"{k}.csv" for k in keys], out)
+    print(f"[cache] merged {rows} rows into {out}", flush=True)
     print(f"Wrote {out}")
-    return 0
+    return rc
 
 
 if __name__ == "__main__":
@@ -6,18 +6,25 @@
 #include <thread>
 #include <atomic>
 #include <random>
-#include <unordered_set>
 #include <cstring>
 #include <mutex>
-#include <sched.h>
-#include <pthread.h>
+#include <filesystem>
+#include <sstream>
+#include <stdexcept>
+#include <sys/resource.h>
 
 #include "hash.hpp"
 #include "util.hpp"
 #include "xor_filter.hpp"
+#include "binary_fuse_filter.hpp"
+#include "ribbon_filter.hpp"
 #include "cuckoo_filter.hpp"
 #include "quotient_filter.hpp"
 #include "blocked_bloom.hpp"
+#include "snapshot.hpp"
+#include "key_dist.hpp"
+#include "bench_serve.hpp"
+#include "cpu_placement.hpp"
 
 struct Args {
     std::string filter="bloom";
@@ -32,31 +39,37 @@ struct Args {
     double q_frac=1.0; // fraction queries
     double neg_share=0.5;
     bool latency=false;
+    KeyDist dist;
+    Placement placement;
+    std::string sync="auto"; // cuckoo/qf: auto (concurrent path iff threads>1) | on | off
+    int batch=1; // query keys per contains_batch call (1: one contains per key)
+    HashKind hash=HashKind::Splitmix; // key hash of every filter (hash.hpp)
+    int build_threads=1; // key generation, construction and FPR measurement (0: one per allowed CPU)
+    std::string snapshot_dir; // filter snapshots keyed by build parameters (empty: always build)
+    bool snapshot_populate=false; // MAP_POPULATE the snapshot instead of faulting it in on first touch
     std::string out="results.csv";
     uint64_t seed=1;
 };
 
-static void pin_thread(int cpu) {
-#ifdef __linux__
-    cpu_set_t cpuset;
-    CPU_ZERO(&cpuset);
-    CPU_SET(cpu, &cpuset);
-    pthread_setaffinity_np(pthread_self(), sizeof(cpu_set_t), &cpuset);
-#endif
-}
-
+// Bad flag values throw std::invalid_argument, so a --serve run answers
+// "#error <message>" instead of ending the resident process.
 static Args parse(int argc, char** argv){
     Args a;
     for(int i=1;i<argc;i++){
         std::string s=argv[i];
+        auto num = [&](auto conv){
+            std::string v=argv[++i];
+            try { return conv(v); }
+            catch(const std::exception&){ throw std::invalid_argument("Bad "+s+" "+v); }
+        };
         auto get = [&](double &v){
-            if(i+1<argc) v=std::stod(argv[++i]);
+            if(i+1<argc) v=num([](const std::string& t){ return std::stod(t); });
         };
         auto geti = [&](int &v){
-            if(i+1<argc) v=std::stoi(argv[++i]);
+            if(i+1<argc) v=num([](const std::string& t){ return std::stoi(t); });
         };
         auto getu = [&](uint64_t &v){
-            if(i+1<argc) v=(uint64_t)std::stoull(argv[++i]);
+            if(i+1<argc) v=num([](const std::string& t){ return (uint64_t)std::stoull(t); });
         };
         if(s=="--filter" && i+1<argc) a.filter=argv[++i];
         else if(s=="--n") getu(a.n);
@@ -65,78 +78,183 @@ static Args parse(int argc, char** argv){
         else if(s=="--fpbits") geti(a.fp_bits);
         else if(s=="--rbits") geti(a.r_bits);
         else if(s=="--threads") geti(a.threads);
+        else if(s=="--batch") geti(a.batch);
+        else if(s=="--build-threads") geti(a.build_threads);
         else if(s=="--runs") geti(a.runs);
         else if(s=="--ops") getu(a.ops);
         else if(s=="--qfrac") get(a.q_frac);
         else if(s=="--neg") get(a.neg_share);
         else if(s=="--latency") a.latency=true;
+        else if(s=="--dist" && i+1<argc){
+            std::string spec=argv[++i];
+            if(!KeyDist::parse(spec, a.dist)){
+                throw std::invalid_argument("Bad --dist "+spec+" (uniform | zipf:<theta> | hotspot:<frac>:<prob>)");
+            }
+        }
+        else if(s=="--placement" && i+1<argc){
+            std::string spec=argv[++i];
+            if(!parse_placement(spec, a.placement)){
+                throw std::invalid_argument("Bad --placement "+spec+" (compact | scatter | smt-pairs | list:<cpus>)");
+            }
+        }
+        else if(s=="--hash" && i+1<argc){
+            std::string spec=argv[++i];
+            if(!parse_hash_kind(spec, a.hash)){
+                throw std::invalid_argument("Bad --hash "+spec+" (splitmix | wyhash | xxh3 | crc32c | mulshift)");
+            }
+        }
+        else if(s=="--sync" && i+1<argc){
+            a.sync=argv[++i];
+            if(a.sync!="auto" && a.sync!="on" && a.sync!="off"){
+                throw std::invalid_argument("Bad --sync "+a.sync+" (auto | on | off)");
+            }
+        }
+        else if(s=="--snapshot-dir" && i+1<argc) a.snapshot_dir=argv[++i];
+        else if(s=="--snapshot-populate") a.snapshot_populate=true;
         else if(s=="--out" && i+1<argc) a.out=argv[++i];
         else if(s=="--seed") getu(a.seed);
     }
     a.q_frac = clamp(a.q_frac, 0.0, 1.0);
     a.neg_share = clamp(a.neg_share, 0.0, 1.0);
+    a.batch = std::max(1, a.batch);
+    if(a.build_threads<=0){
+        a.build_threads = (int)cpu_topology().size();
+        if(a.build_threads<=0) a.build_threads = (int)std::max(1u, std::thread::hardware_concurrency());
+    }
     return a;
 }
 
-static std::vector<uint64_t> gen_unique(uint64_t n, uint64_t seed){
-    std::unordered_set<uint64_t> set;
-    set.reserve(n*2);
-    std::mt19937_64 rng(seed);
-    while(set.size()<n){
-        uint64_t k=rng();
-        set.insert(k);
-    }
-    std::vector<uint64_t> v; v.reserve(n);
-    for(auto &x:set) v.push_back(x);
-    return v;
+// Positives are keys 0..n-1 of the seed's unique_key stream and negatives
+// keys n..2n-1, so both sets are duplicate-free and disjoint without a dedup
+// set, and every thread fills its own slice.
+static void gen_keys(uint64_t n, uint64_t seed, int threads, std::vector<uint64_t>& keys, std::vector<uint64_t>& negs){
+    keys.resize(n);
+    negs.resize(n);
+    parallel_for(n, threads, [&](size_t b, size_t e){
+        for(size_t i=b;i<e;i++){
+            keys[i]=unique_key(i, seed);
+            negs[i]=unique_key(n+i, seed);
+        }
+    });
 }
 
+// contains_fn must be safe to call from several threads when threads > 1.
 template <class F>
-static double measure_fpr(const F& contains_fn, const std::vector<uint64_t>& negatives){
-    uint64_t fp=0;
-    for(auto k: negatives) if(contains_fn(k)) fp++;
-    return (double)fp/(double)negatives.size();
+static double measure_fpr(const F& contains_fn, const std::vector<uint64_t>& negatives, int threads){
+    std::atomic<uint64_t> fp{0};
+    parallel_for(negatives.size(), threads, [&](size_t b, size_t e){
+        uint64_t local=0;
+        for(size_t i=b;i<e;i++) if(contains_fn(negatives[i])) local++;
+        fp.fetch_add(local, std::memory_order_relaxed);
+    });
+    return (double)fp.load()/(double)negatives.size();
+}
+
+// Everything a filter's contents depend on: its type and parameters, the key
+// set (--n, --seed) and the run's filter seed. Query-side options (--neg,
+// --threads, --qfrac, --batch, --dist, ...) are not part of it, so all those
+// sweep points share one snapshot. --build-threads is not either: a parallel
+// build is a different but equally valid filter of the same keys.
+static std::string snapshot_key(const Args& a, int run){
+    std::ostringstream k;
+    k << a.filter << "_n" << a.n << "_seed" << a.seed << "_run" << run << "_h" << hash_kind_name(a.hash);
+    if(a.filter=="bloom") k << "_fpr" << a.target_fpr;
+    else if(a.filter=="xor" || a.filter=="fuse3" || a.filter=="fuse4" || a.filter=="ribbon") k << "_fp" << a.fp_bits;
+    else if(a.filter=="cuckoo") k << "_load" << a.load << "_fp" << a.fp_bits;
+    else if(a.filter=="qf") k << "_load" << a.load << "_r" << a.r_bits;
+    return k.str();
+}
+
+// With --snapshot-dir, map the run's snapshot if there is one (zero-copy; the
+// filter borrows the mapping), else build() and save the fresh filter before
+// anything queries or updates it. Returns the CSV snapshot field.
+template <class F, class Build>
+static const char* build_or_load(F& f, const Args& a, int run, Build build){
+    if(a.snapshot_dir.empty()){ build(); return "none"; }
+    const std::string key = snapshot_key(a, run);
+    const std::string path = a.snapshot_dir + "/" + key + ".amq";
+    if(auto m = SnapshotMap::open(path, a.snapshot_populate)){
+        if(m->key()==key && f.load(m)) return "loaded";
+        std::cerr << "snapshot " << path << " does not match its key, rebuilding\n";
+    }
+    build();
+    std::error_code ec;
+    std::filesystem::create_directories(a.snapshot_dir, ec);
+    SnapshotWriter w(a.filter.c_str());
+    f.save(w);
+    if(!w.write(path, key)){
+        std::cerr << "could not write snapshot " << path << "\n";
+        return "none";
+    }
+    return "saved";
+}
+
+// Peak resident set of the process so far (for --serve: over all runs).
+static long peak_rss_kb(){
+    struct rusage ru;
+    return getrusage(RUSAGE_SELF, &ru)==0 ? ru.ru_maxrss : -1;
 }
 
-template <class QueryFn, class UpdateFn>
-static void run_threads(int threads, uint64_t ops, QueryFn qfn, UpdateFn ufn, double qfrac, double neg_share,
-                        const std::vector<uint64_t>& pos, const std::vector<uint64_t>& neg,
+// With batch > 1 a worker buffers its query keys and hands every `batch` of
+// them to bqfn(keys, n, out_bits) (the filter's contains_batch); updates still
+// run as they are drawn. --latency then records each key's share of its
+// batch's time (batch time / batch size).
+template <class QueryFn, class BatchFn, class UpdateFn>
+static void run_threads(int threads, const std::vector<int>& cpus, uint64_t ops, QueryFn qfn, BatchFn bqfn, int batch,
+                        UpdateFn ufn, double qfrac, double neg_share,
+                        const std::vector<uint64_t>& pos, const std::vector<uint64_t>& neg, const KeyDist& dist,
                         bool latency, double &qps_out, LatencyStats &lat_out) {
-    std::atomic<uint64_t> done{0};
-    std::vector<uint64_t> lat_samples;
-    std::mutex lat_mtx;
+    std::atomic<uint64_t> done{0}, hits{0};
+    AtomicLatencyHistogram lat_hist;
 
     auto worker = [&](int tid){
-        pin_thread(tid); // simple mapping
+        // workers are pinned within the process affinity mask (taskset / the --parallel scheduler)
+        if(!cpus.empty()) pin_self_to_cpu(cpus[tid]);
         std::mt19937_64 rng(0x1234 + tid*997);
+        KeySampler pick_pos(dist, pos.size()), pick_neg(dist, neg.size());
         uint64_t local_ops = ops / threads + (tid==0 ? (ops%threads) : 0);
-        std::vector<uint64_t> local_lat;
-        if(latency) local_lat.reserve(local_ops);
+        LatencyHistogram local_lat;
+        std::vector<uint64_t> qbuf;
+        std::vector<uint64_t> qbits(((size_t)batch + 63) / 64);
+        uint64_t local_hits = 0;
+        auto flush = [&]{
+            if(qbuf.empty()) return;
+            uint64_t t0 = latency ? now_ns() : 0;
+            bqfn(qbuf.data(), qbuf.size(), qbits.data());
+            if(latency){
+                uint64_t per_key = (now_ns()-t0) / qbuf.size();
+                for(size_t j=0;j<qbuf.size();j++) local_lat.record(per_key);
+            }
+            for(size_t w=0; w<(qbuf.size()+63)/64; w++) local_hits += (uint64_t)__builtin_popcountll(qbits[w]);
+            qbuf.clear();
+        };
 
         for(uint64_t i=0;i<local_ops;i++){
             bool do_q = ( (double)(rng()%10000) < qfrac*10000.0 );
             if(do_q){
                 bool is_neg = ((double)(rng()%10000) < neg_share*10000.0);
-                uint64_t key = is_neg ? neg[rng()%neg.size()] : pos[rng()%pos.size()];
-                if(latency){
+                uint64_t key = is_neg ? neg[pick_neg(rng)] : pos[pick_pos(rng)];
+                if(batch > 1){
+                    qbuf.push_back(key);
+                    if(qbuf.size() == (size_t)batch) flush();
+                } else if(latency){
                     uint64_t t0=now_ns();
-                    (void)qfn(key);
+                    local_hits += qfn(key) ? 1 : 0;
                     uint64_t t1=now_ns();
-                    local_lat.push_back(t1-t0);
+                    local_lat.record(t1-t0);
                 } else {
-                    (void)qfn(key);
+                    local_hits += qfn(key) ? 1 : 0;
                 }
             } else {
-                uint64_t key = pos[rng()%pos.size()];
+                uint64_t key = pos[pick_pos(rng)];
                 ufn(key, rng);
             }
         }
 
-        if(latency){
-            std::lock_guard<std::mutex> g(lat_mtx);
-            lat_samples.insert(lat_samples.end(), local_lat.begin(), local_lat.end());
-        }
+        flush();
+        if(latency) lat_hist.merge(local_lat);
         done.fetch_add(local_ops, std::memory_order_relaxed);
+        hits.fetch_add(local_hits, std::memory_order_relaxed);
     };
 
     uint64_t t0=now_ns();
@@ -148,7 +266,7 @@ static void run_threads(int threads, uint64_t ops, QueryFn qfn, UpdateFn ufn, do
     double sec = (double)(t1-t0)/1e9;
     qps_out = (double)ops / sec;
     if(latency){
-        lat_out = compute_latency_stats(lat_samples);
+        lat_out = compute_latency_stats(lat_hist.snapshot());
     } else {
         lat_out = {};
     }
@@ -158,69 +276,159 @@ static void ensure_header(const std::string& path){
     std::ifstream in(path);
     if(in.good() && in.peek()!=std::ifstream::traits_type::eof()) return;
     std::ofstream out(path);
-    out << "filter,n,target_fpr,achieved_fpr,bpe,load,fp_bits,r_bits,threads,qfrac,neg_share,ops,run,throughput_ops_s,p50_ns,p95_ns,p99_ns,insert_fail,kicks,max_kicks,stash_size,stash_hits,fp_checks,scan_steps\n";
+    out << "filter,n,target_fpr,achieved_fpr,bpe,load,fp_bits,r_bits,threads,placement,cpus,sync,batch,hash,qfrac,neg_share,dist,ops,run,throughput_ops_s,p50_ns,p95_ns,p99_ns,p999_ns,max_ns,insert_fail,kicks,max_kicks,stash_size,stash_hits,fp_checks,scan_steps,build_threads,build_keys_s,snapshot,peak_rss_kb,lat_hist\n";
 }
 
-int main(int argc, char** argv){
+// Positive/negative key sets, kept resident across --serve runs with the same
+// --n and --seed (filters are still rebuilt per run since updates mutate them).
+struct KeySets {
+    uint64_t n=0, seed=0;
+    bool valid=false;
+    std::vector<uint64_t> keys, negs;
+};
+static KeySets key_sets;
+
+static const KeySets& get_key_sets(uint64_t n, uint64_t seed, int threads){
+    KeySets &ks = key_sets;
+    if(ks.valid && ks.n==n && ks.seed==seed) return ks;
+    gen_keys(n, seed, threads, ks.keys, ks.negs);
+    ks.n=n; ks.seed=seed; ks.valid=true;
+    return ks;
+}
+
+static int run(int argc, char** argv){
     Args a=parse(argc,argv);
     ensure_header(a.out);
 
-    auto keys = gen_unique(a.n, a.seed);
-    auto negs = gen_unique(a.n, a.seed ^ 0xfeedbeefULL);
-    // ensure negatives disjoint (probable already); quick fix:
-    std::unordered_set<uint64_t> set(keys.begin(), keys.end());
-    for(auto &x: negs) if(set.count(x)) x ^= 0x9e3779b97f4a7c15ULL;
+    const KeySets &ks = get_key_sets(a.n, a.seed, a.build_threads);
+    const int bt = a.build_threads;
+    const auto &keys = ks.keys;
+    const auto &negs = ks.negs;
+    const std::vector<int> cpus = resolve_placement(a.placement, a.threads);
+    // Cuckoo/QF updates from several workers need the filters' concurrent path;
+    // --sync off keeps the unsynchronized single-threaded calls (racy for threads>1).
+    const bool concurrent = a.sync=="on" || (a.sync=="auto" && a.threads>1);
 
     for(int run=0; run<a.runs; run++){
         double bpe=0, afpr=0, thr=0;
         LatencyStats ls;
         uint64_t insert_fail=0,kicks=0,maxk=0,stash_size=0,stash_hits=0,fp_checks=0,scan_steps=0;
+        const char* sync="none";
+        uint64_t build_ns=0; // construction, or the snapshot load that replaced it
+        const char* snapshot="none";
 
         if(a.filter=="xor"){
-            XorFilter f;
-            f.build(keys, a.fp_bits, a.seed + run);
+            XorFilter f(a.hash);
+            uint64_t t0=now_ns();
+            snapshot = build_or_load(f, a, run, [&]{ f.build(keys, a.fp_bits, a.seed + run, bt); });
+            build_ns=now_ns()-t0;
             bpe = f.bits_per_entry(a.n);
-            afpr = measure_fpr([&](uint64_t k){ return f.contains(k); }, negs);
+            afpr = measure_fpr([&](uint64_t k){ return f.contains(k); }, negs, bt);
             auto qfn = [&](uint64_t k){ return f.contains(k); };
+            auto bqfn = [&](const uint64_t* ks, size_t m, uint64_t* bits){ f.contains_batch(ks, m, bits); };
             auto ufn = [&](uint64_t, std::mt19937_64&){ /* no-op */ };
-            run_threads(a.threads, a.ops, qfn, ufn, 1.0, a.neg_share, keys, negs, a.latency, thr, ls);
+            run_threads(a.threads, cpus, a.ops, qfn, bqfn, a.batch, ufn, 1.0, a.neg_share, keys, negs, a.dist, a.latency, thr, ls);
+        } else if(a.filter=="fuse3" || a.filter=="fuse4" || a.filter=="ribbon"){
+            // static (build-once, query-only) filters like xor; built single-threaded
+            auto static_filter = [&](auto& f){
+                uint64_t t0=now_ns();
+                snapshot = build_or_load(f, a, run, [&]{ f.build(keys, a.fp_bits, a.seed + run); });
+                build_ns=now_ns()-t0;
+                bpe = f.bits_per_entry(a.n);
+                afpr = measure_fpr([&](uint64_t k){ return f.contains(k); }, negs, bt);
+                auto qfn = [&](uint64_t k){ return f.contains(k); };
+                auto bqfn = [&](const uint64_t* ks, size_t m, uint64_t* bits){ f.contains_batch(ks, m, bits); };
+                auto ufn = [&](uint64_t, std::mt19937_64&){ /* no-op */ };
+                run_threads(a.threads, cpus, a.ops, qfn, bqfn, a.batch, ufn, 1.0, a.neg_share, keys, negs, a.dist, a.latency, thr, ls);
+            };
+            if(a.filter=="fuse3"){ Fuse3Filter f(a.hash); static_filter(f); }
+            else if(a.filter=="fuse4"){ Fuse4Filter f(a.hash); static_filter(f); }
+            else { RibbonFilter f(a.hash); static_filter(f); }
         } else if(a.filter=="bloom"){
-            BlockedBloom f;
-            f.init(a.n, a.target_fpr, a.seed + run);
-            for(auto k: keys) f.insert(k);
+            BlockedBloom f(a.hash);
+            uint64_t t0=now_ns();
+            snapshot = build_or_load(f, a, run, [&]{
+                f.init(a.n, a.target_fpr, a.seed + run);
+                if(bt>1) parallel_for(keys.size(), bt, [&](size_t b, size_t e){ for(size_t i=b;i<e;i++) f.insert_concurrent(keys[i]); });
+                else for(auto k: keys) f.insert(k);
+            });
+            build_ns=now_ns()-t0;
             bpe = f.bits_per_entry(a.n);
-            afpr = measure_fpr([&](uint64_t k){ return f.contains(k); }, negs);
+            afpr = measure_fpr([&](uint64_t k){ return f.contains(k); }, negs, bt);
             auto qfn = [&](uint64_t k){ return f.contains(k); };
+            auto bqfn = [&](const uint64_t* ks, size_t m, uint64_t* bits){ f.contains_batch(ks, m, bits); };
             auto ufn = [&](uint64_t k, std::mt19937_64&){ f.insert(k); };
-            run_threads(a.threads, a.ops, qfn, ufn, 1.0, a.neg_share, keys, negs, a.latency, thr, ls);
+            run_threads(a.threads, cpus, a.ops, qfn, bqfn, a.batch, ufn, 1.0, a.neg_share, keys, negs, a.dist, a.latency, thr, ls);
         } else if(a.filter=="cuckoo"){
-            CuckooFilter f;
-            f.init(a.n, a.load, a.fp_bits, a.seed + run);
-            for(auto k: keys) f.insert(k);
+            CuckooFilter f(a.hash);
+            // --build-threads > 1 builds through insert_concurrent; the query and
+            // update mode of the timed run depends on --sync / --threads only
+            uint64_t t0=now_ns();
+            snapshot = build_or_load(f, a, run, [&]{
+                f.init(a.n, a.load, a.fp_bits, a.seed + run);
+                if(bt>1){
+                    f.enable_concurrency();
+                    parallel_for(keys.size(), bt, [&](size_t b, size_t e){ for(size_t i=b;i<e;i++) f.insert_concurrent(keys[i]); });
+                } else for(auto k: keys) f.insert(k);
+            });
+            build_ns=now_ns()-t0;
             bpe = f.bits_per_entry(a.n);
-            afpr = measure_fpr([&](uint64_t k){ return f.contains(k); }, negs);
+            // plain contains bumps unsynchronized stats, so the FPR pass stays on one thread
+            afpr = measure_fpr([&](uint64_t k){ return f.contains(k); }, negs, 1);
             f.reset_stats();
-            auto qfn = [&](uint64_t k){ return f.contains(k); };
-            auto ufn = [&](uint64_t k, std::mt19937_64& rng){
-                // update: insert or delete with 50/50
-                if((rng()&1)==0) f.insert(k); else f.erase(k);
-            };
-            run_threads(a.threads, a.ops, qfn, ufn, a.q_frac, a.neg_share, keys, negs, a.latency, thr, ls);
+            if(concurrent){
+                if(!f.concurrent()) f.enable_concurrency();
+                sync="striped";
+                auto qfn = [&](uint64_t k){ return f.contains_concurrent(k); };
+                auto bqfn = [&](const uint64_t* ks, size_t m, uint64_t* bits){ f.contains_batch_concurrent(ks, m, bits); };
+                auto ufn = [&](uint64_t k, std::mt19937_64& rng){
+                    if((rng()&1)==0) f.insert_concurrent(k); else f.erase_concurrent(k);
+                };
+                run_threads(a.threads, cpus, a.ops, qfn, bqfn, a.batch, ufn, a.q_frac, a.neg_share, keys, negs, a.dist, a.latency, thr, ls);
+            } else {
+                auto qfn = [&](uint64_t k){ return f.contains(k); };
+                auto bqfn = [&](const uint64_t* ks, size_t m, uint64_t* bits){ f.contains_batch(ks, m, bits); };
+                auto ufn = [&](uint64_t k, std::mt19937_64& rng){
+                    // update: insert or delete with 50/50
+                    if((rng()&1)==0) f.insert(k); else f.erase(k);
+                };
+                run_threads(a.threads, cpus, a.ops, qfn, bqfn, a.batch, ufn, a.q_frac, a.neg_share, keys, negs, a.dist, a.latency, thr, ls);
+            }
             auto st = f.stats();
             insert_fail=st.insert_fail; kicks=st.kicks; maxk=st.max_kicks; stash_size=f.stash_size();
             stash_hits=st.stash_hits; fp_checks=st.fp_checks;
         } else if(a.filter=="qf"){
-            QuotientFilter f;
-            f.init(a.n, a.load, a.r_bits, a.seed + run);
-            for(auto k: keys) f.insert(k);
+            QuotientFilter f(a.hash);
+            uint64_t t0=now_ns();
+            snapshot = build_or_load(f, a, run, [&]{
+                f.init(a.n, a.load, a.r_bits, a.seed + run);
+                if(bt>1){
+                    f.enable_concurrency();
+                    parallel_for(keys.size(), bt, [&](size_t b, size_t e){ for(size_t i=b;i<e;i++) f.insert_concurrent(keys[i]); });
+                } else for(auto k: keys) f.insert(k);
+            });
+            build_ns=now_ns()-t0;
             bpe = f.bits_per_entry(a.n);
-            afpr = measure_fpr([&](uint64_t k){ return f.contains(k); }, negs);
+            // plain contains bumps unsynchronized stats, so the FPR pass stays on one thread
+            afpr = measure_fpr([&](uint64_t k){ return f.contains(k); }, negs, 1);
             f.reset_stats();
-            auto qfn = [&](uint64_t k){ return f.contains(k); };
-            auto ufn = [&](uint64_t k, std::mt19937_64& rng){
-                if((rng()&1)==0) f.insert(k); else f.erase(k);
-            };
-            run_threads(a.threads, a.ops, qfn, ufn, a.q_frac, a.neg_share, keys, negs, a.latency, thr, ls);
+            if(concurrent){
+                if(!f.concurrent()) f.enable_concurrency();
+                sync="region";
+                auto qfn = [&](uint64_t k){ return f.contains_concurrent(k); };
+                auto bqfn = [&](const uint64_t* ks, size_t m, uint64_t* bits){ f.contains_batch_concurrent(ks, m, bits); };
+                auto ufn = [&](uint64_t k, std::mt19937_64& rng){
+                    if((rng()&1)==0) f.insert_concurrent(k); else f.erase_concurrent(k);
+                };
+                run_threads(a.threads, cpus, a.ops, qfn, bqfn, a.batch, ufn, a.q_frac, a.neg_share, keys, negs, a.dist, a.latency, thr, ls);
+            } else {
+                auto qfn = [&](uint64_t k){ return f.contains(k); };
+                auto bqfn = [&](const uint64_t* ks, size_t m, uint64_t* bits){ f.contains_batch(ks, m, bits); };
+                auto ufn = [&](uint64_t k, std::mt19937_64& rng){
+                    if((rng()&1)==0) f.insert(k); else f.erase(k);
+                };
+                run_threads(a.threads, cpus, a.ops, qfn, bqfn, a.batch, ufn, a.q_frac, a.neg_share, keys, negs, a.dist, a.latency, thr, ls);
+            }
             scan_steps = f.stats().scan_steps;
             insert_fail = f.stats().insert_fail;
         } else {
@@ -231,12 +439,26 @@ int main(int argc, char** argv){
         std::ofstream out(a.out, std::ios::app);
         out << a.filter << "," << a.n << "," << a.target_fpr << "," << afpr << "," << bpe << ","
             << a.load << "," << a.fp_bits << "," << a.r_bits << "," << a.threads << ","
-            << a.q_frac << "," << a.neg_share << "," << a.ops << "," << run << ","
-            << thr << "," << ls.p50 << "," << ls.p95 << "," << ls.p99 << ","
+            << placement_name(a.placement) << "," << cpus_field(cpus) << "," << sync << "," << a.batch << "," << hash_kind_name(a.hash) << ","
+            << a.q_frac << "," << a.neg_share << "," << a.dist.spec << "," << a.ops << "," << run << ","
+            << thr << "," << ls.p50 << "," << ls.p95 << "," << ls.p99 << "," << ls.p999 << "," << ls.max << ","
             << insert_fail << "," << kicks << "," << maxk << "," << stash_size << ","
-            << stash_hits << "," << fp_checks << "," << scan_steps
+            << stash_hits << "," << fp_checks << "," << scan_steps << ","
+            << bt << "," << (build_ns ? (double)a.n*1e9/(double)build_ns : 0.0) << "," << snapshot << ","
+            << peak_rss_kb() << ","
+            << ls.hist
             << "\n";
-        std::cerr << "run " << run << " done: fpr="<<afpr<<" bpe="<<bpe<<" thr="<<thr<<"\n";
+        std::cerr << "run " << run << " done: fpr="<<afpr<<" bpe="<<bpe<<" thr="<<thr<<" build_ms="<<build_ns/1e6<<" snapshot="<<snapshot<<"\n";
     }
     return 0;
 }
+
+int main(int argc, char** argv){
+    if(serve_requested(argc, argv)){
+        return serve_loop(argv[0], run,
+            []{ key_sets = KeySets(); },
+            [](std::ostream& o){ o << " n=" << key_sets.n << " seed=" << key_sets.seed; },
+            []{ return (uint64_t)(key_sets.keys.capacity() + key_sets.negs.capacity()) * sizeof(uint64_t); });
+    }
+    return run_once(run, argc, argv);
+}
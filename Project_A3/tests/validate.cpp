@@ -1,11 +1,17 @@
 
 #include <iostream>
+#include <atomic>
+#include <thread>
 #include <unordered_set>
 #include <random>
 #include <vector>
+#include <cstdio>
+#include <unistd.h>
 #include "cuckoo_filter.hpp"
 #include "quotient_filter.hpp"
 #include "xor_filter.hpp"
+#include "binary_fuse_filter.hpp"
+#include "ribbon_filter.hpp"
 #include "blocked_bloom.hpp"
 
 static std::vector<uint64_t> gen_unique(uint64_t n, uint64_t seed){
@@ -18,6 +24,113 @@ static std::vector<uint64_t> gen_unique(uint64_t n, uint64_t seed){
     return std::vector<uint64_t>(set.begin(), set.end());
 }
 
+// A filter saved and mapped back (zero-copy) must answer like the original,
+// for keys and non-keys.
+template <class F>
+static bool snapshot_roundtrip(F& f, const char* name, const std::vector<uint64_t>& keys){
+    std::string path = "/tmp/amq_validate_" + std::to_string(getpid()) + ".amq";
+    SnapshotWriter w(name);
+    f.save(w);
+    if(!w.write(path, name)) { std::cerr<<name<<" snapshot write failed\n"; return false; }
+    F g;
+    auto m = SnapshotMap::open(path, true);
+    std::remove(path.c_str());  // the mapping stays valid after unlink
+    if(!m || m->key()!=name || !g.load(m)) { std::cerr<<name<<" snapshot load failed\n"; return false; }
+    for(size_t i=0;i<keys.size();i++){
+        uint64_t q = (i&1) ? keys[i] : keys[i] * 0x9e3779b97f4a7c15ULL + 1;
+        if(f.contains(q)!=g.contains(q)) { std::cerr<<name<<" snapshot mismatch\n"; return false; }
+    }
+    std::cerr<<name<<" snapshot round trip OK\n";
+    return true;
+}
+
+// contains_batch must agree with contains key by key, for batch sizes that do
+// and do not fill the prefetch group / the last 64-bit word (keys and
+// non-keys mixed).
+template <class F>
+static bool batch_matches(F& f, const char* name, const std::vector<uint64_t>& keys){
+    std::vector<uint64_t> q;
+    for(size_t i=0;i<4096 && i<keys.size();i++){
+        q.push_back(keys[i]);
+        q.push_back(keys[i] * 0x9e3779b97f4a7c15ULL + 1);
+    }
+    for(size_t b : {1u, 7u, 32u, 100u, 256u}){
+        std::vector<uint64_t> bits((b+63)/64);
+        for(size_t off=0; off+b<=q.size(); off+=b){
+            f.contains_batch(q.data()+off, b, bits.data());
+            for(size_t i=0;i<b;i++){
+                bool got = (bits[i>>6] >> (i&63)) & 1;
+                if(got != f.contains(q[off+i])){
+                    std::cerr<<name<<" contains_batch mismatch (batch "<<b<<")\n";
+                    return false;
+                }
+            }
+        }
+    }
+    std::cerr<<name<<" contains_batch OK\n";
+    return true;
+}
+
+// Concurrent update path: reader threads query a base set inserted up front
+// while writer threads insert and erase their own churn keys. A base key must
+// never be missed (cuckoo displacements and QF cluster rewrites must keep every
+// fingerprint visible to a concurrent lookup), and each writer's churn keys
+// still inserted at the end must all be found. With erase=false the writers
+// only insert (the QF can already lose keys under deletes single-threaded, see
+// the note in main, so its concurrent deletes are checked for invariants only).
+template <class F>
+static bool concurrent_check(F& f, const char* name, const std::vector<uint64_t>& keys, int writers, int readers,
+                             bool erase){
+    size_t half = keys.size()/2;
+    std::vector<uint64_t> base;
+    for(size_t i=0;i<half;i++) if(f.insert(keys[i])) base.push_back(keys[i]);
+    f.enable_concurrency();
+
+    std::atomic<bool> failed{false};
+    std::atomic<int> writers_left{writers};
+    std::vector<std::vector<uint64_t>> live(writers);
+    std::vector<std::thread> ts;
+    for(int w=0; w<writers; w++){
+        ts.emplace_back([&, w]{
+            std::mt19937_64 rng(77 + w);
+            std::vector<uint64_t>& mine = live[w];
+            for(size_t i=half+w; i<keys.size(); i+=writers){
+                if(f.insert_concurrent(keys[i])){
+                    mine.push_back(keys[i]);
+                    if(!f.contains_concurrent(keys[i])) failed=true;
+                }
+                if(erase && !mine.empty() && (rng()%3)==0){
+                    size_t j = rng()%mine.size();
+                    f.erase_concurrent(mine[j]);
+                    mine[j] = mine.back();
+                    mine.pop_back();
+                }
+            }
+            writers_left--;
+        });
+    }
+    for(int r=0; r<readers; r++){
+        ts.emplace_back([&, r]{
+            std::mt19937_64 rng(991 + r);
+            while(writers_left.load() > 0 && !failed.load()){
+                for(int i=0;i<256;i++) if(!f.contains_concurrent(base[rng()%base.size()])) failed=true;
+            }
+        });
+    }
+    for(auto& t: ts) t.join();
+
+    if(failed){ std::cerr<<name<<" concurrent false negative\n"; return false; }
+    for(auto k: base) if(!f.contains_concurrent(k)){ std::cerr<<name<<" concurrent: base key lost\n"; return false; }
+    size_t live_n = 0;
+    for(auto& v: live){
+        live_n += v.size();
+        for(auto k: v) if(!f.contains_concurrent(k)){ std::cerr<<name<<" concurrent: churn key lost\n"; return false; }
+    }
+    std::cerr<<name<<" concurrent validate OK, base="<<base.size()<<" live churn="<<live_n
+             <<" ("<<writers<<" writers, "<<readers<<" readers)\n";
+    return true;
+}
+
 int main(int argc, char** argv){
     uint64_t n=200000;
     uint64_t ops=200000;
@@ -47,6 +160,8 @@ int main(int argc, char** argv){
             if(!f.contains(k)) { std::cerr<<"Cuckoo false negative under queries\n"; return 1; }
         }
         std::cerr<<"Cuckoo validate OK (insert-only), inserted="<<inserted.size()<<"/"<<n<<"\n";
+        if(!batch_matches(f, "Cuckoo", keys)) return 1;
+        if(!snapshot_roundtrip(f, "cuckoo", keys)) return 1;
     }
 
     // Quotient: conservative load
@@ -82,6 +197,8 @@ int main(int argc, char** argv){
         // because all fingerprint-only AMQs (including textbook QF) can produce false negatives
         // under deletions when two distinct keys share the same (quotient,remainder) fingerprint.
         std::cerr<<"QF validate OK (insert-only), inserted="<<inserted.size()<<"/"<<n<<"\n";
+        if(!batch_matches(f, "QF", keys)) return 2;
+        if(!snapshot_roundtrip(f, "qf", keys)) return 2;
     }
 
     {
@@ -92,6 +209,23 @@ int main(int argc, char** argv){
             if(!f.contains(k)) { std::cerr<<"XOR false negative\n"; return 3; }
         }
         std::cerr<<"XOR validate OK\n";
+        if(!batch_matches(f, "XOR", keys)) return 3;
+        if(!snapshot_roundtrip(f, "xor", keys)) return 3;
+    }
+
+    // static filters of the xor family: every key present
+    {
+        auto check = [&](auto& f, const char* name){
+            f.build(keys, 12, seed);
+            for(auto k: keys)
+                if(!f.contains(k)) { std::cerr<<name<<" false negative\n"; return false; }
+            std::cerr<<name<<" validate OK\n";
+            return batch_matches(f, name, keys) && snapshot_roundtrip(f, name, keys);
+        };
+        Fuse3Filter f3;
+        Fuse4Filter f4;
+        RibbonFilter rb;
+        if(!check(f3, "fuse3") || !check(f4, "fuse4") || !check(rb, "ribbon")) return 8;
     }
 
     {
@@ -103,6 +237,88 @@ int main(int argc, char** argv){
             if(!f.contains(k)) { std::cerr<<"Bloom false negative\n"; return 4; }
         }
         std::cerr<<"Bloom validate OK\n";
+        if(!batch_matches(f, "Bloom", keys)) return 4;
+        if(!snapshot_roundtrip(f, "bloom", keys)) return 4;
+    }
+
+    // parallel construction: the peeled XOR filter holds every key, and the
+    // concurrently built Bloom filter answers exactly like the serial one
+    {
+        XorFilter f;
+        f.build(keys, 12, seed, 4);
+        for(auto k: keys)
+            if(!f.contains(k)) { std::cerr<<"XOR parallel build false negative\n"; return 7; }
+        BlockedBloom serial, par;
+        serial.init(n, 0.01, seed);
+        par.init(n, 0.01, seed);
+        for(auto k: keys) serial.insert(k);
+        parallel_for(keys.size(), 4, [&](size_t b, size_t e){ for(size_t i=b;i<e;i++) par.insert_concurrent(keys[i]); });
+        for(uint64_t i=0;i<ops;i++){
+            uint64_t k = rng();
+            if(serial.contains(k)!=par.contains(k)) { std::cerr<<"Bloom parallel build mismatch\n"; return 7; }
+        }
+        std::cerr<<"Parallel build validate OK\n";
+    }
+
+    // every hash backend: Hasher64::batch equals the scalar hash, each filter
+    // holds all keys and answers batches and snapshots (which carry the hash
+    // kind) like before, and the static filters keep their FPR near 2^-12
+    for(HashKind hk : {HashKind::Wyhash, HashKind::Xxh3, HashKind::Crc32c, HashKind::MulShift}){
+        const char* hn = hash_kind_name(hk);
+        Hasher64 h(seed, hk);
+        std::vector<uint64_t> hb(keys.size());
+        h.batch(keys.data(), keys.size(), hb.data());
+        for(size_t i=0;i<keys.size();i++)
+            if(hb[i]!=h(keys[i])) { std::cerr<<hn<<" batch hash mismatch\n"; return 9; }
+
+        auto fpr = [&](auto& f){
+            uint64_t fp=0, q=0;
+            for(uint64_t i=0;i<ops;i++,q++) if(f.contains(keys[i%keys.size()] * 0x9e3779b97f4a7c15ULL + 1)) fp++;
+            return (double)fp/(double)q;
+        };
+        auto check = [&](auto& f, const char* name, bool exact){
+            for(auto k: keys)
+                if(!f.contains(k)) { std::cerr<<name<<"/"<<hn<<" false negative\n"; return false; }
+            if(exact && fpr(f) > 4.0/4096) { std::cerr<<name<<"/"<<hn<<" FPR "<<fpr(f)<<"\n"; return false; }
+            return batch_matches(f, name, keys) && snapshot_roundtrip(f, name, keys);
+        };
+        XorFilter x(hk); x.build(keys, 12, seed);
+        Fuse3Filter f3(hk); f3.build(keys, 12, seed);
+        Fuse4Filter f4(hk); f4.build(keys, 12, seed);
+        RibbonFilter rb(hk); rb.build(keys, 12, seed);
+        BlockedBloom bl(hk); bl.init(n, 0.01, seed);
+        for(auto k: keys) bl.insert(k);
+        CuckooFilter cf(hk); cf.init(n, 0.90, 12, seed);
+        for(auto k: keys) cf.insert(k);
+        if(!check(x, "xor", true) || !check(f3, "fuse3", true) || !check(f4, "fuse4", true) ||
+           !check(rb, "ribbon", true) || !check(bl, "bloom", false)) return 9;
+        if(cf.stats().insert_fail==0 && !check(cf, "cuckoo", false)) return 9;
+        QuotientFilter qf(hk); qf.init(n, 0.70, 16, seed);
+        for(auto k: keys)
+            if(qf.insert(k) && !qf.contains(k)) { std::cerr<<"qf/"<<hn<<" false negative\n"; return 9; }
+        if(!qf.validate() || !batch_matches(qf, "qf", keys) || !snapshot_roundtrip(qf, "qf", keys)) return 9;
+        std::cerr<<"hash "<<hn<<" validate OK\n";
+    }
+
+    {
+        CuckooFilter f;
+        f.init(n, 0.90, 12, seed);
+        if(!concurrent_check(f, "Cuckoo", keys, 4, 2, true)) return 5;
+    }
+
+    {
+        QuotientFilter f;
+        f.init(n, 0.70, 16, seed);
+        if(!concurrent_check(f, "QF", keys, 4, 2, false)) return 6;
+        std::vector<std::thread> ts;
+        for(int w=0; w<4; w++){
+            ts.emplace_back([&, w]{
+                for(size_t i=w; i<keys.size()/2; i+=8) f.erase_concurrent(keys[i]);
+            });
+        }
+        for(auto& t: ts) t.join();
+        if(!f.validate()) { std::cerr<<"QF invariant break after concurrent deletes\n"; return 6; }
+        std::cerr<<"QF concurrent delete validate OK\n";
     }
 
     std::cerr<<"ALL OK\n";
@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 import os
-import csv
-from collections import defaultdict
+import sys
 
 import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from results_store import load  # noqa: E402
 
 
 CSV_PATH = os.path.join("results", "results.csv")
@@ -12,38 +16,30 @@ FIXED_THREADS_FOR_KEYS_PLOT = 8
 
 THREAD_TICKS = [1, 2, 4, 8, 16]
 WORKLOAD_ORDER = ["lookup", "insert", "mixed"]
-MODE_ORDER = ["coarse", "striped"]
+MODE_ORDER = ["coarse", "striped", "flat-coarse", "flat-striped", "flat-optimistic"]
+
+
+SERIES = ["placement", "dist", "keys", "workload", "mode"]
+METRICS = ["throughput_ops_per_s", "cycles_per_op", "misses_per_op", "ipc"]
+COUNTERS = ["cycles", "instructions", "cache_references", "cache_misses"]
 
 
 def read_csv(path):
-    rows = []
-    with open(path, "r", newline="") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            r["keys"] = int(r["keys"])
-            r["threads"] = int(r["threads"])
-            r["read_pct"] = int(r["read_pct"])
-            r["ops_per_thread"] = int(r["ops_per_thread"])
-            r["throughput_ops_per_s"] = float(r["throughput_ops_per_s"])
-
-            def parse_optional_float(x):
-                if x is None:
-                    return None
-                x = str(x).strip()
-                if x == "" or x.upper() == "NA":
-                    return None
-                try:
-                    return float(x)
-                except ValueError:
-                    return None
-
-            r["cycles"] = parse_optional_float(r.get("cycles"))
-            r["instructions"] = parse_optional_float(r.get("instructions"))
-            r["cache_references"] = parse_optional_float(r.get("cache_references"))
-            r["cache_misses"] = parse_optional_float(r.get("cache_misses"))
-
-            rows.append(r)
-    return rows
+    df = load(path, "a4", categorical=False)
+    for c in ["keys", "threads", "read_pct", "ops_per_thread", "throughput_ops_per_s"] + COUNTERS:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+        else:
+            df[c] = np.nan
+    if "throughput_ci95" in df.columns:
+        df["throughput_ci95"] = pd.to_numeric(df["throughput_ci95"], errors="coerce")
+    if "dist" not in df.columns:  # CSVs from before the --dist axis
+        df["dist"] = "uniform"
+    df["dist"] = df["dist"].fillna("uniform")
+    if "placement" not in df.columns:  # CSVs from before the --placement axis
+        df["placement"] = "compact"
+    df["placement"] = df["placement"].fillna("compact")
+    return df
 
 
 def ensure_outdir():
@@ -57,190 +53,128 @@ def nice_order(items, preferred_order):
     return ordered
 
 
-def group_rows(rows):
+def aggregate(df):
     """
-    Index rows by (keys, workload, mode) -> {threads: row}
-    Keep the full row per thread so we can also plot derived metrics.
+    One grouped pass over the raw rows. Returns a frame indexed by
+    (placement, dist, keys, workload, mode, threads) with the median of every metric across
+    repeated rows, its 95% CI half-width (<metric>_ci, 0 for a single rep),
+    the rep count, and speedup vs the same series' 1-thread median.
+    Derived per row first: cycles/op and misses/op divide by
+    threads * ops_per_thread, IPC = instructions / cycles.
     """
-    data = defaultdict(dict)
-    keys_set = set()
-    workloads_set = set()
-    modes_set = set()
-
-    for r in rows:
-        k = r["keys"]
-        w = r["workload"]
-        m = r["mode"]
-        t = r["threads"]
-        keys_set.add(k)
-        workloads_set.add(w)
-        modes_set.add(m)
-        data[(k, w, m)][t] = r  # store full row
-
-    keys_list = sorted(keys_set)
-    workloads = nice_order(workloads_set, WORKLOAD_ORDER)
-    modes = nice_order(modes_set, MODE_ORDER)
-    return data, keys_list, workloads, modes
-
-
-def plot_throughput_vs_threads(data, keys_list, workloads, modes):
-    for k in keys_list:
-        for w in workloads:
-            plt.figure()
-            for m in modes:
-                series = data.get((k, w, m), {})
-                if not series:
-                    continue
-                ts = sorted(series.keys())
-                ys = [series[t]["throughput_ops_per_s"] for t in ts]
-                plt.plot(ts, ys, marker="o", label=m)
-
-            plt.xlabel("Threads")
-            plt.ylabel("Throughput (ops/s)")
-            plt.title(f"Throughput vs Threads — workload={w}, keys={k}")
-            plt.xticks(THREAD_TICKS)
-            plt.legend()
-            out = os.path.join(OUT_DIR, f"throughput_threads_workload-{w}_keys-{k}.png")
-            plt.savefig(out, dpi=200, bbox_inches="tight")
-            plt.close()
-
-
-def plot_speedup_vs_threads(data, keys_list, workloads, modes):
-    for k in keys_list:
-        for w in workloads:
-            plt.figure()
-            for m in modes:
-                series = data.get((k, w, m), {})
-                if not series or 1 not in series:
-                    continue
-                base = series[1]["throughput_ops_per_s"]
-                ts = sorted(series.keys())
-                ys = [series[t]["throughput_ops_per_s"] / base for t in ts]
-                plt.plot(ts, ys, marker="o", label=m)
-
-            plt.xlabel("Threads")
-            plt.ylabel("Speedup vs 1 thread")
-            plt.title(f"Speedup vs Threads — workload={w}, keys={k}")
-            plt.xticks(THREAD_TICKS)
-            plt.legend()
-            out = os.path.join(OUT_DIR, f"speedup_threads_workload-{w}_keys-{k}.png")
-            plt.savefig(out, dpi=200, bbox_inches="tight")
-            plt.close()
-
-
-def plot_throughput_vs_keys_at_threads(data, keys_list, workloads, modes, fixed_threads):
+    total_ops = (df["threads"] * df["ops_per_thread"]).where(lambda x: x > 0)
+    df = df.assign(cycles_per_op=df["cycles"] / total_ops,
+                   misses_per_op=df["cache_misses"] / total_ops,
+                   ipc=df["instructions"] / df["cycles"].where(df["cycles"] > 0))
+
+    g = df.groupby(SERIES + ["threads"], sort=True)[METRICS]
+    n = g.count()
+    ci = (1.96 * g.std(ddof=1) / np.sqrt(n)).where(n > 1, 0.0)
+    agg = g.median().join(ci.add_suffix("_ci"))
+    agg["reps"] = n["throughput_ops_per_s"]
+    if "throughput_ci95" in df.columns:
+        # sweep.py writes one row per configuration with the CI over its reps
+        own = df.groupby(SERIES + ["threads"], sort=True)["throughput_ci95"].max()
+        agg["throughput_ops_per_s_ci"] = agg["throughput_ops_per_s_ci"].where(agg["reps"] > 1, own)
+
+    thr = agg["throughput_ops_per_s"]
+    base = thr.where(thr.index.get_level_values("threads") == 1).groupby(level=SERIES).transform("max")
+    agg["speedup"] = thr / base
+    agg["speedup_ci"] = agg["speedup"] * agg["throughput_ops_per_s_ci"] / thr
+    return agg
+
+
+def axes_of(agg):
+    idx = agg.index
+    keys_list = sorted(idx.unique("keys"))
+    workloads = nice_order(idx.unique("workload"), WORKLOAD_ORDER)
+    modes = nice_order(idx.unique("mode"), MODE_ORDER)
+    return keys_list, workloads, modes
+
+
+def dist_tag(d):
+    """File-name suffix for a key distribution; uniform keeps the original names."""
+    return "" if d == "uniform" else "_dist-" + d.replace(":", "-")
+
+
+def dist_title(d):
+    return "" if d == "uniform" else f", dist={d}"
+
+
+def placement_tag(p):
+    """File-name suffix for a placement policy; compact keeps the original names."""
+    return "" if p == "compact" else "_placement-" + p.replace(":", "-").replace(",", "-").replace(";", "-")
+
+
+def placement_title(p):
+    return "" if p == "compact" else f", placement={p}"
+
+
+def plot_series(xs, ys, ci, label):
+    """Line with 95% CI error bars, which only show up once a point has reps > 1."""
+    yerr = ci.to_numpy() if np.nan_to_num(ci.to_numpy()).any() else None
+    plt.errorbar(xs, ys.to_numpy(), yerr=yerr, marker="o", capsize=3, label=label)
+
+
+def plot_metric_vs_threads(agg, modes, metric, ylabel, title, stem):
     """
-    For each workload, plot throughput vs keys at a fixed thread count.
+    One figure per (placement, dist, keys, workload): median metric vs threads, one line per
+    mode. Series without any value (e.g. counters unavailable) are skipped,
+    and so is a figure with no series at all.
     """
-    for w in workloads:
+    for (p, d, k, w), sub in agg.groupby(level=["placement", "dist", "keys", "workload"], sort=True):
+        sub = sub.dropna(subset=[metric])
+        present = set(sub.index.get_level_values("mode"))
+        if not present:
+            continue
         plt.figure()
         for m in modes:
-            xs = []
-            ys = []
-            for k in keys_list:
-                series = data.get((k, w, m), {})
-                if fixed_threads in series:
-                    xs.append(k)
-                    ys.append(series[fixed_threads]["throughput_ops_per_s"])
-            if xs:
-                plt.plot(xs, ys, marker="o", label=m)
+            if m not in present:
+                continue
+            s = sub.xs(m, level="mode").droplevel(["placement", "dist", "keys", "workload"])
+            plot_series(s.index.to_numpy(), s[metric], s[metric + "_ci"], m)
 
-        plt.xlabel("Keys (initial dataset size)")
-        plt.ylabel(f"Throughput (ops/s) @ {fixed_threads} threads")
-        plt.title(f"Throughput vs Keys @ {fixed_threads} threads — workload={w}")
-        plt.xscale("log")
+        plt.xlabel("Threads")
+        plt.ylabel(ylabel)
+        plt.title(f"{title} vs Threads — workload={w}, keys={k}{dist_title(d)}{placement_title(p)}")
+        plt.xticks(THREAD_TICKS)
         plt.legend()
-        out = os.path.join(OUT_DIR, f"throughput_keys_workload-{w}_threads-{fixed_threads}.png")
+        out = os.path.join(OUT_DIR, f"{stem}_threads_workload-{w}_keys-{k}{dist_tag(d)}{placement_tag(p)}.png")
         plt.savefig(out, dpi=200, bbox_inches="tight")
         plt.close()
 
 
-def plot_cycles_per_op_vs_threads(data, keys_list, workloads, modes):
-    """
-    Extra evidence plot: cycles/op vs threads (lower is better).
-    cycles/op = cycles / total_ops, where total_ops = threads * ops_per_thread.
-    """
-    for k in keys_list:
-        for w in workloads:
-            plt.figure()
-            plotted_any = False
-            for m in modes:
-                series = data.get((k, w, m), {})
-                if not series:
-                    continue
-
-                xs, ys = [], []
-                for t in sorted(series.keys()):
-                    row = series[t]
-                    cycles = row.get("cycles")
-                    if cycles is None:
-                        continue
-                    total_ops = float(row["threads"]) * float(row["ops_per_thread"])
-                    if total_ops <= 0:
-                        continue
-                    xs.append(t)
-                    ys.append(cycles / total_ops)
-
-                if xs:
-                    plotted_any = True
-                    plt.plot(xs, ys, marker="o", label=m)
-
-            if not plotted_any:
-                plt.close()
-                continue
-
-            plt.xlabel("Threads")
-            plt.ylabel("Cycles per operation")
-            plt.title(f"Cycles/op vs Threads — workload={w}, keys={k}")
-            plt.xticks(THREAD_TICKS)
-            plt.legend()
-            out = os.path.join(OUT_DIR, f"cycles_per_op_threads_workload-{w}_keys-{k}.png")
-            plt.savefig(out, dpi=200, bbox_inches="tight")
-            plt.close()
-
-
-def plot_cache_misses_per_op_vs_threads(data, keys_list, workloads, modes):
+def plot_throughput_vs_keys_at_threads(agg, workloads, modes, fixed_threads):
     """
-    Extra evidence plot: cache-misses/op vs threads (proxy for cache/coherence effects on WSL).
-    cache_misses/op = cache_misses / total_ops.
+    For each (placement, dist, workload), plot throughput vs keys at a fixed thread count.
     """
-    for k in keys_list:
-        for w in workloads:
-            plt.figure()
-            plotted_any = False
-            for m in modes:
-                series = data.get((k, w, m), {})
-                if not series:
-                    continue
-
-                xs, ys = [], []
-                for t in sorted(series.keys()):
-                    row = series[t]
-                    cm = row.get("cache_misses")
-                    if cm is None:
-                        continue
-                    total_ops = float(row["threads"]) * float(row["ops_per_thread"])
-                    if total_ops <= 0:
-                        continue
-                    xs.append(t)
-                    ys.append(cm / total_ops)
-
-                if xs:
-                    plotted_any = True
-                    plt.plot(xs, ys, marker="o", label=m)
-
-            if not plotted_any:
-                plt.close()
+    if fixed_threads not in agg.index.get_level_values("threads"):
+        return
+    at = agg.xs(fixed_threads, level="threads")
+    lv_placement = at.index.get_level_values("placement")
+    lv_dist = at.index.get_level_values("dist")
+    lv_workload = at.index.get_level_values("workload")
+    for p, d, w in [(p, d, w) for p in sorted(lv_placement.unique()) for d in sorted(lv_dist.unique())
+                    for w in workloads]:
+        sub = at[(lv_placement == p) & (lv_dist == d) & (lv_workload == w)].droplevel(["placement", "dist", "workload"])
+        if sub.empty:
+            continue
+        plt.figure()
+        for m in modes:
+            if m not in sub.index.get_level_values("mode"):
                 continue
+            s = sub.xs(m, level="mode")
+            plot_series(s.index.to_numpy(), s["throughput_ops_per_s"], s["throughput_ops_per_s_ci"], m)
 
-            plt.xlabel("Threads")
-            plt.ylabel("Cache-misses per operation")
-            plt.title(f"Cache-misses/op vs Threads — workload={w}, keys={k}")
-            plt.xticks(THREAD_TICKS)
-            plt.legend()
-            out = os.path.join(OUT_DIR, f"cache_misses_per_op_threads_workload-{w}_keys-{k}.png")
-            plt.savefig(out, dpi=200, bbox_inches="tight")
-            plt.close()
+        plt.xlabel("Keys (initial dataset size)")
+        plt.ylabel(f"Throughput (ops/s) @ {fixed_threads} threads")
+        plt.title(f"Throughput vs Keys @ {fixed_threads} threads — workload={w}{dist_title(d)}{placement_title(p)}")
+        plt.xscale("log")
+        plt.legend()
+        out = os.path.join(OUT_DIR, f"throughput_keys_workload-{w}_threads-{fixed_threads}{dist_tag(d)}"
+                                    f"{placement_tag(p)}.png")
+        plt.savefig(out, dpi=200, bbox_inches="tight")
+        plt.close()
 
 
 def main():
@@ -249,23 +183,30 @@ def main():
     if not os.path.exists(CSV_PATH):
         raise FileNotFoundError(f"Could not find {CSV_PATH}. Run scripts/sweep.sh first.")
 
-    rows = read_csv(CSV_PATH)
-    data, keys_list, workloads, modes = group_rows(rows)
+    agg = aggregate(read_csv(CSV_PATH))
+    keys_list, workloads, modes = axes_of(agg)
 
-    plot_throughput_vs_threads(data, keys_list, workloads, modes)
-    plot_speedup_vs_threads(data, keys_list, workloads, modes)
-    plot_throughput_vs_keys_at_threads(data, keys_list, workloads, modes, FIXED_THREADS_FOR_KEYS_PLOT)
+    plot_metric_vs_threads(agg, modes, "throughput_ops_per_s", "Throughput (ops/s)", "Throughput", "throughput")
+    plot_metric_vs_threads(agg, modes, "speedup", "Speedup vs 1 thread", "Speedup", "speedup")
+    plot_throughput_vs_keys_at_threads(agg, workloads, modes, FIXED_THREADS_FOR_KEYS_PLOT)
 
-    plot_cycles_per_op_vs_threads(data, keys_list, workloads, modes)
-    plot_cache_misses_per_op_vs_threads(data, keys_list, workloads, modes)
+    # Extra evidence plots (only where perf counters were recorded):
+    # cycles/op (lower is better), cache-misses/op (proxy for cache/coherence
+    # effects on WSL) and IPC.
+    plot_metric_vs_threads(agg, modes, "cycles_per_op", "Cycles per operation", "Cycles/op", "cycles_per_op")
+    plot_metric_vs_threads(agg, modes, "misses_per_op", "Cache-misses per operation", "Cache-misses/op",
+                           "cache_misses_per_op")
+    plot_metric_vs_threads(agg, modes, "ipc", "Instructions per cycle", "IPC", "ipc")
 
     print("Done. Plots written to results/*.png")
     print(f"- Used CSV: {CSV_PATH}")
     print(f"- Keys: {keys_list}")
     print(f"- Workloads: {workloads}")
     print(f"- Modes: {modes}")
+    print(f"- Key distributions: {sorted(agg.index.unique('dist'))}")
+    print(f"- Placements: {sorted(agg.index.unique('placement'))}")
     print(f"- Throughput vs Keys thread count: {FIXED_THREADS_FOR_KEYS_PLOT}")
-    print("- Also wrote: cycles_per_op_* and cache_misses_per_op_* plots (if counters available).")
+    print("- Also wrote: cycles_per_op_*, cache_misses_per_op_* and ipc_* plots (if counters available).")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Sweep driver for the A4 bench (replaces the per-repetition python3 heredocs
+that sweep.sh used to spawn).
+
+Every configuration is run WARMUP times (discarded) and then REPS times. The
+throughput of a rep is the bench's own throughput_ops_per_s, i.e. the timed
+worker section only (prefill and process start-up are excluded). The bench
+runs as one resident `bench --serve` process (common/bench_client.py), so the
+prefilled table is built once per (storage, keys) and restored from its
+snapshot between reps instead of being re-prefilled by a fresh process.
+Hardware counters come from one perf_event_open group attached to that
+process, read around each rep, so they cover the rep's run command only;
+with --no-serve every rep is a fresh process again and the group is opened on
+this process (children inherit it), covering the whole bench process like
+perf stat. The median and 95% CI across reps are computed in memory and one
+row per configuration is appended to the CSV as soon as it is done.
+"""
+import argparse
+import csv
+import math
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common"))
+from bench_client import BenchServer, BenchServerError  # noqa: E402
+from perf_events import EVENTS, PerfCounters, PerfUnavailable  # noqa: E402
+
+COLUMNS = ["mode", "workload", "keys", "threads", "placement", "cpus", "read_pct", "dist", "ops_per_thread",
+           "throughput_ops_per_s", "cycles", "instructions", "cache_references", "cache_misses",
+           "reps", "throughput_ci95", "pages", "page_backing", "huge_pct", "dropped_inserts"]
+COUNTERS = ["cycles", "instructions", "cache_references", "cache_misses"]
+
+KV_RE = re.compile(r"(\w+)=(\S+)")
+
+# two-sided 95% Student t for n-1 = 1..30 degrees of freedom
+T95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+       2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+       2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def ci95(vals):
+    """Half-width of the 95% CI of the mean (0 for fewer than two reps)."""
+    n = len(vals)
+    if n < 2:
+        return 0.0
+    t = T95[n - 2] if n - 1 <= len(T95) else 1.96
+    return t * statistics.stdev(vals) / math.sqrt(n)
+
+
+def split_list(s):
+    return [x for x in re.split(r"[,\s]+", s) if x]
+
+
+def open_counters(choice, pid=0):
+    if choice == "none":
+        return None
+    try:
+        return PerfCounters([e for e in EVENTS if e[0] in COUNTERS], pid=pid)
+    except PerfUnavailable as e:
+        if choice == "syscall":
+            raise SystemExit(f"--counters syscall: {e}")
+        print(f"NOTE: hardware counters unavailable ({e}); writing NA", flush=True)
+        return None
+
+
+def run_bench(cmd, counters, server=None):
+    """
+    One bench run (on server if given).
+    Returns (throughput or None, {counter: value}, {key: value} of the output line).
+    """
+    def go():
+        if server is None:
+            p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            return p.stdout if p.returncode == 0 else None
+        try:
+            return server.run(cmd[1:])
+        except BenchServerError as e:
+            print(f"WARN: {e}", flush=True)
+            return None
+
+    if counters is not None:
+        out, counts = counters.measure(go)
+    else:
+        out, counts = go(), {}
+    if out is None:
+        return None, {}, {}
+    kv = dict(KV_RE.findall(out))
+    try:
+        return float(kv["throughput_ops_per_s"]), counts, kv
+    except (KeyError, ValueError):
+        return None, {}, {}
+
+
+def measure(cmd, reps, warmup, counters, server=None):
+    for _ in range(warmup):
+        run_bench(cmd, None, server)
+    thr, counts, last, dropped = [], {c: [] for c in COUNTERS}, {}, 0
+    for _ in range(reps):
+        t, cnt, kv = run_bench(cmd, counters, server)
+        if t is None or not math.isfinite(t):
+            continue
+        thr.append(t)
+        last = kv
+        dropped += int(kv.get("dropped_inserts", 0))
+        for c in COUNTERS:
+            if c in cnt:
+                counts[c].append(cnt[c])
+    if last:
+        last["dropped_inserts"] = dropped  # summed over the measured reps
+    return thr, counts, last
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bin", default="./bench")
+    ap.add_argument("--out", default=os.path.join("results", "results.csv"))
+    ap.add_argument("--reps", type=int, default=7)
+    ap.add_argument("--warmup", type=int, default=1)
+    ap.add_argument("--ops-per-thread", type=int, default=500000)
+    ap.add_argument("--read-pct-mixed", type=int, default=70)
+    ap.add_argument("--keys", default="10000,100000,1000000")
+    ap.add_argument("--threads", default="1,2,4,8,16")
+    ap.add_argument("--workloads", default="lookup,insert,mixed")
+    ap.add_argument("--modes", default="coarse,striped,flat-coarse,flat-striped,flat-optimistic")
+    ap.add_argument("--dists", default="uniform", help="e.g. 'uniform,zipf:0.99,hotspot:0.1:0.9'")
+    ap.add_argument("--counters", choices=["auto", "syscall", "none"], default="auto")
+    ap.add_argument("--placements", default="compact",
+                    help="worker placements: compact, scatter, smt-pairs or list:<cpus> with ';' between CPUs, "
+                         "e.g. 'compact,scatter,list:0;2;4'")
+    ap.add_argument("--pages", default="default", choices=["default", "4k", "thp", "hugetlb"],
+                    help="page size backing the flat tables (the chained table always uses malloc)")
+    ap.add_argument("--no-serve", action="store_true", help="spawn a fresh bench process per rep")
+    args = ap.parse_args()
+
+    if not (os.path.isfile(args.bin) and os.access(args.bin, os.X_OK)):
+        raise SystemExit(f"ERROR: benchmark binary not found/executable at: {args.bin}\n"
+                         "Tip: run 'make' or pass --bin ./path/to/binary")
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+
+    server = None if args.no_serve else BenchServer([args.bin])
+    counters = open_counters(args.counters, server.pid if server else 0)
+    print(f"Counters: {'perf_event_open' if counters else 'none'}")
+    print(f"Binary: {args.bin}{'' if args.no_serve else ' (--serve)'}")
+
+    with open(args.out, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(COLUMNS)
+        f.flush()
+        for placement, dist in [(p, d) for p in split_list(args.placements) for d in split_list(args.dists)]:
+            for mode in split_list(args.modes):
+                for workload in split_list(args.workloads):
+                    for keys in map(int, split_list(args.keys)):
+                        for threads in map(int, split_list(args.threads)):
+                            read_pct = {"lookup": 100, "insert": 0}.get(workload, args.read_pct_mixed)
+                            cmd = [args.bin, "--mode", mode, "--workload", workload, "--keys", str(keys),
+                                   "--threads", str(threads), "--read_pct", str(read_pct),
+                                   "--dist", dist, "--ops_per_thread", str(args.ops_per_thread),
+                                   "--pages", args.pages, "--placement", placement.replace(";", ",")]
+                            thr, counts, kv = measure(cmd, args.reps, args.warmup, counters, server)
+
+                            med = statistics.median(thr) if thr else float("nan")
+                            ctr = [statistics.median(counts[c]) if counts[c] else "NA" for c in COUNTERS]
+                            w.writerow([mode, workload, keys, threads, placement, kv.get("cpus", "NA"), read_pct,
+                                        dist, args.ops_per_thread,
+                                        med, *ctr, len(thr), ci95(thr), args.pages,
+                                        kv.get("page_backing", "NA"), kv.get("huge_pct", "NA"),
+                                        kv.get("dropped_inserts", "NA")])
+                            f.flush()
+                            print(f"done: {mode} {workload} {dist} {placement} keys={keys} thr={threads} "
+                                  f"median={med:.6g} reps={len(thr)}", flush=True)
+
+    if counters is not None:
+        counters.close()
+    if server is not None:
+        server.close()
+    print(f"DONE. Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
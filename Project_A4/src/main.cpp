@@ -8,11 +8,13 @@
 #include <cstring>
 #include <string>
 #include <algorithm>
+#include <stdexcept>
+
+#include "bench_serve.hpp"
+#include "cpu_placement.hpp"
+#include "key_dist.hpp"
+#include "page_alloc.hpp"
 
-#ifdef __linux__
-#include <sched.h>
-#include <unistd.h>
-#endif
 
 using namespace std;
 
@@ -33,24 +35,158 @@ inline size_t bucket_of(int k) {
     return std::hash<int>{}(k) % BUCKET_COUNT;
 }
 
-inline void pin_thread_best_effort(int tid) {
-#ifdef __linux__
-    int ncpu = (int)std::thread::hardware_concurrency();
-    if (ncpu <= 0) return;
-    cpu_set_t cpuset;
-    CPU_ZERO(&cpuset);
-    CPU_SET(tid % ncpu, &cpuset);
-    (void)sched_setaffinity(0, sizeof(cpu_set_t), &cpuset); // ignore failure (WSL may reject)
-#else
-    (void)tid;
-#endif
-}
-
-enum class Mode { Coarse, Striped };
+enum class Mode { Coarse, Striped, Optimistic };
+enum class Storage { Chained, Flat };
 enum class Workload { LookupOnly, InsertOnly, Mixed };
 
 inline size_t stripe_of(size_t idx) { return idx % STRIPES; }
 
+// Flat open-addressing storage. The table is split into STRIPES independent
+// shards (a key's stripe picks its shard), so a probe sequence never leaves
+// the memory its stripe lock covers. All shards are slices of one arena, so
+// --pages decides the page size backing the whole table. Each 64-byte group holds 8 control bytes
+// and 7 KV slots: a probe checks the control word for the key's 7-bit tag
+// (SWAR compare of all slots at once) and touches one cache line per group.
+static constexpr int GROUP_SLOTS = 7;
+static constexpr uint8_t CTRL_EMPTY = 0x00;
+static constexpr uint8_t CTRL_TOMB  = 0x01;
+static constexpr uint64_t LSB = 0x0101010101010101ull;
+static constexpr uint64_t SLOT_MSB = 0x0080808080808080ull; // top byte is padding
+
+struct alignas(64) Group {
+    uint64_t ctrl;  // byte i is the control byte of slots[i]
+    KV slots[GROUP_SLOTS];
+};
+
+struct FlatShard {
+    Group* groups = nullptr;
+    size_t mask = 0;
+};
+
+static FlatShard flat_shards[STRIPES];
+static PageBuffer flat_arena;
+
+inline uint64_t flat_hash(int k) {
+    uint64_t x = (uint64_t)(uint32_t)k * 0x9E3779B97F4A7C15ull;
+    x ^= x >> 29; x *= 0xBF58476D1CE4E5B9ull; x ^= x >> 32;
+    return x;
+}
+inline size_t shard_of(uint64_t h) { return h % STRIPES; }
+inline uint8_t tag_of(uint64_t h) { return (uint8_t)(0x80 | (h >> 57)); }
+
+// Exact per-byte "== 0" mask (MSB of each matching byte), restricted to slots.
+inline uint64_t zero_bytes(uint64_t w) {
+    return ~(((w & 0x7F7F7F7F7F7F7F7Full) + 0x7F7F7F7F7F7F7F7Full) | w | 0x7F7F7F7F7F7F7F7Full) & SLOT_MSB;
+}
+// Group fields are read and written with relaxed atomics so that the
+// optimistic readers (which run without the stripe lock and rely on the
+// sequence check) never perform a plain racing access.
+template <class T> inline T load_relaxed(const T &x) { return __atomic_load_n(&x, __ATOMIC_RELAXED); }
+template <class T> inline void store_relaxed(T &x, T v) { __atomic_store_n(&x, v, __ATOMIC_RELAXED); }
+
+inline uint64_t ctrl_word(const Group& g) { return load_relaxed(g.ctrl); }
+inline void set_ctrl(Group& g, int s, uint8_t c) {
+    uint64_t w = load_relaxed(g.ctrl);
+    w = (w & ~(0xFFull << (8 * s))) | ((uint64_t)c << (8 * s));
+    store_relaxed(g.ctrl, w);
+}
+inline uint64_t match_tag(uint64_t w, uint8_t tag) { return zero_bytes(w ^ (LSB * tag)); }
+inline int slot_of(uint64_t m) { return __builtin_ctzll(m) >> 3; }
+
+// Size every shard for `entries` live keys at <= 75% slot load. An arena of
+// the same size and page kind is reused (cleared in place).
+void flat_init(size_t entries, PageKind pages) {
+    size_t per_shard = entries / STRIPES + 1;
+    size_t groups = 1;
+    while (groups * GROUP_SLOTS * 3 < per_shard * 4) groups <<= 1;
+    size_t bytes = groups * STRIPES * sizeof(Group);
+    if (!flat_arena.ptr || flat_arena.bytes != bytes || flat_arena.requested != pages) {
+        page_free(flat_arena);
+        flat_arena = page_alloc(bytes, pages, alignof(Group));
+        if (!flat_arena.ptr)
+            throw runtime_error("flat table allocation of " + to_string(bytes) + " bytes failed");
+    }
+    memset(flat_arena.ptr, 0, bytes);  // every control byte CTRL_EMPTY
+    for (size_t i = 0; i < STRIPES; i++) {
+        flat_shards[i].groups = (Group*)flat_arena.ptr + i * groups;
+        flat_shards[i].mask = groups - 1;
+    }
+}
+
+bool flat_find_locked(uint64_t h, int k, int &out_v) {
+    FlatShard &sh = flat_shards[shard_of(h)];
+    uint8_t tag = tag_of(h);
+    size_t gi = (h >> 6) & sh.mask;
+    for (size_t probe = 0; probe <= sh.mask; probe++, gi = (gi + 1) & sh.mask) {
+        const Group &g = sh.groups[gi];
+        uint64_t w = ctrl_word(g);
+        for (uint64_t m = match_tag(w, tag); m; m &= m - 1) {
+            int s = slot_of(m);
+            if (load_relaxed(g.slots[s].key) == k) {
+                out_v = load_relaxed(g.slots[s].value);
+                return true;
+            }
+        }
+        if (zero_bytes(w)) return false; // an empty slot ends the probe sequence
+    }
+    return false;
+}
+
+// Inserts flat_insert_locked could not place because the key's whole probe
+// sequence was full. flat_init sizes shards so this should stay 0; a run
+// reports it (dropped_inserts=) rather than count work it did not do.
+static atomic<uint64_t> flat_dropped{0};
+
+void flat_insert_locked(uint64_t h, int k, int v) {
+    FlatShard &sh = flat_shards[shard_of(h)];
+    uint8_t tag = tag_of(h);
+    size_t gi = (h >> 6) & sh.mask;
+    Group *dst_g = nullptr;
+    int dst_s = -1;
+    for (size_t probe = 0; probe <= sh.mask; probe++, gi = (gi + 1) & sh.mask) {
+        Group &g = sh.groups[gi];
+        uint64_t w = ctrl_word(g);
+        for (uint64_t m = match_tag(w, tag); m; m &= m - 1) {
+            int s = slot_of(m);
+            if (load_relaxed(g.slots[s].key) == k) {
+                store_relaxed(g.slots[s].value, v);
+                return;
+            }
+        }
+        if (!dst_g) {
+            // first reusable slot on the path: a tombstone or an empty slot
+            uint64_t m = match_tag(w, CTRL_TOMB) | zero_bytes(w);
+            if (m) { dst_g = &g; dst_s = slot_of(m); }
+        }
+        if (zero_bytes(w)) break;
+    }
+    if (!dst_g) { flat_dropped.fetch_add(1, memory_order_relaxed); return; }  // shard full
+    store_relaxed(dst_g->slots[dst_s].key, k);
+    store_relaxed(dst_g->slots[dst_s].value, v);
+    set_ctrl(*dst_g, dst_s, tag);
+}
+
+bool flat_erase_locked(uint64_t h, int k) {
+    FlatShard &sh = flat_shards[shard_of(h)];
+    uint8_t tag = tag_of(h);
+    size_t gi = (h >> 6) & sh.mask;
+    for (size_t probe = 0; probe <= sh.mask; probe++, gi = (gi + 1) & sh.mask) {
+        Group &g = sh.groups[gi];
+        uint64_t w = ctrl_word(g);
+        for (uint64_t m = match_tag(w, tag); m; m &= m - 1) {
+            int s = slot_of(m);
+            if (load_relaxed(g.slots[s].key) == k) {
+                // A group that still has an empty slot stops every probe that
+                // reaches it, so the slot can go straight back to empty.
+                set_ctrl(g, s, zero_bytes(w) ? CTRL_EMPTY : CTRL_TOMB);
+                return true;
+            }
+        }
+        if (zero_bytes(w)) return false;
+    }
+    return false;
+}
+
 bool find_locked(size_t idx, int k, int &out_v) {
     auto &b = buckets[idx];
     for (const auto &kv : b) {
@@ -118,14 +254,112 @@ bool erase_striped(int k) {
     return erase_locked(idx, k);
 }
 
+bool flat_find_coarse(int k, int &out_v) {
+    uint64_t h = flat_hash(k);
+    lock_guard<mutex> g(global_lock);
+    return flat_find_locked(h, k, out_v);
+}
+
+bool flat_find_striped(int k, int &out_v) {
+    uint64_t h = flat_hash(k);
+    lock_guard<mutex> g(stripe_locks[shard_of(h)]);
+    return flat_find_locked(h, k, out_v);
+}
+
+void flat_insert_coarse(int k, int v) {
+    uint64_t h = flat_hash(k);
+    lock_guard<mutex> g(global_lock);
+    flat_insert_locked(h, k, v);
+}
+
+void flat_insert_striped(int k, int v) {
+    uint64_t h = flat_hash(k);
+    lock_guard<mutex> g(stripe_locks[shard_of(h)]);
+    flat_insert_locked(h, k, v);
+}
+
+bool flat_erase_coarse(int k) {
+    uint64_t h = flat_hash(k);
+    lock_guard<mutex> g(global_lock);
+    return flat_erase_locked(h, k);
+}
+
+bool flat_erase_striped(int k) {
+    uint64_t h = flat_hash(k);
+    lock_guard<mutex> g(stripe_locks[shard_of(h)]);
+    return flat_erase_locked(h, k);
+}
+
+// Mode::Optimistic (flat storage only): writers take the stripe lock and bump
+// the stripe's sequence counter to odd before and back to even after the
+// change; readers take no lock, read the counter, probe, and retry if the
+// counter was odd or moved. A reader never writes a shared cache line. The
+// chained buckets are not eligible because a concurrent push_back can free
+// the vector a lock-free reader is walking.
+struct alignas(64) StripeSeq {
+    atomic<uint64_t> seq{0};
+};
+static StripeSeq stripe_seq[STRIPES];
+
+inline void cpu_relax() {
+#if defined(__x86_64__) || defined(__i386__)
+    __builtin_ia32_pause();
+#endif
+}
+
+struct SeqWriteGuard {
+    atomic<uint64_t> &seq;
+    explicit SeqWriteGuard(atomic<uint64_t> &s) : seq(s) {
+        seq.store(seq.load(memory_order_relaxed) + 1, memory_order_relaxed);
+        atomic_thread_fence(memory_order_release);
+    }
+    ~SeqWriteGuard() { seq.store(seq.load(memory_order_relaxed) + 1, memory_order_release); }
+};
+
+bool flat_find_optimistic(int k, int &out_v) {
+    uint64_t h = flat_hash(k);
+    atomic<uint64_t> &seq = stripe_seq[shard_of(h)].seq;
+    for (;;) {
+        uint64_t s0 = seq.load(memory_order_acquire);
+        if (s0 & 1) { cpu_relax(); continue; }
+        int v = 0;
+        bool found = flat_find_locked(h, k, v);
+        atomic_thread_fence(memory_order_acquire);
+        if (seq.load(memory_order_relaxed) == s0) {
+            if (found) out_v = v;
+            return found;
+        }
+    }
+}
+
+void flat_insert_optimistic(int k, int v) {
+    uint64_t h = flat_hash(k);
+    size_t sh = shard_of(h);
+    lock_guard<mutex> g(stripe_locks[sh]);
+    SeqWriteGuard w(stripe_seq[sh].seq);
+    flat_insert_locked(h, k, v);
+}
+
+bool flat_erase_optimistic(int k) {
+    uint64_t h = flat_hash(k);
+    size_t sh = shard_of(h);
+    lock_guard<mutex> g(stripe_locks[sh]);
+    SeqWriteGuard w(stripe_seq[sh].seq);
+    return flat_erase_locked(h, k);
+}
+
 struct Args {
     int threads = 4;
     Mode mode = Mode::Coarse;
+    Storage storage = Storage::Chained;
     Workload workload = Workload::Mixed;
     int read_pct = 70;         
     int keys = 100000;          
     int ops_per_thread = 1000000;
     uint64_t seed = 12345;
+    KeyDist dist;
+    PageKind pages = PageKind::Default;  // flat storage only; chained nodes come from malloc
+    Placement placement;
 };
 
 Args parse_args(int argc, char** argv) {
@@ -134,13 +368,31 @@ Args parse_args(int argc, char** argv) {
         string s = argv[i];
         if (s == "--threads" && i+1 < argc) a.threads = atoi(argv[++i]);
         else if (s == "--keys" && i+1 < argc) a.keys = atoi(argv[++i]);
-        else if (s == "--ops" && i+1 < argc) a.ops_per_thread = atoi(argv[++i]);
+        else if ((s == "--ops" || s == "--ops_per_thread") && i+1 < argc) a.ops_per_thread = atoi(argv[++i]);
         else if (s == "--read_pct" && i+1 < argc) a.read_pct = atoi(argv[++i]);
         else if (s == "--seed" && i+1 < argc) a.seed = strtoull(argv[++i], nullptr, 10);
+        else if (s == "--dist" && i+1 < argc) {
+            string d = argv[++i];
+            if (!KeyDist::parse(d, a.dist))
+                throw invalid_argument("bad --dist " + d + " (uniform | zipf:<theta> | hotspot:<frac>:<prob>)");
+        }
+        else if (s == "--pages" && i+1 < argc) {
+            string p = argv[++i];
+            if (!parse_page_kind(p, a.pages))
+                throw invalid_argument("bad --pages " + p + " (default | 4k | thp | hugetlb)");
+        }
+        else if (s == "--placement" && i+1 < argc) {
+            string p = argv[++i];
+            if (!parse_placement(p, a.placement))
+                throw invalid_argument("bad --placement " + p + " (compact | scatter | smt-pairs | list:<cpus>)");
+        }
         else if (s == "--mode" && i+1 < argc) {
             string m = argv[++i];
-            if (m == "coarse") a.mode = Mode::Coarse;
-            else if (m == "striped") a.mode = Mode::Striped;
+            if (m == "coarse") { a.mode = Mode::Coarse; a.storage = Storage::Chained; }
+            else if (m == "striped") { a.mode = Mode::Striped; a.storage = Storage::Chained; }
+            else if (m == "flat-coarse") { a.mode = Mode::Coarse; a.storage = Storage::Flat; }
+            else if (m == "flat-striped") { a.mode = Mode::Striped; a.storage = Storage::Flat; }
+            else if (m == "flat-optimistic") { a.mode = Mode::Optimistic; a.storage = Storage::Flat; }
         } else if (s == "--workload" && i+1 < argc) {
             string w = argv[++i];
             if (w == "lookup") a.workload = Workload::LookupOnly;
@@ -155,23 +407,138 @@ Args parse_args(int argc, char** argv) {
     return a;
 }
 
+bool table_find(const Args& a, int k, int &out_v) {
+    if (a.mode == Mode::Optimistic) return flat_find_optimistic(k, out_v);
+    if (a.storage == Storage::Flat)
+        return a.mode == Mode::Coarse ? flat_find_coarse(k, out_v) : flat_find_striped(k, out_v);
+    return a.mode == Mode::Coarse ? find_coarse(k, out_v) : find_striped(k, out_v);
+}
+
+void table_insert(const Args& a, int k, int v) {
+    if (a.mode == Mode::Optimistic) {
+        flat_insert_optimistic(k, v);
+    } else if (a.storage == Storage::Flat) {
+        if (a.mode == Mode::Coarse) flat_insert_coarse(k, v);
+        else flat_insert_striped(k, v);
+    } else {
+        if (a.mode == Mode::Coarse) insert_coarse(k, v);
+        else insert_striped(k, v);
+    }
+}
+
+bool table_erase(const Args& a, int k) {
+    if (a.mode == Mode::Optimistic) return flat_erase_optimistic(k);
+    if (a.storage == Storage::Flat)
+        return a.mode == Mode::Coarse ? flat_erase_coarse(k) : flat_erase_striped(k);
+    return a.mode == Mode::Coarse ? erase_coarse(k) : erase_striped(k);
+}
+
+// Upper bound on live keys: the prefill plus every insert the run can do.
+size_t max_entries(const Args& a) {
+    double ops = (double)a.threads * a.ops_per_thread;
+    double inserts = a.workload == Workload::InsertOnly ? ops :
+                     a.workload == Workload::Mixed ? ops * (100 - a.read_pct) / 100.0 * 0.5 : 0.0;
+    return (size_t)a.keys + (size_t)inserts;
+}
+
 void prefill(const Args& a) {
-    for (auto &b : buckets) b.clear();
+    if (a.storage == Storage::Flat) flat_init(max_entries(a), a.pages);
+    else for (auto &b : buckets) b.clear();
 
     std::mt19937 rng((uint32_t)a.seed);
     for (int i = 0; i < a.keys; i++) {
         int k = (int)rng();
-        if (a.mode == Mode::Coarse) insert_coarse(k, k);
-        else insert_striped(k, k);
+        table_insert(a, k, k);
     }
 }
 
-void worker(int tid, const Args& a, const vector<int>& hot_keys, atomic<uint64_t>& ops_done) {
-    pin_thread_best_effort(tid);
+// --serve keeps the prefilled table and the hot keys resident. A run whose
+// storage, keys, seed and capacity match the resident table reuses it as is
+// after a lookup-only run, or restores it from a snapshot taken right after
+// prefill once a run has mutated it, so prefill() is not repeated per rep.
+struct Resident {
+    bool valid = false;
+    bool dirty = false;
+    Storage storage = Storage::Chained;
+    PageKind pages = PageKind::Default;
+    int keys = 0;
+    uint64_t seed = 0;
+    size_t entries = 0;
+    vector<int> hot_keys;
+};
+
+static Resident resident;
+static vector<vector<KV>> buckets_snapshot;
+static vector<Group> flat_snapshot;
+
+void table_snapshot(Storage st) {
+    if (st == Storage::Flat) {
+        const Group* g = (const Group*)flat_arena.ptr;
+        flat_snapshot.assign(g, g + flat_arena.bytes / sizeof(Group));
+    } else {
+        buckets_snapshot = buckets;
+    }
+}
+
+// Restoring copies into the live table's already-touched storage (copy
+// assignment reuses the bucket vectors), so it never reallocates.
+void table_restore(Storage st) {
+    if (st == Storage::Flat) memcpy(flat_arena.ptr, flat_snapshot.data(), flat_arena.bytes);
+    else buckets = buckets_snapshot;
+}
+
+void table_release() {
+    for (auto &b : buckets) vector<KV>().swap(b);
+    vector<vector<KV>>().swap(buckets_snapshot);
+    page_free(flat_arena);
+    for (auto &sh : flat_shards) sh = FlatShard();
+    vector<Group>().swap(flat_snapshot);
+    resident = Resident();
+}
+
+uint64_t table_bytes() {
+    uint64_t bytes = 0;
+    for (auto &b : buckets) bytes += b.capacity() * sizeof(KV);
+    for (auto &b : buckets_snapshot) bytes += b.capacity() * sizeof(KV);
+    bytes += flat_arena.bytes + flat_snapshot.capacity() * sizeof(Group);
+    return bytes + resident.hot_keys.capacity() * sizeof(int);
+}
+
+// Brings the table and hot keys to the freshly prefilled state for a.
+void prepare(const Args& a, bool serving) {
+    bool same = resident.valid && resident.storage == a.storage && resident.pages == a.pages &&
+                resident.keys == a.keys && resident.seed == a.seed && resident.entries == max_entries(a);
+    if (same && !resident.dirty) return;
+    if (same && serving) {
+        table_restore(a.storage);
+    } else {
+        if (serving && resident.valid && resident.storage != a.storage) table_release();
+        resident.valid = false;  // stays invalid if prefill() throws half way
+        prefill(a);
+        if (serving) table_snapshot(a.storage);
+
+        // The prefilled keys in insertion order (random), so --dist rank r maps to
+        // an arbitrary bucket/stripe. Skewed distributions need the whole key set.
+        resident.hot_keys.clear();
+        resident.hot_keys.reserve(a.keys);
+        std::mt19937 rng((uint32_t)a.seed);
+        for (int i = 0; i < a.keys; i++) resident.hot_keys.push_back((int)rng());
+    }
+    resident.valid = true;
+    resident.dirty = false;
+    resident.storage = a.storage;
+    resident.pages = a.pages;
+    resident.keys = a.keys;
+    resident.seed = a.seed;
+    resident.entries = max_entries(a);
+}
+
+void worker(int tid, int cpu, const Args& a, const vector<int>& hot_keys, atomic<uint64_t>& ops_done) {
+    if (cpu >= 0) (void)pin_self_to_cpu(cpu);  // ignore failure (WSL may reject)
 
     std::mt19937 rng((uint32_t)(a.seed + tid * 1337u));
     std::uniform_int_distribution<int> pct(0, 99);
-    std::uniform_int_distribution<size_t> pick(0, hot_keys.empty() ? 0 : (hot_keys.size() - 1));
+    KeySampler pick(a.dist, hot_keys.size());
     std::uniform_int_distribution<int> coin(0, 1);
 
     int tmp = 0;
@@ -180,29 +547,24 @@ void worker(int tid, const Args& a, const vector<int>& hot_keys, atomic<uint64_t
     for (int i = 0; i < a.ops_per_thread; i++) {
         if (a.workload == Workload::LookupOnly) {
             int k = hot_keys.empty() ? (int)rng() : hot_keys[pick(rng)];
-            if (a.mode == Mode::Coarse) (void)find_coarse(k, tmp);
-            else (void)find_striped(k, tmp);
+            (void)table_find(a, k, tmp);
 
         } else if (a.workload == Workload::InsertOnly) {
             int k = (int)rng();
-            if (a.mode == Mode::Coarse) insert_coarse(k, k);
-            else insert_striped(k, k);
+            table_insert(a, k, k);
 
         } else { 
             bool do_read = (pct(rng) < a.read_pct);
             if (do_read) {
                 int k = hot_keys.empty() ? (int)rng() : hot_keys[pick(rng)];
-                if (a.mode == Mode::Coarse) (void)find_coarse(k, tmp);
-                else (void)find_striped(k, tmp);
+                (void)table_find(a, k, tmp);
             } else {
                 if (coin(rng) == 0) {
                     int k = (int)rng();
-                    if (a.mode == Mode::Coarse) insert_coarse(k, k);
-                    else insert_striped(k, k);
+                    table_insert(a, k, k);
                 } else {
                     int k = hot_keys.empty() ? (int)rng() : hot_keys[pick(rng)];
-                    if (a.mode == Mode::Coarse) (void)erase_coarse(k);
-                    else (void)erase_striped(k);
+                    (void)table_erase(a, k);
                 }
             }
         }
@@ -213,45 +575,66 @@ void worker(int tid, const Args& a, const vector<int>& hot_keys, atomic<uint64_t
     ops_done.fetch_add(local_ops, memory_order_relaxed);
 }
 
-int main(int argc, char** argv) {
-    ios::sync_with_stdio(false);
-
+int run(int argc, char** argv, bool serving) {
     Args a = parse_args(argc, argv);
-    prefill(a);
-
-    vector<int> hot_keys;
-    hot_keys.reserve(min(a.keys, 100000));
-    std::mt19937 rng((uint32_t)a.seed);
-    for (int i = 0; i < a.keys; i++) {
-        int k = (int)rng();
-        hot_keys.push_back(k);
-        if ((int)hot_keys.size() >= 100000) break;
-    }
+    flat_dropped.store(0, memory_order_relaxed);  // counts this run's prefill (if any) and workers
+    prepare(a, serving);
+    const vector<int>& hot_keys = resident.hot_keys;
+    const vector<int> cpus = resolve_placement(a.placement, a.threads);
 
     atomic<uint64_t> ops_done{0};
     vector<thread> ts;
     ts.reserve(a.threads);
 
     auto start = chrono::high_resolution_clock::now();
-    for (int t = 0; t < a.threads; t++) ts.emplace_back(worker, t, cref(a), cref(hot_keys), ref(ops_done));
+    for (int t = 0; t < a.threads; t++) ts.emplace_back(worker, t, cpus.empty() ? -1 : cpus[t], cref(a), cref(hot_keys), ref(ops_done));
     for (auto& t : ts) t.join();
     auto end = chrono::high_resolution_clock::now();
 
+    resident.dirty = a.workload != Workload::LookupOnly;
+
     double secs = chrono::duration<double>(end - start).count();
     double thr = (double)ops_done.load(memory_order_relaxed) / secs;
 
-    const char* mode_s = (a.mode == Mode::Coarse) ? "coarse" : "striped";
+    const char* mode_s =
+        (a.mode == Mode::Optimistic) ? "flat-optimistic" :
+        (a.storage == Storage::Flat) ? ((a.mode == Mode::Coarse) ? "flat-coarse" : "flat-striped") :
+        (a.mode == Mode::Coarse) ? "coarse" : "striped";
     const char* wl_s =
         (a.workload == Workload::LookupOnly) ? "lookup" :
         (a.workload == Workload::InsertOnly) ? "insert" : "mixed";
 
+    cout.precision(10);
     cout << "mode=" << mode_s
          << " workload=" << wl_s
          << " keys=" << a.keys
          << " threads=" << a.threads
          << " read_pct=" << a.read_pct
          << " ops_per_thread=" << a.ops_per_thread
+         << " dist=" << a.dist.spec
+         << " placement=" << placement_name(a.placement)
+         << " cpus=" << cpus_field(cpus)
          << " throughput_ops_per_s=" << thr
-         << "\n";
+         << " dropped_inserts=" << flat_dropped.load(memory_order_relaxed);
+    if (a.storage == Storage::Flat) cout << page_fields(flat_arena);
+    else cout << " pages=" << page_kind_name(a.pages) << " page_alloc=malloc page_backing=NA huge_pct=NA";
+    cout << "\n";
+    if (flat_dropped.load(memory_order_relaxed))
+        cerr << "WARNING: " << flat_dropped.load(memory_order_relaxed) << " inserts dropped (flat shard full)\n";
     return 0;
 }
+
+int main(int argc, char** argv) {
+    ios::sync_with_stdio(false);
+
+    if (serve_requested(argc, argv)) {
+        return serve_loop(argv[0], [](int c, char** v) { return run(c, v, true); }, table_release,
+            [](ostream& o) {
+                o << " keys=" << resident.keys
+                  << " storage=" << (resident.storage == Storage::Flat ? "flat" : "chained")
+                  << " dirty=" << (resident.dirty ? 1 : 0);
+            },
+            table_bytes);
+    }
+    return run_once([](int c, char** v) { return run(c, v, false); }, argc, argv);
+}
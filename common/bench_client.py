@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Client for the benchmark binaries' --serve mode (see common/bench_serve.hpp).
+
+The binary is started once and kept alive; each run() sends one "run <flags>"
+line and returns that run's stdout, so the collectors call it where they used
+to call subprocess.run on a fresh process. Datasets built by one run (mmu's
+array, prefetch's index vector, amq_bench's key sets, the A4 prefilled table)
+stay resident for the next run with the same dataset parameters.
+
+    with BenchServer(["./prefetch"]) as srv:
+        out = srv.run(["rand_idx", "268435456", "200000000"])
+
+Hardware counters: PerfCounters(pid=srv.pid) attaches to the server, and the
+delta read around one run() covers exactly that run (plus any dataset it had
+to build), not the start-up of the process.
+"""
+import os
+import subprocess
+import threading
+
+
+class BenchServerError(RuntimeError):
+    pass
+
+
+class BenchServer:
+    """
+    One resident benchmark process. argv is the one-shot command line up to
+    (not including) the per-run flags; cpus optionally pins the server (and
+    the worker threads it starts) to a CPU set.
+    """
+
+    def __init__(self, argv, cpus=None, cwd=None):
+        self.argv = list(argv)
+        preexec = (lambda: os.sched_setaffinity(0, cpus)) if cpus else None
+        self.proc = subprocess.Popen(self.argv + ["--serve"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.PIPE, text=True, bufsize=1, cwd=cwd,
+                                     preexec_fn=preexec)
+        self._err = []
+        self._err_lock = threading.Lock()
+        self._err_thread = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._err_thread.start()
+
+    @property
+    def pid(self):
+        return self.proc.pid
+
+    def _drain_stderr(self):
+        for line in self.proc.stderr:
+            with self._err_lock:
+                self._err.append(line)
+
+    def stderr(self):
+        """stderr written since the last call (the server's stderr is never closed between runs)."""
+        with self._err_lock:
+            err, self._err = "".join(self._err), []
+        return err
+
+    def request(self, line):
+        """Send one command line and return its stdout (without the status line)."""
+        if self.proc.poll() is not None:
+            raise BenchServerError(f"{self.argv[0]} --serve exited with {self.proc.returncode}: {self.stderr()[-300:]}")
+        try:
+            self.proc.stdin.write(line + "\n")
+            self.proc.stdin.flush()
+        except BrokenPipeError:
+            raise BenchServerError(f"{self.argv[0]} --serve is gone: {self.stderr()[-300:]}") from None
+        out = []
+        for reply in self.proc.stdout:
+            if reply.startswith("#"):
+                status = reply[1:].strip()
+                if status != "ok":
+                    raise BenchServerError(f"{self.argv[0]}: {line!r}: {status}\n{''.join(out)}{self.stderr()[-300:]}")
+                return "".join(out)
+            out.append(reply)
+        self.proc.wait()
+        raise BenchServerError(f"{self.argv[0]} --serve exited with {self.proc.returncode} during {line!r}: "
+                               f"{self.stderr()[-300:]}")
+
+    def run(self, args):
+        """One benchmark run; args are the flags a one-shot run takes after argv."""
+        return self.request(" ".join(["run", *map(str, args)]))
+
+    def reset(self):
+        self.request("reset")
+
+    def report(self):
+        """{key: value} from the server's report line (runs, resident_bytes, ...)."""
+        return dict(kv.split("=", 1) for kv in self.request("report").split() if "=" in kv)
+
+    def close(self):
+        if self.proc.poll() is None:
+            try:
+                self.request("quit")
+            except BenchServerError:
+                pass
+            self.proc.stdin.close()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self._err_thread.join(timeout=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,87 @@
+#pragma once
+// Resident "--serve" mode shared by the A1, A3 and A4 benchmark binaries.
+//
+//   <binary> --serve
+//
+// reads one command per line on stdin and keeps its datasets (arrays, index
+// vectors, key sets, prefilled tables) alive between commands, so repeated
+// runs skip the allocation, first touch and generation work:
+//
+//   run <flags...>   one run with the same flags as a one-shot invocation
+//   reset            drop the resident datasets (the next run rebuilds them)
+//   report           one line "runs=<n> resident_bytes=<b> ..." about the resident state
+//   quit             exit (EOF does the same)
+//
+// A reply is whatever the command writes to stdout followed by one status line,
+// "#ok" or "#error <message>", so clients read until a line starting with '#'.
+// A run that throws (e.g. a bad flag value) answers "#error <what>" and the
+// server keeps going.
+// common/bench_client.py implements the Python side.
+#include <cstdint>
+#include <exception>
+#include <iostream>
+#include <sstream>
+#include <string>
+#include <vector>
+
+// One-shot invocation: a thrown std::exception (e.g. a bad flag value) is
+// printed to stderr and becomes exit code 2.
+template <class Run>
+int run_once(Run run, int argc, char** argv) {
+    try {
+        return run(argc, argv);
+    } catch (const std::exception& e) {
+        std::cerr << e.what() << "\n";
+        return 2;
+    }
+}
+
+inline bool serve_requested(int argc, char** argv) {
+    return argc >= 2 && std::string(argv[1]) == "--serve";
+}
+
+// run:    int(int argc, char** argv), argv[0] is the program name; non-zero or a
+//         thrown std::exception is an error
+// reset:  void()
+// report: void(std::ostream&), appends " key=value" fields after runs/resident_bytes
+// bytes:  uint64_t(), current size of the resident datasets
+template <class Run, class Reset, class Report, class Bytes>
+int serve_loop(const char* prog, Run run, Reset reset, Report report, Bytes bytes) {
+    uint64_t runs = 0;
+    std::string line;
+    while (std::getline(std::cin, line)) {
+        std::istringstream in(line);
+        std::string cmd;
+        if (!(in >> cmd)) continue;
+
+        if (cmd == "run") {
+            std::vector<std::string> args{prog};
+            for (std::string tok; in >> tok;) args.push_back(tok);
+            std::vector<char*> argv;
+            for (auto& s : args) argv.push_back(&s[0]);
+            argv.push_back(nullptr);
+            runs++;
+            try {
+                int rc = run((int)args.size(), argv.data());
+                if (rc == 0) std::cout << "#ok\n";
+                else std::cout << "#error exit=" << rc << "\n";
+            } catch (const std::exception& e) {
+                std::cout << "#error " << e.what() << "\n";
+            }
+        } else if (cmd == "reset") {
+            reset();
+            std::cout << "#ok\n";
+        } else if (cmd == "report") {
+            std::cout << "runs=" << runs << " resident_bytes=" << bytes();
+            report(std::cout);
+            std::cout << "\n#ok\n";
+        } else if (cmd == "quit") {
+            std::cout << "#ok" << std::endl;
+            return 0;
+        } else {
+            std::cout << "#error unknown command " << cmd << "\n";
+        }
+        std::cout.flush();
+    }
+    return 0;
+}
@@ -0,0 +1,180 @@
+#pragma once
+// Topology-aware worker placement shared by amq_bench (A3) and the A4 bench.
+//
+//   --placement compact     one thread per physical core, filling the first NUMA
+//                           node / package before the next; SMT siblings are used
+//                           only once every core has a thread
+//   --placement scatter     one thread per physical core, round-robin across NUMA
+//                           nodes / packages; SMT siblings last
+//   --placement smt-pairs   consecutive threads share a core (all its SMT siblings),
+//                           cores in compact order
+//   --placement list:<cpus> thread i on the i-th CPU of the list ("0,2,4-7")
+//
+// Only CPUs in the process affinity mask (taskset, the sweep scheduler) are
+// used; topology comes from /sys/devices/system/cpu/cpu<N>/{topology,node<M>}.
+// More threads than CPUs wrap around. Benchmarks print placement=<policy> and
+// cpus=<cpu of thread 0>;<cpu of thread 1>;... so a row records where it ran.
+#include <algorithm>
+#include <cstdlib>
+#include <cstring>
+#include <fstream>
+#include <map>
+#include <sstream>
+#include <string>
+#include <tuple>
+#include <vector>
+
+#ifdef __linux__
+#include <dirent.h>
+#include <pthread.h>
+#include <sched.h>
+#endif
+
+enum class PlacementPolicy { Compact, Scatter, SmtPairs, List };
+
+struct Placement {
+    PlacementPolicy policy = PlacementPolicy::Compact;
+    std::vector<int> list;  // PlacementPolicy::List only
+};
+
+// "0-3,8,10-11" -> {0,1,2,3,8,10,11}, in the order given. Empty on a malformed list.
+inline std::vector<int> parse_cpu_list_spec(const std::string& s) {
+    std::vector<int> cpus;
+    std::stringstream ss(s);
+    std::string tok;
+    while (std::getline(ss, tok, ',')) {
+        if (tok.empty()) continue;
+        char* end = nullptr;
+        long a = std::strtol(tok.c_str(), &end, 10);
+        if (end == tok.c_str() || a < 0) return {};
+        long b = a;
+        if (*end == '-') {
+            const char* rest = end + 1;
+            b = std::strtol(rest, &end, 10);
+            if (end == rest || b < a) return {};
+        }
+        if (*end != '\0') return {};
+        for (long c = a; c <= b; c++) cpus.push_back((int)c);
+    }
+    return cpus;
+}
+
+inline bool parse_placement(const std::string& s, Placement& p) {
+    p = Placement();
+    if (s == "compact") p.policy = PlacementPolicy::Compact;
+    else if (s == "scatter") p.policy = PlacementPolicy::Scatter;
+    else if (s == "smt-pairs") p.policy = PlacementPolicy::SmtPairs;
+    else if (s.rfind("list:", 0) == 0) {
+        p.policy = PlacementPolicy::List;
+        p.list = parse_cpu_list_spec(s.substr(5));
+        return !p.list.empty();
+    } else return false;
+    return true;
+}
+
+inline const char* placement_name(const Placement& p) {
+    switch (p.policy) {
+    case PlacementPolicy::Scatter: return "scatter";
+    case PlacementPolicy::SmtPairs: return "smt-pairs";
+    case PlacementPolicy::List: return "list";
+    default: return "compact";
+    }
+}
+
+struct CpuTopo {
+    int cpu, core, pkg, node;
+};
+
+inline int read_sysfs_int(const std::string& path, int fallback) {
+    std::ifstream f(path);
+    int v;
+    return (f >> v) ? v : fallback;
+}
+
+// Allowed CPUs with their core / package / NUMA node ids (-1 core: unknown, treated as its own core).
+inline std::vector<CpuTopo> cpu_topology() {
+    std::vector<CpuTopo> out;
+#ifdef __linux__
+    cpu_set_t set;
+    CPU_ZERO(&set);
+    if (sched_getaffinity(0, sizeof(set), &set) != 0) return out;
+    for (int c = 0; c < CPU_SETSIZE; c++) {
+        if (!CPU_ISSET(c, &set)) continue;
+        std::string base = "/sys/devices/system/cpu/cpu" + std::to_string(c);
+        CpuTopo t{c, read_sysfs_int(base + "/topology/core_id", -1),
+                  read_sysfs_int(base + "/topology/physical_package_id", 0), 0};
+        if (DIR* d = opendir(base.c_str())) {
+            while (dirent* e = readdir(d)) {
+                if (std::strncmp(e->d_name, "node", 4) == 0 && e->d_name[4] >= '0' && e->d_name[4] <= '9') {
+                    t.node = std::atoi(e->d_name + 4);
+                    break;
+                }
+            }
+            closedir(d);
+        }
+        out.push_back(t);
+    }
+#endif
+    return out;
+}
+
+// CPU for each of `threads` workers (empty when the affinity mask is unavailable).
+inline std::vector<int> resolve_placement(const Placement& p, int threads) {
+    std::vector<int> order;
+    if (p.policy == PlacementPolicy::List) {
+        order = p.list;
+    } else {
+        // physical cores keyed (node, package, core), each with its SMT siblings
+        std::map<std::tuple<int, int, int>, std::vector<int>> cores;
+        for (const CpuTopo& t : cpu_topology())
+            cores[std::make_tuple(t.node, t.pkg, t.core < 0 ? 100000 + t.cpu : t.core)].push_back(t.cpu);
+        size_t width = 0;
+        for (auto& kv : cores) width = std::max(width, kv.second.size());
+
+        if (p.policy == PlacementPolicy::SmtPairs) {
+            for (auto& kv : cores) order.insert(order.end(), kv.second.begin(), kv.second.end());
+        } else {
+            // domains are (node, package); compact walks them in order, scatter round-robins
+            std::map<std::pair<int, int>, std::vector<const std::vector<int>*>> domains;
+            for (auto& kv : cores)
+                domains[{std::get<0>(kv.first), std::get<1>(kv.first)}].push_back(&kv.second);
+            for (size_t s = 0; s < width; s++) {
+                if (p.policy == PlacementPolicy::Compact) {
+                    for (auto& d : domains)
+                        for (auto* sib : d.second)
+                            if (s < sib->size()) order.push_back((*sib)[s]);
+                } else {
+                    size_t most = 0;
+                    for (auto& d : domains) most = std::max(most, d.second.size());
+                    for (size_t i = 0; i < most; i++)
+                        for (auto& d : domains)
+                            if (i < d.second.size() && s < d.second[i]->size()) order.push_back((*d.second[i])[s]);
+                }
+            }
+        }
+    }
+    std::vector<int> cpus;
+    if (order.empty()) return cpus;
+    for (int i = 0; i < threads; i++) cpus.push_back(order[(size_t)i % order.size()]);
+    return cpus;
+}
+
+// Pin the calling thread; false if the kernel rejects the CPU (offline, outside cgroup, WSL).
+inline bool pin_self_to_cpu(int cpu) {
+#ifdef __linux__
+    cpu_set_t set;
+    CPU_ZERO(&set);
+    CPU_SET(cpu, &set);
+    return pthread_setaffinity_np(pthread_self(), sizeof(set), &set) == 0;
+#else
+    (void)cpu;
+    return false;
+#endif
+}
+
+// "0;2;4": the resolved CPU of each thread, in thread order (no commas, so it fits a CSV cell).
+inline std::string cpus_field(const std::vector<int>& cpus) {
+    std::string s;
+    for (size_t i = 0; i < cpus.size(); i++) s += (i ? ";" : "") + std::to_string(cpus[i]);
+    return s.empty() ? "NA" : s;
+}
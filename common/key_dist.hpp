@@ -0,0 +1,117 @@
+#pragma once
+// Key-popularity distributions shared by the A3 and A4 benchmarks.
+//
+//   --dist uniform               every key equally likely
+//   --dist zipf:<theta>          P(rank k) ~ 1/k^theta (theta > 0; 0.99 is the YCSB default)
+//   --dist hotspot:<frac>:<prob> a fraction <frac> of the keys receives <prob> of the accesses
+//
+// KeySampler returns an index in [0, n); index 0 is the hottest key, so callers
+// index a key array whose order is already random (hot keys land anywhere in
+// the table). Zipf uses rejection-inversion sampling (Hoermann & Derflinger,
+// 1996): O(1) per draw and no per-key table, so it works for any n.
+#include <cmath>
+#include <cstdint>
+#include <cstdlib>
+#include <string>
+
+struct KeyDist {
+    enum Kind { Uniform, Zipf, Hotspot };
+    Kind kind = Uniform;
+    double theta = 0.0;
+    double hot_frac = 0.0;
+    double hot_prob = 0.0;
+    std::string spec = "uniform";
+
+    // The whole of s as a finite number; false otherwise ("", "abc", "0.5x").
+    static bool number(const std::string& s, double& v) {
+        char* end = nullptr;
+        v = std::strtod(s.c_str(), &end);
+        return !s.empty() && end == s.c_str() + s.size() && std::isfinite(v);
+    }
+
+    // Returns false for a malformed spec.
+    static bool parse(const std::string& s, KeyDist& d) {
+        d = KeyDist();
+        d.spec = s;
+        if (s == "uniform") return true;
+        if (s.rfind("zipf:", 0) == 0) {
+            d.kind = Zipf;
+            return number(s.substr(5), d.theta) && d.theta > 0.0;
+        }
+        if (s.rfind("hotspot:", 0) == 0) {
+            size_t colon = s.find(':', 8);
+            if (colon == std::string::npos) return false;
+            d.kind = Hotspot;
+            if (!number(s.substr(8, colon - 8), d.hot_frac) || !number(s.substr(colon + 1), d.hot_prob))
+                return false;
+            return d.hot_frac > 0.0 && d.hot_frac <= 1.0 && d.hot_prob >= 0.0 && d.hot_prob <= 1.0;
+        }
+        return false;
+    }
+};
+
+class KeySampler {
+public:
+    KeySampler(const KeyDist& d, uint64_t n) : d_(d), n_(n ? n : 1) {
+        if (d_.kind == KeyDist::Zipf) {
+            s_ = d_.theta;
+            h_x1_ = h_integral(1.5) - 1.0;
+            h_n_ = h_integral((double)n_ + 0.5);
+            cut_ = 2.0 - h_integral_inverse(h_integral(2.5) - h(2.0));
+        } else if (d_.kind == KeyDist::Hotspot) {
+            hot_n_ = (uint64_t)(d_.hot_frac * (double)n_);
+            if (hot_n_ < 1) hot_n_ = 1;
+            if (hot_n_ > n_) hot_n_ = n_;
+        }
+    }
+
+    template <class RNG>
+    uint64_t operator()(RNG& rng) const {
+        switch (d_.kind) {
+        case KeyDist::Uniform:
+            return (uint64_t)rng() % n_;
+        case KeyDist::Hotspot:
+            if (hot_n_ == n_ || u01(rng) < d_.hot_prob) return (uint64_t)rng() % hot_n_;
+            return hot_n_ + (uint64_t)rng() % (n_ - hot_n_);
+        case KeyDist::Zipf:
+        default:
+            for (;;) {
+                double u = h_n_ + u01(rng) * (h_x1_ - h_n_);
+                double x = h_integral_inverse(u);
+                double kd = std::floor(x + 0.5);
+                if (kd < 1.0) kd = 1.0;
+                else if (kd > (double)n_) kd = (double)n_;
+                if (kd - x <= cut_ || u >= h_integral(kd + 0.5) - h(kd)) return (uint64_t)kd - 1;
+            }
+        }
+    }
+
+private:
+    template <class RNG>
+    static double u01(RNG& rng) {
+        return (double)(rng() - RNG::min()) / ((double)(RNG::max() - RNG::min()) + 1.0);
+    }
+
+    // log1p(x)/x and expm1(x)/x, with series expansions near 0
+    static double helper1(double x) {
+        return std::fabs(x) > 1e-8 ? std::log1p(x) / x : 1.0 - x * (0.5 - x * (1.0 / 3.0 - 0.25 * x));
+    }
+    static double helper2(double x) {
+        return std::fabs(x) > 1e-8 ? std::expm1(x) / x : 1.0 + x * 0.5 * (1.0 + x / 3.0 * (1.0 + 0.25 * x));
+    }
+    double h(double x) const { return std::exp(-s_ * std::log(x)); }
+    double h_integral(double x) const {
+        double lx = std::log(x);
+        return helper2((1.0 - s_) * lx) * lx;
+    }
+    double h_integral_inverse(double x) const {
+        double t = x * (1.0 - s_);
+        if (t < -1.0) t = -1.0;
+        return std::exp(helper1(t) * x);
+    }
+
+    KeyDist d_;
+    uint64_t n_;
+    uint64_t hot_n_ = 0;
+    double s_ = 0.0, h_x1_ = 0.0, h_n_ = 0.0, cut_ = 0.0;
+};
@@ -0,0 +1,169 @@
+#pragma once
+// Page-size-aware buffers shared by the A1 mmu, Project_1 and A4 benchmarks.
+//
+//   --pages default   plain aligned allocation, whatever the system THP policy does
+//   --pages 4k        mmap + madvise(MADV_NOHUGEPAGE): base pages even under THP=always
+//   --pages thp       2 MB-aligned mmap + madvise(MADV_HUGEPAGE)
+//   --pages hugetlb   mmap(MAP_HUGETLB) from the reserved pool (vm.nr_hugepages);
+//                     falls back to thp when the pool cannot back the buffer
+//
+// What was requested, what the allocator fell back to and what the kernel
+// actually mapped are three different things, so benchmarks print all of
+// them: pages=<requested> page_alloc=<used> page_backing=<verified> huge_pct=<n>.
+// page_backing() reads /proc/self/smaps for the mappings covering the buffer,
+// so call it after the buffer has been touched (THP is allocated at fault time).
+#include <cstddef>
+#include <cstdint>
+#include <cstdlib>
+#include <cstring>
+#include <fstream>
+#include <sstream>
+#include <string>
+
+#if defined(__linux__)
+#include <sys/mman.h>
+#endif
+
+enum class PageKind { Default, Small, Thp, HugeTlb };
+
+static constexpr size_t HUGE_PAGE_BYTES = 2u << 20;
+
+inline bool parse_page_kind(const std::string& s, PageKind& k) {
+    if (s == "default") k = PageKind::Default;
+    else if (s == "4k") k = PageKind::Small;
+    else if (s == "thp") k = PageKind::Thp;
+    else if (s == "hugetlb") k = PageKind::HugeTlb;
+    else return false;
+    return true;
+}
+
+inline const char* page_kind_name(PageKind k) {
+    switch (k) {
+    case PageKind::Small: return "4k";
+    case PageKind::Thp: return "thp";
+    case PageKind::HugeTlb: return "hugetlb";
+    default: return "default";
+    }
+}
+
+struct PageBuffer {
+    void* ptr = nullptr;
+    size_t bytes = 0;       // requested size
+    size_t mapped = 0;      // mmap length (0: heap allocation)
+    PageKind requested = PageKind::Default;
+    PageKind used = PageKind::Default;  // differs from requested after a fallback
+};
+
+// Zero-filled is not guaranteed for PageKind::Default; callers initialize.
+inline PageBuffer page_alloc(size_t bytes, PageKind kind, size_t alignment = 64) {
+    PageBuffer b;
+    b.bytes = bytes;
+    b.requested = kind;
+#if defined(__linux__)
+    if (kind == PageKind::HugeTlb) {
+        size_t len = (bytes + HUGE_PAGE_BYTES - 1) & ~(HUGE_PAGE_BYTES - 1);
+        void* p = mmap(nullptr, len, PROT_READ | PROT_WRITE, MAP_PRIVATE | MAP_ANONYMOUS | MAP_HUGETLB, -1, 0);
+        if (p != MAP_FAILED) {
+            b.ptr = p;
+            b.mapped = len;
+            b.used = PageKind::HugeTlb;
+            return b;
+        }
+        kind = PageKind::Thp;  // empty or too small hugetlb pool
+    }
+    if (kind == PageKind::Thp || kind == PageKind::Small) {
+        // over-map by one huge page and trim, so a THP buffer starts on a 2 MB boundary
+        size_t len = (bytes + HUGE_PAGE_BYTES - 1) & ~(HUGE_PAGE_BYTES - 1);
+        size_t over = kind == PageKind::Thp ? len + HUGE_PAGE_BYTES : len;
+        void* raw = mmap(nullptr, over, PROT_READ | PROT_WRITE, MAP_PRIVATE | MAP_ANONYMOUS, -1, 0);
+        if (raw != MAP_FAILED) {
+            uintptr_t start = (uintptr_t)raw;
+            if (kind == PageKind::Thp) {
+                uintptr_t aligned = (start + HUGE_PAGE_BYTES - 1) & ~(uintptr_t)(HUGE_PAGE_BYTES - 1);
+                if (aligned > start) munmap(raw, aligned - start);
+                uintptr_t end = aligned + len;
+                if (start + over > end) munmap((void*)end, start + over - end);
+                start = aligned;
+            }
+            b.ptr = (void*)start;
+            b.mapped = len;
+            b.used = kind;
+            madvise(b.ptr, len, kind == PageKind::Thp ? MADV_HUGEPAGE : MADV_NOHUGEPAGE);
+            return b;
+        }
+    }
+#endif
+    // PageKind::Default, or no mmap: a plain aligned heap allocation
+#if defined(_MSC_VER)
+    b.ptr = _aligned_malloc(bytes, alignment);
+#else
+    if (posix_memalign(&b.ptr, alignment, bytes) != 0) b.ptr = nullptr;
+#endif
+    b.used = PageKind::Default;
+    return b;
+}
+
+inline void page_free(PageBuffer& b) {
+    if (b.ptr) {
+#if defined(__linux__)
+        if (b.mapped) munmap(b.ptr, b.mapped);
+        else
+#endif
+#if defined(_MSC_VER)
+            _aligned_free(b.ptr);
+#else
+            free(b.ptr);
+#endif
+    }
+    b = PageBuffer();
+}
+
+struct PageBacking {
+    std::string kind = "NA";  // 4k | thp | hugetlb | NA (no smaps)
+    double huge_pct = 0.0;    // share of the buffer mapped with 2 MB pages
+};
+
+// Sums the smaps entries of every mapping overlapping [p, p + bytes). For a
+// heap (default) buffer the mapping can be larger than the buffer, so huge_pct
+// is capped at 100.
+inline PageBacking page_backing(const void* p, size_t bytes) {
+    PageBacking r;
+    std::ifstream f("/proc/self/smaps");
+    if (!f.good() || !p || !bytes) return r;
+    uintptr_t lo = (uintptr_t)p, hi = lo + bytes;
+    uint64_t thp_kb = 0, hugetlb_kb = 0;
+    bool in = false, any = false;
+    std::string line;
+    while (std::getline(f, line)) {
+        size_t dash = line.find('-');
+        size_t colon = line.find(':');
+        if (dash != std::string::npos && (colon == std::string::npos || dash < colon) &&
+            line.find(' ') > dash) {
+            uintptr_t a = (uintptr_t)std::strtoull(line.c_str(), nullptr, 16);
+            uintptr_t e = (uintptr_t)std::strtoull(line.c_str() + dash + 1, nullptr, 16);
+            in = a < hi && e > lo;
+            any = any || in;
+            continue;
+        }
+        if (!in || colon == std::string::npos) continue;
+        std::string key = line.substr(0, colon);
+        uint64_t kb = std::strtoull(line.c_str() + colon + 1, nullptr, 10);
+        if (key == "AnonHugePages") thp_kb += kb;
+        else if (key == "Private_Hugetlb" || key == "Shared_Hugetlb") hugetlb_kb += kb;
+    }
+    if (!any) return r;
+    uint64_t huge_kb = hugetlb_kb ? hugetlb_kb : thp_kb;
+    r.kind = hugetlb_kb ? "hugetlb" : thp_kb ? "thp" : "4k";
+    r.huge_pct = 100.0 * (double)huge_kb * 1024.0 / (double)bytes;
+    if (r.huge_pct > 100.0) r.huge_pct = 100.0;
+    return r;
+}
+
+// " pages=... page_alloc=... page_backing=... huge_pct=..." for key=value output lines.
+inline std::string page_fields(const PageBuffer& b) {
+    PageBacking k = page_backing(b.ptr, b.bytes);
+    std::ostringstream o;
+    o << " pages=" << page_kind_name(b.requested) << " page_alloc=" << page_kind_name(b.used)
+      << " page_backing=" << k.kind << " huge_pct=" << k.huge_pct;
+    return o.str();
+}
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Minimal perf_event_open(2) binding for the benchmark drivers
+(Project_A1/scripts/run_collect.py, Project_A4/scripts/sweep.py).
+
+A PerfCounters group is opened once per experiment on the driver process
+itself with inherit=1, so every child started afterwards is counted and its
+totals are folded back into our counters when it exits. Each repetition reads
+the group before and after the child runs and reports the delta. Only user
+space is counted (like cycles:u), so the collector's own contribution between
+the two reads is the few microseconds of fork/exec bookkeeping in Python.
+
+With a resident --serve process (common/bench_client.py) the group is opened
+with pid=<server pid> instead, so it counts only that process and the worker
+threads it starts after the group was opened.
+"""
+import ctypes
+import errno
+import os
+import platform
+import struct
+
+PERF_TYPE_HARDWARE = 0
+PERF_TYPE_HW_CACHE = 3
+
+PERF_COUNT_HW_CPU_CYCLES = 0
+PERF_COUNT_HW_INSTRUCTIONS = 1
+PERF_COUNT_HW_CACHE_REFERENCES = 2
+PERF_COUNT_HW_CACHE_MISSES = 3
+
+PERF_COUNT_HW_CACHE_L1D = 0
+PERF_COUNT_HW_CACHE_DTLB = 3
+PERF_COUNT_HW_CACHE_OP_READ = 0
+PERF_COUNT_HW_CACHE_RESULT_MISS = 1
+
+PERF_FORMAT_TOTAL_TIME_ENABLED = 1 << 0
+PERF_FORMAT_TOTAL_TIME_RUNNING = 1 << 1
+
+# perf_event_attr flag bits
+ATTR_INHERIT = 1 << 1
+ATTR_EXCLUDE_KERNEL = 1 << 5
+ATTR_EXCLUDE_HV = 1 << 6
+
+SYS_PERF_EVENT_OPEN = {"x86_64": 298, "aarch64": 241, "i686": 336, "i386": 336}
+
+
+def hw_cache(cache, op, result):
+    return cache | (op << 8) | (result << 16)
+
+
+# (column name, type, config); the first entry leads the group.
+EVENTS = [
+    ("cycles", PERF_TYPE_HARDWARE, PERF_COUNT_HW_CPU_CYCLES),
+    ("instructions", PERF_TYPE_HARDWARE, PERF_COUNT_HW_INSTRUCTIONS),
+    ("cache_references", PERF_TYPE_HARDWARE, PERF_COUNT_HW_CACHE_REFERENCES),
+    ("cache_misses", PERF_TYPE_HARDWARE, PERF_COUNT_HW_CACHE_MISSES),
+    ("l1d_load_misses", PERF_TYPE_HW_CACHE,
+     hw_cache(PERF_COUNT_HW_CACHE_L1D, PERF_COUNT_HW_CACHE_OP_READ, PERF_COUNT_HW_CACHE_RESULT_MISS)),
+    ("dtlb_load_misses", PERF_TYPE_HW_CACHE,
+     hw_cache(PERF_COUNT_HW_CACHE_DTLB, PERF_COUNT_HW_CACHE_OP_READ, PERF_COUNT_HW_CACHE_RESULT_MISS)),
+]
+
+
+class PerfEventAttr(ctypes.Structure):
+    # PERF_ATTR_SIZE_VER0 layout (64 bytes); the kernel zero-extends the rest.
+    _fields_ = [
+        ("type", ctypes.c_uint32),
+        ("size", ctypes.c_uint32),
+        ("config", ctypes.c_uint64),
+        ("sample_period", ctypes.c_uint64),
+        ("sample_type", ctypes.c_uint64),
+        ("read_format", ctypes.c_uint64),
+        ("flags", ctypes.c_uint64),
+        ("wakeup_events", ctypes.c_uint32),
+        ("bp_type", ctypes.c_uint32),
+        ("config1", ctypes.c_uint64),
+    ]
+
+
+class PerfUnavailable(RuntimeError):
+    pass
+
+
+_libc = None
+
+
+def _perf_event_open(attr, pid, cpu, group_fd, flags):
+    global _libc
+    nr = SYS_PERF_EVENT_OPEN.get(platform.machine())
+    if nr is None:
+        raise PerfUnavailable(f"perf_event_open: unsupported arch {platform.machine()}")
+    if _libc is None:
+        _libc = ctypes.CDLL(None, use_errno=True)
+    fd = _libc.syscall(ctypes.c_long(nr), ctypes.byref(attr), ctypes.c_int(pid), ctypes.c_int(cpu),
+                       ctypes.c_int(group_fd), ctypes.c_ulong(flags))
+    if fd < 0:
+        e = ctypes.get_errno()
+        raise OSError(e, os.strerror(e))
+    return fd
+
+
+class PerfCounters:
+    """
+    One counter group (cycles leader + whatever else the PMU accepts).
+    Use as a context manager; measure() returns the per-child deltas.
+    """
+
+    def __init__(self, events=EVENTS, pid=0):
+        self.fds = []
+        self.names = []
+        self.skipped = []
+        leader = -1
+        for name, etype, config in events:
+            attr = PerfEventAttr()
+            attr.type = etype
+            attr.size = ctypes.sizeof(PerfEventAttr)
+            attr.config = config
+            attr.read_format = PERF_FORMAT_TOTAL_TIME_ENABLED | PERF_FORMAT_TOTAL_TIME_RUNNING
+            attr.flags = ATTR_INHERIT | ATTR_EXCLUDE_KERNEL | ATTR_EXCLUDE_HV
+            try:
+                fd = _perf_event_open(attr, pid, -1, leader, 0)
+            except OSError as e:
+                if leader < 0:
+                    self.close()
+                    hint = " (see /proc/sys/kernel/perf_event_paranoid)" if e.errno in (errno.EACCES, errno.EPERM) else ""
+                    raise PerfUnavailable(f"perf_event_open({name}): {e.strerror}{hint}") from None
+                # e.g. no dTLB event in a VM: keep the rest of the group
+                self.skipped.append(name)
+                continue
+            if leader < 0:
+                leader = fd
+            self.fds.append(fd)
+            self.names.append(name)
+
+    def read(self):
+        """
+        Current totals (the target plus all reaped children/threads), scaled for multiplexing.
+        """
+        vals = {}
+        for name, fd in zip(self.names, self.fds):
+            value, enabled, running = struct.unpack("QQQ", os.read(fd, 24))
+            if running and running < enabled:
+                value = int(value * enabled / running)
+            vals[name] = value
+        return vals
+
+    def measure(self, fn):
+        """
+        Call fn() (which must wait for its child or server reply) and return (fn(), deltas).
+        """
+        before = self.read()
+        result = fn()
+        after = self.read()
+        return result, {k: after[k] - before[k] for k in self.names}
+
+    def close(self):
+        for fd in self.fds:
+            os.close(fd)
+        self.fds = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Shared columnar store for the benchmark result CSVs.
+
+The CSVs stay the source of truth (the C++ harnesses and shell collectors
+append to them). The first load converts a CSV once into an Arrow IPC file
+under <csv dir>/.store/, with the low-cardinality columns (kernel, dtype,
+align, build, filter, mode, workload, ...) normalized and dictionary encoded.
+Later loads memory-map that file, so the columns are used in place instead of
+being parsed and re-normalized on every plot run, and `filters=` is applied by
+the scanner before anything is converted to pandas. The store is rebuilt
+whenever the CSV's size or mtime changes.
+
+    from results_store import load
+    df = load("data/results.csv", "project1", filters={"kernel": "saxpy", "dtype": ["f32", "f64"]})
+
+Without pyarrow the same calls fall back to pandas.read_csv (or csv.DictReader
+for records=True) plus the same normalization and filtering.
+"""
+import csv
+import os
+import sys
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+except ImportError:
+    pa = None
+
+STORE_VERSION = "1"
+STORE_DIR = ".store"
+NULLS = ["", "NA", "N/A", "nan", "NaN"]
+
+# normalize: stripped + lower-cased (what every Project_1 script used to redo)
+# categorical: dictionary encoded in the store, pandas category after loading
+SCHEMAS = {
+    "project1": {"normalize": ["kernel", "dtype", "align", "build"],
+                 "categorical": ["kernel", "dtype", "align", "build"]},
+    "a3": {"normalize": ["filter"], "categorical": ["filter"]},
+    "a4": {"normalize": ["mode", "workload"], "categorical": ["mode", "workload"]},
+    None: {"normalize": [], "categorical": []},
+}
+
+
+def store_path(csv_path, fmt="arrow"):
+    d, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(d, STORE_DIR, f"{name}.{fmt}")
+
+
+def _stamp(csv_path, schema):
+    st = os.stat(csv_path)
+    return {b"source_size": str(st.st_size).encode(), b"source_mtime_ns": str(st.st_mtime_ns).encode(),
+            b"schema": str(schema).encode(), b"version": STORE_VERSION.encode()}
+
+
+def _fresh(path, stamp, fmt):
+    if not os.path.exists(path):
+        return False
+    try:
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            meta = pq.read_schema(path).metadata or {}
+        else:
+            with pa.memory_map(path, "r") as src:
+                meta = pa.ipc.open_file(src).schema.metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return False
+    return all(meta.get(k) == v for k, v in stamp.items())
+
+
+def _norm_value(v):
+    return str(v).strip().lower()
+
+
+def convert(csv_path, schema=None, fmt="arrow"):
+    """
+    (Re)build the columnar copy of csv_path if it is stale and return its path.
+    fmt="arrow" gives an uncompressed IPC file that loads zero-copy via mmap;
+    fmt="parquet" gives a compressed file whose row-group statistics let the
+    scanner skip whole groups for `filters=`.
+    """
+    if pa is None:
+        raise RuntimeError("results_store.convert needs pyarrow")
+    spec = SCHEMAS[schema]
+    path = store_path(csv_path, fmt)
+    stamp = _stamp(csv_path, schema)
+    if _fresh(path, stamp, fmt):
+        return path
+
+    table = pacsv.read_csv(csv_path, convert_options=pacsv.ConvertOptions(null_values=NULLS,
+                                                                          strings_can_be_null=True))
+    table = table.rename_columns([c.strip() for c in table.column_names])
+    for c in spec["normalize"]:
+        if c in table.column_names:
+            col = pc.utf8_lower(pc.utf8_trim_whitespace(table[c].cast(pa.string())))
+            table = table.set_column(table.column_names.index(c), c, col)
+    for c in spec["categorical"]:
+        if c in table.column_names:
+            # sorted dictionary, so category order == string order for sort/groupby
+            col = table[c].combine_chunks().cast(pa.string())
+            cats = pc.unique(col.drop_null()).sort()
+            enc = pa.DictionaryArray.from_arrays(pc.index_in(col, value_set=cats).cast(pa.int32()), cats)
+            table = table.set_column(table.column_names.index(c), c, enc)
+    table = table.replace_schema_metadata(stamp)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, tmp, row_group_size=64 * 1024)
+    else:
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as w:
+            w.write_table(table, max_chunksize=64 * 1024)
+    os.replace(tmp, path)
+    return path
+
+
+def _expr(filters, spec):
+    expr = None
+    for col, want in filters.items():
+        vals = list(want) if isinstance(want, (list, tuple, set)) else [want]
+        if col in spec["normalize"]:
+            vals = [_norm_value(v) for v in vals]
+        e = ds.field(col) == vals[0] if len(vals) == 1 else ds.field(col).isin(vals)
+        expr = e if expr is None else expr & e
+    return expr
+
+
+def _load_arrow(csv_path, schema, filters, columns, fmt):
+    path = convert(csv_path, schema, fmt)
+    fs = pafs.LocalFileSystem(use_mmap=True)
+    dset = ds.dataset(path, format="ipc" if fmt == "arrow" else "parquet", filesystem=fs)
+    expr = _expr(filters, SCHEMAS[schema]) if filters else None
+    return dset.to_table(columns=columns, filter=expr)
+
+
+def _load_pandas(csv_path, schema, filters, columns, categorical):
+    import pandas as pd
+    spec = SCHEMAS[schema]
+    df = pd.read_csv(csv_path, na_values=NULLS)
+    df.columns = [c.strip() for c in df.columns]
+    for c in spec["normalize"]:
+        if c in df.columns:
+            df[c] = df[c].astype(str).str.strip().str.lower()
+    for col, want in (filters or {}).items():
+        vals = list(want) if isinstance(want, (list, tuple, set)) else [want]
+        if col in spec["normalize"]:
+            vals = [_norm_value(v) for v in vals]
+        df = df[df[col].isin(vals)]
+    if columns:
+        df = df[columns]
+    if categorical:
+        for c in spec["categorical"]:
+            if c in df.columns:
+                df[c] = df[c].astype("category")
+    return df.reset_index(drop=True)
+
+
+def _column_caster(values):
+    """
+    The per-value converter for one CSV column, inferred over the whole column
+    like pyarrow's CSV reader: bool, int, float or str, with NULLS -> None.
+    """
+    present = [v.strip() for v in values if v is not None and v.strip() not in NULLS]
+
+    def all_parse(fn):
+        try:
+            for v in present:
+                fn(v)
+            return True
+        except ValueError:
+            return False
+
+    if present and all(v.lower() in ("true", "false") for v in present):
+        cast = lambda v: v.strip().lower() == "true"  # noqa: E731
+    elif present and all_parse(int):
+        cast = lambda v: int(v.strip())  # noqa: E731
+    elif present and all_parse(float):
+        cast = lambda v: float(v.strip())  # noqa: E731
+    else:
+        cast = str
+    return lambda v: None if v is None or v.strip() in NULLS else cast(v)
+
+
+def _load_records(csv_path, schema, filters, columns):
+    spec = SCHEMAS[schema]
+    want = {}
+    for col, v in (filters or {}).items():
+        vals = list(v) if isinstance(v, (list, tuple, set)) else [v]
+        want[col] = {_norm_value(x) if col in spec["normalize"] else str(x) for x in vals}
+    with open(csv_path, newline="") as f:
+        raw = [{k.strip(): v for k, v in r.items()} for r in csv.DictReader(f)]
+    for r in raw:
+        for c in spec["normalize"]:
+            if c in r:
+                r[c] = _norm_value(r[c])
+    names = list(raw[0]) if raw else []
+    casts = {c: _column_caster([r.get(c) for r in raw]) for c in names}
+    rows = []
+    for r in raw:
+        if all((r.get(c) or "").strip() in vals for c, vals in want.items()):
+            rows.append({c: casts[c](r.get(c)) if c in casts else None for c in (columns or names)})
+    return rows
+
+
+def load(csv_path, schema=None, filters=None, columns=None, records=False, categorical=True, fmt="arrow"):
+    """
+    Load one result CSV through the store.
+
+    schema   : key of SCHEMAS ("project1", "a3", "a4") or None for no normalization
+    filters  : {column: value or list of values}; values of normalized columns
+               are matched case/space-insensitively
+    columns  : optional projection
+    records  : return a list of dicts instead of a DataFrame; values are typed
+               (bool/int/float/str, missing values None) with or without pyarrow
+    """
+    if pa is not None:
+        table = _load_arrow(csv_path, schema, filters, columns, fmt)
+        if records:
+            return table.to_pylist()
+        if not categorical:
+            table = table.cast(pa.schema([pa.field(f.name, f.type.value_type)
+                                          if pa.types.is_dictionary(f.type) else f for f in table.schema]))
+        return table.to_pandas()
+    if records:
+        return _load_records(csv_path, schema, filters, columns)
+    return _load_pandas(csv_path, schema, filters, columns, categorical)
+
+
+if __name__ == "__main__":
+    # python3 common/results_store.py <csv> [schema] [arrow|parquet]: prebuild a store file
+    schema = sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] != "none" else None
+    print(convert(sys.argv[1], schema, sys.argv[3] if len(sys.argv) > 3 else "arrow"))